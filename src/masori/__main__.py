@@ -1,47 +1,266 @@
 """
 Main entrypoint for the application
+
+Pipelines are imported inside each command so `masori --help` and single-pipeline
+runs don't pay for requests, lxml and psycopg2 before argv is parsed.
 """
 
 import typer
+from pathlib import Path
+from typing import Optional, List
 
-from masori.pipeline.players import PlayerPipelineRunner
-from masori.pipeline.teams import TeamPipelineRunner
-from masori.pipeline.positions import PositionsPipelineRunner
-from masori.pipeline.seasons import SeasonsPipelineRunner
-from masori.pipeline.fantasy import FantasyPipelineRunner
-from masori.pipeline.draftkings import DraftkingsPipelineRunner
+from masori.config import settings
 
 app = typer.Typer()
+bench_app = typer.Typer(help='Benchmarks')
+app.add_typer(bench_app, name='bench')
+
+@app.callback()
+def main(
+    max_workers: Optional[int] = typer.Option(
+        None, '--max-workers', min=1,
+        help='Concurrent extract requests per pipeline (defaults to EXTRACT_MAX_WORKERS).'
+    ),
+    stream: Optional[bool] = typer.Option(
+        None, '--stream/--no-stream',
+        help='Load in micro-batches while fetching continues (defaults to PIPELINE_STREAMING).'
+    ),
+    batch_size: Optional[int] = typer.Option(
+        None, '--batch-size', min=1,
+        help='Rows per micro-batch in streaming mode (defaults to LOAD_BATCH_SIZE).'
+    ),
+    refresh: bool = typer.Option(
+        False, '--refresh',
+        help='Reload every ID even if its payload is unchanged since the last load.'
+    ),
+    resume: bool = typer.Option(
+        False, '--resume',
+        help="Continue each pipeline's last unfinished run from its checkpoint, skipping completed IDs."
+    ),
+    parse_processes: Optional[str] = typer.Option(
+        None, '--parse-processes',
+        help="Worker processes for parsing and transforming, 'auto' or a number (defaults to PARSE_PROCESSES)."
+    ),
+    replay: Optional[str] = typer.Option(
+        None, '--replay', metavar='RUN',
+        help="Re-run slice, transform and load from a landed run ('latest' or a run ID) without the network."
+    )
+):
+    if max_workers:
+        settings.EXTRACT_MAX_WORKERS = max_workers
+    if stream is not None:
+        settings.PIPELINE_STREAMING = stream
+    if batch_size:
+        settings.LOAD_BATCH_SIZE = batch_size
+    if refresh:
+        settings.SKIP_UNCHANGED = False
+    if resume:
+        settings.PIPELINE_RESUME = True
+    if parse_processes is not None:
+        settings.PARSE_PROCESSES = parse_processes
+    if replay:
+        settings.PIPELINE_REPLAY = replay
+        # every replayed ID is reprocessed, whatever was loaded since
+        settings.SKIP_UNCHANGED = False
 
 @app.command()
 def teams():
+    from masori.pipeline.teams import TeamPipelineRunner
+
     tp = TeamPipelineRunner()
     tp.run()
 
 @app.command()
-def players():
-    pl = PlayerPipelineRunner()
+def players(
+    source: Optional[str] = typer.Option(
+        None, '--source',
+        help="'rosters' (one request per team) or 'athletes' (core API listing), defaults to PLAYERS_SOURCE."
+    )
+):
+    from masori.pipeline.players import PlayerPipelineRunner
+
+    if source not in (None, 'rosters', 'athletes'):
+        raise typer.BadParameter(f"Expected 'rosters' or 'athletes', got {source}", param_hint='--source')
+
+    pl = PlayerPipelineRunner(source)
     pl.run()
 
 @app.command()
 def positions():
+    from masori.pipeline.positions import PositionsPipelineRunner
+
     pos = PositionsPipelineRunner()
     pos.run()
 
 @app.command()
 def seasons():
+    from masori.pipeline.seasons import SeasonsPipelineRunner
+
     sea = SeasonsPipelineRunner()
     sea.run()
 
 @app.command()
 def fantasy():
+    from masori.pipeline.fantasy import FantasyPipelineRunner
+
     fan = FantasyPipelineRunner()
     fan.run()
 
 @app.command()
 def draftkings():
+    from masori.pipeline.draftkings import DraftkingsPipelineRunner
+
     dk = DraftkingsPipelineRunner()
     dk.run()
 
+@app.command('all')
+def run_all(
+    concurrency: Optional[int] = typer.Option(
+        None, '--concurrency', min=1,
+        help='Pipelines to run at once (defaults to SCHEDULER_CONCURRENCY).'
+    ),
+    priority: List[str] = typer.Option(
+        [], '--priority',
+        help='Pipeline priority as name=N, higher starts first. Repeatable.'
+    )
+):
+    from masori.pipeline.dag import build_scheduler
+
+    priorities = {}
+    for entry in priority:
+        name, _, value = entry.partition('=')
+        if not value.lstrip('-').isdigit():
+            raise typer.BadParameter(f'Expected name=N, got {entry}', param_hint='--priority')
+        priorities[name.strip()] = int(value)
+
+    try:
+        scheduler = build_scheduler(concurrency, priorities)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint='--priority')
+
+    tasks = scheduler.run()
+    scheduler.log_summary()
+
+    if any(task.status != 'succeeded' for task in tasks.values()):
+        raise typer.Exit(code=1)
+
+@app.command()
+def backfill(
+    years: str = typer.Option(..., '--years', help='Seasons to load, e.g. 2015-2025 or 2019,2021-2023.'),
+    weeks: str = typer.Option('1-18', '--weeks', help='Weeks of each season to load.'),
+    positions: Optional[str] = typer.Option(
+        None, '--positions',
+        help='Comma separated fantasy positions (qb, rb, wr, te, dst, k), defaults to all.'
+    ),
+    concurrency: Optional[int] = typer.Option(
+        None, '--concurrency', min=1,
+        help='Pipelines to run at once, defaults to one per position plus seasons.'
+    )
+):
+    from masori.pipeline.backfill import build_backfill_scheduler, parse_range
+
+    try:
+        year_list = parse_range(years)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint='--years')
+    try:
+        week_list = parse_range(weeks)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint='--weeks')
+
+    position_list = [p.strip() for p in positions.split(',') if p.strip()] if positions else None
+
+    try:
+        scheduler = build_backfill_scheduler(year_list, week_list, position_list, concurrency=concurrency)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint='--positions')
+
+    tasks = scheduler.run()
+    scheduler.log_summary()
+
+    if any(task.status != 'succeeded' for task in tasks.values()):
+        raise typer.Exit(code=1)
+
+@bench_app.command('parser')
+def bench_parser(
+    pages: List[Path] = typer.Argument(..., exists=True, dir_okay=False, help='Saved FantasyPros projection pages.'),
+    repeat: int = typer.Option(5, '--repeat', min=1, help='Runs per parser per page.')
+):
+    from masori.bench.parsers import benchmark_fantasypros_parsers
+
+    results = benchmark_fantasypros_parsers(pages, repeat)
+
+    if not all(result['matches'] for result in results):
+        raise typer.Exit(code=1)
+
+@bench_app.command('parse-pool')
+def bench_parse_pool(
+    pages: List[Path] = typer.Argument(..., exists=True, dir_okay=False, help='Saved FantasyPros projection pages.'),
+    position: str = typer.Option('qb', '--position', help='Position the pages are projections for.'),
+    processes: List[int] = typer.Option([], '--processes', min=1, help='Pool size to try. Repeatable, defaults to powers of two up to the core count.'),
+    copies: int = typer.Option(50, '--copies', min=1, help='Times each page is parsed per measurement.')
+):
+    from masori.bench.parsers import benchmark_parse_pool
+
+    benchmark_parse_pool(pages, position, processes, copies)
+
+BENCH_RUNNERS = ['teams', 'players', 'players-athletes', 'positions', 'seasons', 'fantasy', 'draftkings']
+
+@bench_app.command('run')
+def bench_run(
+    runner: List[str] = typer.Option(BENCH_RUNNERS, '--runner', help='Runner to benchmark. Repeatable.'),
+    fixtures: Path = typer.Option(settings.BENCH_FIXTURES_DIR, '--fixtures', help='Recorded fixture directory.'),
+    output: Path = typer.Option(Path('bench-results.json'), '--output', help='JSON file to write results to.'),
+    repeat: int = typer.Option(3, '--repeat', min=1, help='Runs per runner, the median is reported.'),
+    pg_bin: Optional[Path] = typer.Option(None, '--pg-bin', help='Directory with initdb and pg_ctl.'),
+    record_missing: bool = typer.Option(
+        True, '--record-missing/--no-record-missing',
+        help='Record runners with no fixtures from the live sources before benchmarking.'
+    )
+):
+    from masori.bench.suite import run_benchmarks
+
+    unknown = set(runner) - set(BENCH_RUNNERS)
+    if unknown:
+        raise typer.BadParameter(f'Unknown runners {sorted(unknown)}', param_hint='--runner')
+
+    try:
+        report = run_benchmarks(runner, fixtures, output, repeat, pg_bin, record_missing)
+    except FileNotFoundError as e:
+        typer.echo(str(e), err=True)
+        raise typer.Exit(code=1)
+
+    if report['fixture_server']['misses']:
+        raise typer.Exit(code=1)
+
+@bench_app.command('record')
+def bench_record(
+    runner: List[str] = typer.Option(BENCH_RUNNERS, '--runner', help='Runner to record. Repeatable.'),
+    fixtures: Path = typer.Option(settings.BENCH_FIXTURES_DIR, '--fixtures', help='Directory to record fixtures into.'),
+    pg_bin: Optional[Path] = typer.Option(None, '--pg-bin', help='Directory with initdb and pg_ctl.')
+):
+    from masori.bench.suite import record_fixtures
+
+    unknown = set(runner) - set(BENCH_RUNNERS)
+    if unknown:
+        raise typer.BadParameter(f'Unknown runners {sorted(unknown)}', param_hint='--runner')
+
+    record_fixtures(runner, fixtures, pg_bin)
+
+@bench_app.command('startup')
+def bench_startup(
+    budget_ms: Optional[float] = typer.Option(
+        None, '--budget-ms', min=1,
+        help='Allowed CLI import time in milliseconds (defaults to STARTUP_BUDGET_MS).'
+    ),
+    repeat: int = typer.Option(5, '--repeat', min=1, help='Fresh interpreters to try, the fastest counts.')
+):
+    from masori.bench.startup import check_startup
+
+    result = check_startup(budget_ms or settings.STARTUP_BUDGET_MS, repeat)
+
+    if not result['passed']:
+        raise typer.Exit(code=1)
+
 if __name__ == '__main__':
     app()
\ No newline at end of file
@@ -0,0 +1,229 @@
+"""
+Recorded HTTP payloads and a local server that replays them
+"""
+
+import re
+import gzip
+import json
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from loguru import logger
+
+NUMBER_RE = re.compile(r'\d+')
+
+
+class FixtureStore:
+    """
+    Directory of gzipped response bodies indexed by host + path + query.
+
+    index.json maps each key to its body file, content type and when it was recorded,
+    runners.json maps each runner recorded into the directory to when it was recorded.
+    """
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.index_path = self.directory / 'index.json'
+        self.runners_path = self.directory / 'runners.json'
+        self._lock = threading.Lock()
+
+        try:
+            self.index: Dict[str, Dict] = json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            self.index = {}
+
+        try:
+            self.runners: Dict[str, float] = json.loads(self.runners_path.read_text())
+        except (OSError, ValueError):
+            self.runners = {}
+
+    @staticmethod
+    def key(url: str) -> str:
+        """
+        Fixture key for a url - the scheme is dropped so http and https requests share a fixture
+        """
+        parts = urlsplit(url)
+        return f'{parts.netloc}{parts.path}' + (f'?{parts.query}' if parts.query else '')
+
+    def match(self, key: str) -> Tuple[Optional[str], bool]:
+        """
+        Finds the fixture to serve for key.
+
+        Urls embed the current season and week, so when there is no exact match a fixture
+        whose key only differs in its numbers (e.g. seasons/2025/teams for seasons/2026/teams)
+        is served instead, the most recently recorded one first.
+
+        Returns:
+            tuple - (fixture key or None, whether it was a numeric fallback)
+        """
+        if key in self.index:
+            return key, False
+
+        pattern = NUMBER_RE.sub('#', key)
+        candidates = [k for k in self.index if NUMBER_RE.sub('#', k) == pattern]
+        if not candidates:
+            return None, False
+
+        return max(candidates, key=lambda k: self.index[k]['recorded_at']), True
+
+    def read(self, key: str) -> bytes:
+        """
+        Gzipped body of a fixture
+        """
+        return (self.directory / self.index[key]['file']).read_bytes()
+
+    def save(self, key: str, content: bytes, content_type: Optional[str]) -> None:
+        """
+        Stores a body under key, replacing any earlier recording
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        file_name = f'{hashlib.sha256(key.encode()).hexdigest()[:32]}.gz'
+        (self.directory / file_name).write_bytes(gzip.compress(content, mtime=0))
+
+        with self._lock:
+            self.index[key] = {
+                'file': file_name,
+                'content_type': content_type,
+                'size': len(content),
+                'recorded_at': time.time()
+            }
+            self.index_path.write_text(json.dumps(self.index, indent=2, sort_keys=True))
+
+    def mark_recorded(self, runner: str) -> None:
+        """
+        Notes that every payload runner fetches has been recorded
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            self.runners[runner] = time.time()
+            self.runners_path.write_text(json.dumps(self.runners, indent=2, sort_keys=True))
+
+
+class FixtureServer:
+    """
+    Local HTTP/1.1 stand-in for ESPN, FantasyPros and DraftKings.
+
+    HttpSession.set_url_rewriter(server.rewrite) sends https://host/path?query to
+    http://127.0.0.1:<port>/host/path?query, which is answered from the FixtureStore.
+    In record mode misses are fetched from the real host over https and saved.
+    """
+    def __init__(self, store: FixtureStore, record: bool = False, host: str = '127.0.0.1', port: int = 0):
+        self.logger = logger
+        self.store = store
+        self.record = record
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fallbacks: List[str] = []
+        self.misses: List[str] = []
+        self.recorded: List[str] = []
+        self.upstream = requests.Session() if record else None
+
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class())
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def rewrite(self, url: str) -> str:
+        return f'{self.base_url}/{self.store.key(url)}'
+
+    def handler_class(self):
+        server = self
+
+        class FixtureHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body go out in separate writes, which Nagle would hold back
+            # for a delayed ACK and add ~40ms to every request
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                status, body, content_type = server.respond(self.path.lstrip('/'))
+
+                gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+                if not gzipped:
+                    body = gzip.decompress(body) if body else body
+
+                self.send_response(status)
+                if content_type:
+                    self.send_header('Content-Type', content_type)
+                if gzipped and body:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return FixtureHandler
+
+    def respond(self, key: str) -> Tuple[int, bytes, Optional[str]]:
+        """
+        Looks up (or records) the fixture for a request
+
+        Returns:
+            tuple - (status, gzipped body, content type)
+        """
+        match, fallback = self.store.match(key)
+
+        if self.record and fallback:
+            # record this exact url rather than reusing a neighbour's payload
+            match, fallback = None, False
+
+        if match is None and self.record:
+            resp = self.upstream.get(f'https://{key}', timeout=30)
+            if resp.status_code != 200:
+                return resp.status_code, gzip.compress(resp.content, mtime=0), resp.headers.get('Content-Type')
+            self.store.save(key, resp.content, resp.headers.get('Content-Type'))
+            with self._lock:
+                self.recorded.append(key)
+            match, fallback = key, False
+
+        if match is None:
+            self.logger.warning(f'No fixture recorded for {key}')
+            with self._lock:
+                self.misses.append(key)
+            return 404, b'', None
+
+        with self._lock:
+            self.hits += 1
+            if fallback:
+                self.fallbacks.append(key)
+
+        return 200, self.store.read(match), self.store.index[match].get('content_type')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'fallbacks': len(self.fallbacks),
+                'misses': sorted(set(self.misses)),
+                'recorded': len(self.recorded)
+            }
+
+    def start(self) -> 'FixtureServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='masori-fixtures', daemon=True)
+        self.thread.start()
+        self.logger.info(f"Serving {len(self.store.index)} fixtures from {self.store.directory} on {self.base_url}"
+                         f"{' (recording misses)' if self.record else ''}")
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'FixtureServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,132 @@
+"""
+Benchmarks the lxml FantasyPros table extractor against the original BeautifulSoup parser,
+and process-pool parsing against parsing on one thread
+"""
+
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+from loguru import logger
+
+from masori.ingest.common import Common
+from masori.ingest.fantasy import Fantasy
+from masori.ingest.transforms import RunContext
+from masori.pipeline.workers import PayloadWorker
+
+
+def time_parser(parser, content: bytes, repeat: int) -> float:
+    """
+    Best-of-repeat wall time for one parse, in seconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_fantasypros_parsers(pages: List[Path], repeat: int = 5) -> List[Dict]:
+    """
+    Parses each saved page with both implementations, checks they agree and times them
+
+    Args:
+        pages: list[Path] - saved FantasyPros projection pages
+        repeat: int - runs per parser per page, the fastest is reported
+
+    Returns:
+        list[dict] - per-page rows, timings, speedup and whether outputs matched
+    """
+    results = []
+    for page in pages:
+        content = page.read_bytes()
+
+        fast = Common.parse_fantasypros_table(content)
+        reference = Common.parse_fantasypros_table_soup(content)
+
+        lxml_s = time_parser(Common.parse_fantasypros_table, content, repeat)
+        soup_s = time_parser(Common.parse_fantasypros_table_soup, content, repeat)
+
+        result = {
+            'page': str(page),
+            'bytes': len(content),
+            'rows': len(fast),
+            'matches': fast == reference,
+            'lxml_ms': round(lxml_s * 1000, 3),
+            'bs4_ms': round(soup_s * 1000, 3),
+            'speedup': round(soup_s / lxml_s, 1) if lxml_s else None
+        }
+        logger.info(
+            f"{page.name}: {result['rows']} rows, lxml {result['lxml_ms']}ms vs bs4 {result['bs4_ms']}ms "
+            f"({result['speedup']}x), outputs {'match' if result['matches'] else 'DIFFER'}"
+        )
+        results.append(result)
+
+    return results
+
+
+def benchmark_parse_pool(pages: List[Path], position: str, process_counts: List[int], copies: int) -> List[Dict]:
+    """
+    Parses and transforms copies of each saved page on one thread, then through process
+    pools of each size, the way a pipeline with PARSE_PROCESSES does
+
+    Args:
+        pages: list[Path] - saved FantasyPros projection pages
+        position: str - position the pages are for, picks the row converter
+        process_counts: list[int] - pool sizes to try, defaults to powers of two up to the core count
+        copies: int - times each page is parsed per measurement
+
+    Returns:
+        list[dict] - per pool size pages/s, speedup over one thread and parallel efficiency
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    if not process_counts:
+        process_counts = [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= max(cores, 2)]
+
+    context = RunContext.current()
+    payloads = [{'content': page.read_bytes(), 'context': context} for page in pages] * copies
+    worker = PayloadWorker(Common.parse_fantasypros_payload, Fantasy.results_with_context,
+                           Fantasy().context_converter(position))
+
+    start = time.perf_counter()
+    rows = sum(len(batch.values) for batch in map(worker, payloads))
+    serial_s = time.perf_counter() - start
+    logger.info(f'{cores} cores available. 1 thread: {len(payloads)} pages, {rows} rows in {serial_s:.2f}s '
+                f'({len(payloads) / serial_s:.1f} pages/s)')
+
+    results = [{'processes': 0, 'cores': cores, 'seconds': round(serial_s, 3),
+                'pages_per_s': round(len(payloads) / serial_s, 1), 'speedup': 1.0, 'efficiency': None}]
+
+    for processes in process_counts:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('forkserver')) as pool:
+            # start the workers and import the parsers before timing
+            list(pool.map(worker, payloads[:processes]))
+
+            start = time.perf_counter()
+            pooled_rows = sum(len(batch.values) for batch in pool.map(worker, payloads))
+            pool_s = time.perf_counter() - start
+
+        speedup = serial_s / pool_s
+        result = {
+            'processes': processes,
+            'cores': cores,
+            'seconds': round(pool_s, 3),
+            'pages_per_s': round(len(payloads) / pool_s, 1),
+            'speedup': round(speedup, 2),
+            'efficiency': round(speedup / min(processes, cores), 2),
+            'rows_match': pooled_rows == rows
+        }
+        logger.info(
+            f"{processes} processes: {pool_s:.2f}s ({result['pages_per_s']} pages/s), {result['speedup']}x one thread, "
+            f"{result['efficiency']:.0%} parallel efficiency"
+        )
+        results.append(result)
+
+    return results
@@ -0,0 +1,138 @@
+"""
+Throwaway local postgres cluster for benchmarks
+"""
+
+import os
+import shutil
+import socket
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+from psycopg2 import connect, sql
+
+from masori.config import settings
+from masori.db.database import Database
+
+
+class TemporaryPostgres:
+    """
+    Runs initdb + pg_ctl in a temp directory and points settings at the new cluster
+    until exit, so benchmarks never write to the configured database.
+
+    initdb refuses to run as root, so run the benchmark as an unprivileged user.
+    """
+    USER = 'masori'
+
+    def __init__(self, bin_dir: Optional[Path] = None):
+        self.logger = logger
+        self.bin_dir = Path(bin_dir) if bin_dir else (Path(settings.BENCH_PG_BIN) if settings.BENCH_PG_BIN else None)
+        self.workdir: Optional[Path] = None
+        self.port: Optional[int] = None
+        self.saved = {}
+
+    def binary(self, name: str) -> str:
+        """
+        Path to a postgres server binary, from bin_dir or PATH
+        """
+        if self.bin_dir is not None:
+            path = self.bin_dir / name
+            if path.exists():
+                return str(path)
+        else:
+            found = shutil.which(name)
+            if found:
+                return found
+
+        raise FileNotFoundError(f'Could not find {name} - install postgres server binaries or set BENCH_PG_BIN')
+
+    @staticmethod
+    def free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+    def start(self) -> 'TemporaryPostgres':
+        if hasattr(os, 'geteuid') and os.geteuid() == 0:
+            raise RuntimeError('initdb cannot run as root - run the benchmark as an unprivileged user')
+
+        self.workdir = Path(tempfile.mkdtemp(prefix='masori-bench-pg-'))
+        self.port = self.free_port()
+        data = self.workdir / 'data'
+
+        subprocess.run(
+            [self.binary('initdb'), '-D', str(data), '-U', self.USER, '-A', 'trust', '-E', 'UTF8', '--no-sync'],
+            check=True, capture_output=True
+        )
+        subprocess.run(
+            [
+                self.binary('pg_ctl'), '-D', str(data), '-l', str(self.workdir / 'postgres.log'), '-w',
+                '-o', f"-p {self.port} -k {self.workdir} -c listen_addresses=127.0.0.1", 'start'
+            ],
+            check=True, capture_output=True
+        )
+
+        # CREATE DATABASE can't run inside the transaction `with conn` opens
+        conn = connect(host='127.0.0.1', port=self.port, dbname='postgres', user=self.USER)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL('CREATE DATABASE {}').format(sql.Identifier(settings.DB_NAME)))
+        finally:
+            conn.close()
+
+        for name, value in {'DB_HOST': '127.0.0.1', 'DB_PORT': str(self.port), 'DB_USER': self.USER, 'DB_PASSWORD': ''}.items():
+            self.saved[name] = getattr(settings, name)
+            setattr(settings, name, value)
+
+        Database.close_pool()
+        Database.clear_schema_cache()
+        self.logger.info(f'Started throwaway postgres on port {self.port} in {self.workdir}')
+
+        return self
+
+    def reset(self) -> None:
+        """
+        Drops every schema the pipelines created so the next run loads into empty tables
+        """
+        with Database().db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT nspname FROM pg_namespace
+                    WHERE nspname NOT IN ('public', 'information_schema')
+                    AND nspname NOT LIKE 'pg\\_%'
+                    """)
+                for (schema,) in cur.fetchall():
+                    cur.execute(sql.SQL('DROP SCHEMA {} CASCADE').format(sql.Identifier(schema)))
+            conn.commit()
+
+        Database.clear_schema_cache()
+
+    def stop(self) -> None:
+        Database.close_pool()
+        Database.clear_schema_cache()
+
+        for name, value in self.saved.items():
+            setattr(settings, name, value)
+        self.saved = {}
+
+        if self.workdir is not None:
+            if (self.workdir / 'data' / 'postmaster.pid').exists():
+                subprocess.run(
+                    [self.binary('pg_ctl'), '-D', str(self.workdir / 'data'), '-m', 'immediate', '-w', 'stop'],
+                    capture_output=True
+                )
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            self.workdir = None
+
+    def __enter__(self) -> 'TemporaryPostgres':
+        try:
+            return self.start()
+        except Exception:
+            self.stop()
+            raise
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
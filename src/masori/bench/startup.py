@@ -0,0 +1,108 @@
+"""
+Import-time budget check for the masori CLI
+"""
+
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+from loguru import logger
+
+import masori
+
+# none of these should load before a command actually runs
+HEAVY_MODULES = ('requests', 'urllib3', 'psycopg2', 'lxml', 'bs4', 'loguru')
+
+PROBE = (
+    'import sys, time, json\n'
+    't = time.perf_counter()\n'
+    'import masori.__main__\n'
+    'print(json.dumps({"seconds": time.perf_counter() - t, "modules": sorted(sys.modules)}))\n'
+)
+
+
+def subprocess_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    src = str(Path(masori.__file__).resolve().parent.parent)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [src, env.get('PYTHONPATH')]))
+    return env
+
+
+def slowest_imports(limit: int = 10) -> List[Dict]:
+    """
+    Runs `python -X importtime` on the CLI module and returns the slowest top-level imports
+
+    Returns:
+        list[dict] - module and cumulative milliseconds, slowest first
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import masori.__main__'],
+        env=subprocess_env(), capture_output=True, text=True, check=True
+    )
+
+    # importtime lists children before their parent, so collect direct children
+    # until the top-level line they belong to shows up
+    imports, children = [], []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        depth = len(name) - len(name.lstrip())
+        entry = {'module': name.strip(), 'ms': round(int(cumulative) / 1000, 1)}
+
+        if depth == 3:
+            children.append(entry)
+        elif depth == 1:
+            if entry['module'] == 'masori.__main__':
+                imports = [entry] + children
+            children = []
+
+    return sorted(imports, key=lambda i: i['ms'], reverse=True)[:limit]
+
+
+def check_startup(budget_ms: float, repeat: int = 5) -> Dict:
+    """
+    Imports the CLI in fresh interpreters and compares the fastest import to budget_ms.
+    Also fails if any of HEAVY_MODULES got imported, since that is what regresses startup.
+
+    Args:
+        budget_ms: float - allowed import time for masori.__main__ in milliseconds
+        repeat: int - fresh interpreters to try, the fastest is compared
+
+    Returns:
+        Dict - best_ms, budget_ms, heavy modules loaded, slowest imports and whether it passed
+    """
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE],
+            env=subprocess_env(), capture_output=True, text=True, check=True
+        )
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    best_ms = min(run['seconds'] for run in runs) * 1000
+    heavy = sorted({
+        module.split('.')[0] for run in runs for module in run['modules']
+        if module.split('.')[0] in HEAVY_MODULES
+    })
+
+    result = {
+        'best_ms': round(best_ms, 1),
+        'budget_ms': budget_ms,
+        'heavy_modules': heavy,
+        'slowest_imports': slowest_imports(),
+        'passed': best_ms <= budget_ms and not heavy
+    }
+
+    logger.info(f"masori CLI imports in {result['best_ms']}ms (budget {budget_ms}ms, best of {repeat})")
+    for entry in result['slowest_imports']:
+        logger.info(f"  {entry['module']:<32} {entry['ms']}ms")
+    if heavy:
+        logger.error(f'CLI startup imports {heavy} - import them inside the command that needs them')
+    if best_ms > budget_ms:
+        logger.error(f"CLI startup is over budget by {best_ms - budget_ms:.1f}ms")
+
+    return result
@@ -0,0 +1,240 @@
+"""
+Offline end-to-end benchmark of every pipeline runner against recorded fixtures
+"""
+
+import sys
+import json
+import time
+import platform
+import tempfile
+import statistics
+import subprocess
+from contextlib import contextmanager
+from functools import partial
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from masori.config import settings, BASE_DIR
+from masori.ingest.session import get_session
+from masori.ingest.resolver import get_resolver
+from masori.bench.fixtures import FixtureStore, FixtureServer
+from masori.bench.postgres import TemporaryPostgres
+from masori.pipeline.players import PlayerPipelineRunner
+from masori.pipeline.teams import TeamPipelineRunner
+from masori.pipeline.positions import PositionsPipelineRunner
+from masori.pipeline.seasons import SeasonsPipelineRunner
+from masori.pipeline.fantasy import FantasyPipelineRunner
+from masori.pipeline.draftkings import DraftkingsPipelineRunner
+
+RUNNERS = {
+    'teams': TeamPipelineRunner,
+    'players': partial(PlayerPipelineRunner, source='rosters'),
+    # same table from the core API athletes listing, to compare against the per-team rosters
+    'players-athletes': partial(PlayerPipelineRunner, source='athletes'),
+    'positions': PositionsPipelineRunner,
+    'seasons': SeasonsPipelineRunner,
+    'fantasy': FantasyPipelineRunner,
+    'draftkings': DraftkingsPipelineRunner
+}
+
+
+@contextmanager
+def offline_session(server: FixtureServer) -> Iterator[None]:
+    """
+    Routes the shared HttpSession to the fixture server with the response cache off,
+    so every run downloads, parses and loads every payload. Rate limiting is off too,
+    the fixture server doesn't push back and the limits would only measure themselves,
+    and so is the landing zone, fixtures don't need landing again. Checkpoints and
+    Prometheus textfiles go to a temporary directory, so a benchmark neither replaces
+    a pending `--resume` checkpoint nor reports its runs as production ones.
+    """
+    session = get_session()
+    cache, limiter, landing = session.cache, session.limiter, session.landing
+    checkpoint_dir, textfile_dir = settings.CHECKPOINT_DIR, settings.PROMETHEUS_TEXTFILE_DIR
+    scratch = tempfile.TemporaryDirectory(prefix='masori-bench-')
+    session.cache = None
+    session.limiter = None
+    session.landing = None
+    settings.CHECKPOINT_DIR = Path(scratch.name) / 'checkpoints'
+    settings.PROMETHEUS_TEXTFILE_DIR = str(Path(scratch.name) / 'prometheus')
+    session.set_url_rewriter(server.rewrite)
+    try:
+        yield
+    finally:
+        session.set_url_rewriter(None)
+        session.cache = cache
+        session.limiter = limiter
+        session.landing = landing
+        settings.CHECKPOINT_DIR = checkpoint_dir
+        settings.PROMETHEUS_TEXTFILE_DIR = textfile_dir
+        scratch.cleanup()
+
+
+def request_count() -> int:
+    """
+    Requests the shared session has made so far, over every host
+    """
+    return sum(stat['requests'] for stat in get_session().stats.snapshot().values())
+
+
+def merge_runs(pipelines: List[Dict]) -> Dict[str, Any]:
+    """
+    Sums the stage timings and counters of every pipeline a runner ran
+    """
+    stages: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for result in pipelines:
+        for stage, seconds in result['stages'].items():
+            stages[stage] = stages.get(stage, 0.0) + seconds
+        for name, n in result['counts'].items():
+            counts[name] = counts.get(name, 0) + n
+
+    return {'stages': stages, 'counts': counts}
+
+
+def summarise(runs: List[Dict]) -> Dict[str, Any]:
+    """
+    Median wall time, requests and stage timings over the repeats, with records/s per stage
+    """
+    stages = {
+        stage: round(statistics.median(run['stages'].get(stage, 0.0) for run in runs), 4)
+        for stage in runs[0]['stages']
+    }
+    records = runs[-1]['counts'].get('records_out', 0)
+
+    return {
+        'wall_seconds': round(statistics.median(run['wall_seconds'] for run in runs), 4),
+        'requests': statistics.median(run['requests'] for run in runs),
+        'stages': stages,
+        'records_per_second': {
+            stage: round(records / seconds, 1) for stage, seconds in stages.items()
+            if seconds > 0 and stage != 'ids'
+        },
+        'counts': runs[-1]['counts']
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, check=True, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(runners: List[str], fixtures: Path, output: Path, repeat: int = 3,
+                   pg_bin: Optional[Path] = None, record_missing: bool = True) -> Dict[str, Any]:
+    """
+    Times each runner stage by stage against recorded payloads and a throwaway postgres,
+    and writes the results to output as JSON. Runners with no fixtures yet are recorded
+    against the live sources first, so a fresh checkout only needs network access once.
+
+    Args:
+        runners: list[str] - names from RUNNERS to benchmark, in order
+        fixtures: Path - directory recorded with record_fixtures
+        output: Path - JSON file to write
+        repeat: int - runs per runner, every run loads into empty tables
+        pg_bin: Path - directory with initdb / pg_ctl (defaults to BENCH_PG_BIN or PATH)
+        record_missing: bool - record runners that have no fixtures instead of failing
+
+    Returns:
+        Dict - the report written to output
+
+    Raises:
+        FileNotFoundError - when a runner has no recorded fixtures and record_missing is off,
+                            before anything is started
+    """
+    store = FixtureStore(fixtures)
+    missing = [name for name in runners if name not in store.runners]
+    if missing and record_missing:
+        logger.info(f'No fixtures recorded for {missing} in {fixtures}, recording them from the live sources first')
+        record_fixtures(missing, fixtures, pg_bin)
+        store = FixtureStore(fixtures)
+    elif missing:
+        options = ' '.join(f'--runner {name}' for name in missing)
+        raise FileNotFoundError(
+            f'No fixtures recorded for {missing} in {fixtures} - run `masori bench record {options}` first'
+        )
+
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'fixtures': str(fixtures),
+        'repeat': repeat,
+        'settings': {
+            'EXTRACT_MAX_WORKERS': settings.EXTRACT_MAX_WORKERS,
+            'PIPELINE_STREAMING': settings.PIPELINE_STREAMING,
+            'LOAD_BATCH_SIZE': settings.LOAD_BATCH_SIZE,
+            'DB_LOAD_MODE': settings.DB_LOAD_MODE
+        },
+        'runners': {}
+    }
+
+    with TemporaryPostgres(pg_bin) as pg, FixtureServer(store) as server, offline_session(server):
+        for name in runners:
+            runs = []
+            for i in range(repeat):
+                pg.reset()
+                # every run starts cold, like a fresh `masori` process
+                get_resolver().clear()
+                requests_before = request_count()
+                start = time.perf_counter()
+                pipelines = RUNNERS[name]().run()
+                wall = time.perf_counter() - start
+
+                runs.append({
+                    'wall_seconds': round(wall, 4),
+                    'requests': request_count() - requests_before,
+                    **merge_runs(pipelines),
+                    'pipelines': pipelines
+                })
+                logger.info(f'Benchmark {name} run {i + 1}/{repeat}: {wall:.2f}s')
+
+            report['runners'][name] = {**summarise(runs), 'runs': runs}
+
+        report['fixture_server'] = server.stats()
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    for name, result in report['runners'].items():
+        stages = ', '.join(f'{stage} {seconds:.3f}s' for stage, seconds in result['stages'].items())
+        logger.info(f"{name:<16} {result['wall_seconds']:.3f}s wall, {result['requests']:g} requests ({stages})")
+    if report['fixture_server']['misses']:
+        logger.warning(f"Requests with no recorded fixture: {report['fixture_server']['misses']}, "
+                       f"re-record the runners that made them with `masori bench record`")
+    logger.info(f'Wrote benchmark results to {output}')
+
+    return report
+
+
+def record_fixtures(runners: List[str], fixtures: Path, pg_bin: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Runs each runner once against the live sources through a recording fixture server,
+    loading into a throwaway postgres, and saves every payload it fetched
+
+    Args:
+        runners: list[str] - names from RUNNERS to record
+        fixtures: Path - directory to save fixtures to, existing recordings are kept
+        pg_bin: Path - directory with initdb / pg_ctl (defaults to BENCH_PG_BIN or PATH)
+
+    Returns:
+        Dict - fixture server stats
+    """
+    store = FixtureStore(fixtures)
+
+    with TemporaryPostgres(pg_bin), FixtureServer(store, record=True) as server, offline_session(server):
+        for name in runners:
+            RUNNERS[name]().run()
+            store.mark_recorded(name)
+        stats = server.stats()
+
+    logger.info(f"Recorded {stats['recorded']} new fixtures into {fixtures} ({len(store.index)} total)")
+
+    return stats
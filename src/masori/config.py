@@ -27,6 +27,85 @@ class Settings:
     PG_USER = os.getenv('POSTGRES_USER', None)
     PG_PASSWORD = os.getenv('POSTGRES_PASSWORD', None)
 
+    # pipeline tuning
+    EXTRACT_MAX_WORKERS = int(os.getenv('EXTRACT_MAX_WORKERS', '8'))
+    # stream transformed rows to a writer thread in micro-batches instead of one load at the end
+    PIPELINE_STREAMING = os.getenv('PIPELINE_STREAMING', 'false').lower() == 'true'
+    LOAD_BATCH_SIZE = int(os.getenv('LOAD_BATCH_SIZE', '5000'))
+    # latest seasons the seasons pipeline loads
+    SEASONS_MAX_COUNT = int(os.getenv('SEASONS_MAX_COUNT', '5'))
+    # record each ID as its batch commits so `masori --resume` can pick up an unfinished run
+    CHECKPOINT_ENABLED = os.getenv('CHECKPOINT_ENABLED', 'true').lower() == 'true'
+    CHECKPOINT_DIR = Path(os.getenv('CHECKPOINT_DIR', BASE_DIR / '.cache' / 'checkpoints'))
+    PIPELINE_RESUME = os.getenv('PIPELINE_RESUME', 'false').lower() == 'true'
+    # every fetched body is gzipped into a content-addressed store with a manifest per run
+    LANDING_ENABLED = os.getenv('LANDING_ENABLED', 'false').lower() == 'true'
+    LANDING_DIR = Path(os.getenv('LANDING_DIR', BASE_DIR / '.cache' / 'landing'))
+    # landed runs kept per pipeline, older runs and the bodies only they used are deleted, 0 keeps all
+    LANDING_KEEP_RUNS = int(os.getenv('LANDING_KEEP_RUNS', '10'))
+    # run ID or 'latest': re-run slice / transform / load from that run's landed bodies, no network
+    PIPELINE_REPLAY = os.getenv('PIPELINE_REPLAY', None)
+    # pipelines `masori all` runs at once
+    SCHEDULER_CONCURRENCY = int(os.getenv('SCHEDULER_CONCURRENCY', '4'))
+    # worker processes parsing and transforming payloads of pipelines that support it (FantasyPros):
+    # '0' parses on the extract threads, 'auto' uses all cores but one
+    PARSE_PROCESSES = os.getenv('PARSE_PROCESSES', '0')
+
+    # connection pool shared by every Database() in the process
+    DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+    DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '8'))
+
+    # 'bulk' (COPY into staging + one merge) or 'row' (one upsert per row)
+    DB_LOAD_MODE = os.getenv('DB_LOAD_MODE', 'bulk')
+
+    # http session tuning
+    HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '30'))
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '16'))
+    # host glob=requests per second[:burst[:max concurrent requests]], first match wins. Each host
+    # starts at its ceiling, halves on 429 / 503 / Retry-After and climbs back while requests succeed.
+    # Empty disables rate limiting.
+    HTTP_RATE_LIMITS = os.getenv(
+        'HTTP_RATE_LIMITS',
+        '*.espn.com=50:50:16,'
+        '*.fantasypros.com=5:5:4,'
+        '*.draftkings.com=10:10:4,'
+        '*=20:20:8'
+    )
+    # times a 429 / 503 response is retried once the host's limiter allows it
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+
+    # on-disk conditional-GET response cache
+    HTTP_CACHE_ENABLED = os.getenv('HTTP_CACHE_ENABLED', 'true').lower() == 'true'
+    HTTP_CACHE_DIR = Path(os.getenv('HTTP_CACHE_DIR', BASE_DIR / '.cache' / 'http'))
+    HTTP_CACHE_MAX_MB = int(os.getenv('HTTP_CACHE_MAX_MB', '256'))
+    # url glob=seconds served without revalidating, first match wins, everything else revalidates
+    HTTP_CACHE_TTLS = os.getenv(
+        'HTTP_CACHE_TTLS',
+        '*/nfl/teams/*/roster*=0,'
+        '*/nfl/teams*=86400,'
+        '*/nfl/positions*=604800,'
+        '*/nfl/seasons*=86400'
+    )
+    # skip slice/transform/load for IDs whose payload is identical to the last loaded one
+    SKIP_UNCHANGED = os.getenv('SKIP_UNCHANGED', 'true').lower() == 'true'
+    # only reload rosters whose athletes changed since the last load, team IDs come from reference.teams
+    PLAYERS_INCREMENTAL = os.getenv('PLAYERS_INCREMENTAL', 'true').lower() == 'true'
+    # 'rosters' (one request per team) or 'athletes' (paginated core API listing, one request per athlete)
+    PLAYERS_SOURCE = os.getenv('PLAYERS_SOURCE', 'rosters')
+
+    # per-run stage timings and counters, saved to masori_meta.pipeline_runs
+    METRICS_DB_ENABLED = os.getenv('METRICS_DB_ENABLED', 'true').lower() == 'true'
+    # node_exporter textfile collector directory, no .prom files are written if unset
+    PROMETHEUS_TEXTFILE_DIR = os.getenv('PROMETHEUS_TEXTFILE_DIR', None)
+
+    # offline benchmark suite (`masori bench run`)
+    BENCH_FIXTURES_DIR = Path(os.getenv('BENCH_FIXTURES_DIR', BASE_DIR / 'bench' / 'fixtures'))
+    # `masori bench startup` fails when importing the CLI takes longer than this
+    STARTUP_BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', '150'))
+    # directory holding initdb / pg_ctl for the throwaway benchmark database, searched on PATH if unset
+    BENCH_PG_BIN = os.getenv('BENCH_PG_BIN', None)
+
     def update_db_password(self, new_pw: str) -> None:
         set_key(ENV_PATH, "DB_PASSWORD", new_pw)
         self.DB_PASSWORD = new_pw
@@ -3,15 +3,24 @@ Handles database-related functionality
 """
 import string
 import secrets
+import time
+import atexit
+import threading
+import io
+import csv
+import json
+import hashlib
 import psycopg2
 from typing import TypedDict, Optional, List, Dict
 from psycopg2 import OperationalError, connect, sql
 from psycopg2.errors import InvalidSchemaName
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 from datetime import datetime
 import loguru
 from contextlib import contextmanager
 
 from masori.config import settings
+from masori.db.pool import ConnectionPool
 
 class PGCredentials(TypedDict):
     dbname: str
@@ -20,7 +29,49 @@ class PGCredentials(TypedDict):
     host: str
     port: str
 
+class CopyRowStream(io.TextIOBase):
+    """
+    File-like object that renders rows as CSV on demand for COPY ... FROM STDIN,
+    so the batch is never materialised as one big string
+    """
+    def __init__(self, rows: List[Dict], column_names: List[str]):
+        self.rows = iter(rows)
+        self.column_names = column_names
+        self.buffer = io.StringIO()
+        # QUOTE_NOTNULL leaves None unquoted so COPY reads it as NULL, while '' stays an empty string
+        self.writer = csv.writer(self.buffer, quoting=csv.QUOTE_NOTNULL, lineterminator='\n')
+        self.pending = ''
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.pending) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.writer.writerow([row.get(col) for col in self.column_names])
+            self.pending += self.buffer.getvalue()
+            self.buffer.seek(0)
+            self.buffer.truncate()
+
+        if size < 0:
+            chunk, self.pending = self.pending, ''
+        else:
+            chunk, self.pending = self.pending[:size], self.pending[size:]
+        return chunk
+
+
 class Database:
+    _pool: Optional[ConnectionPool] = None
+    _pool_lock = threading.Lock()
+    _atexit_registered = False
+    _schema_cache: Dict[tuple, Dict[str, str]] = {}
+    _schema_lock = threading.Lock()
+
+    # content hash of each row's non-key columns, maintained on every upsert
+    ROW_HASH_COLUMN = 's_row_hash'
+
     def __init__(self):
         self.logger = loguru.logger
         self.db_host = settings.DB_HOST
@@ -87,6 +138,8 @@ class Database:
                     self.update_db_user_password(new_pw)
                     self.logger.info('Successfully changed password as super user. Updating .env file')
                     settings.update_db_password(new_pw)
+                    self.db_password = new_pw
+                    Database.close_pool()
                     self.logger.info('Rotation complete.')
                 except Exception as e:
                     self.logger.info(f'Error updating password in database - {e}')
@@ -151,15 +204,63 @@ class Database:
 
         return conn
 
+    def get_pool(self) -> ConnectionPool:
+        """
+        Returns the process-wide connection pool shared by every Database instance,
+        creating it on first use
+
+        Returns:
+            ConnectionPool
+        """
+        if Database._pool is None:
+            with Database._pool_lock:
+                if Database._pool is None:
+                    Database._pool = ConnectionPool(
+                        minconn=settings.DB_POOL_MIN,
+                        maxconn=settings.DB_POOL_MAX,
+                        **self.get_pg_creds()
+                    )
+                    # close_pool drops the pool, the next get_pool recreates it under the same hook
+                    if not Database._atexit_registered:
+                        atexit.register(Database.close_pool)
+                        Database._atexit_registered = True
+
+        return Database._pool
+
+    @classmethod
+    def close_pool(cls) -> None:
+        """
+        Closes every pooled connection, e.g. after a password rotation or at exit
+        """
+        with cls._pool_lock:
+            if cls._pool is not None:
+                cls._pool.closeall()
+                cls._pool = None
+
+    def log_pool_stats(self) -> None:
+        """
+        Logs connection checkout wait times so the pool can be sized
+        """
+        if Database._pool is None:
+            return
+
+        stats = Database._pool.stats()
+        self.logger.info(
+            f"DB pool: {stats['checkouts']} checkouts, avg wait {stats['wait_avg'] * 1000:.1f}ms, "
+            f"max wait {stats['wait_max'] * 1000:.1f}ms (maxconn {stats['maxconn']})"
+        )
+
     @contextmanager
     def db_connection(self):
-        creds = self.get_pg_creds()
-        conn = self.get_db_connection(creds)
+        pool = self.get_pool()
+        conn = pool.getconn()
         try:
             yield conn
         finally:
-            if conn:
-                conn.close()
+            # never hand a connection with an open or failed transaction to the next caller
+            if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            pool.putconn(conn)
 
 
     def infer_postgres_type(self, value) -> str:
@@ -180,10 +281,413 @@ class Database:
         else:
             return None
 
-    def upsert_table(self, database: str, schema: str, table_name: str, 
-                     rows: List[Dict], partition_keys: List[str]) -> None:
+    @staticmethod
+    def is_loadable(row: Dict, partition_keys: List[str]) -> bool:
+        """
+        Whether a row is non-empty and has every partition key, see prepare_rows
+        """
+        return bool(row) and all(row.get(key) is not None for key in partition_keys)
+
+    def prepare_rows(self, rows: List[Dict], partition_keys: List[str]) -> List[Dict]:
+        """
+        Drops empty rows and rows missing a partition key, then removes duplicate
+        partition keys within the batch (last one wins)
+
+        Args:
+            rows: list[dict] - transformed rows
+            partition_keys: list[str] - key identifiers rows are unique on
+
+        Returns:
+            list[dict] - rows that can be loaded
+        """
+        deduped = {}
+        skipped = 0
+
+        for row in rows:
+            if not self.is_loadable(row, partition_keys):
+                skipped += 1
+                continue
+
+            key = tuple(row[k] for k in partition_keys) if partition_keys else len(deduped)
+            deduped.pop(key, None)
+            deduped[key] = row
+
+        if skipped:
+            self.logger.warning(f'Skipped {skipped} empty rows or rows missing partition keys {partition_keys}')
+
+        duplicates = len(rows) - skipped - len(deduped)
+        if duplicates:
+            self.logger.info(f'Removed {duplicates} duplicate partition keys from batch (last one wins)')
+
+        return list(deduped.values())
+
+    def create_table(self, conn, cur, schema: str, table_name: str,
+                     rows: List[Dict], partition_keys: List[str]) -> List[str]:
+        """
+        Infers column types from the rows and creates the table (and schema) if it doesn't exist
+
+        Args:
+            conn: psycopg2 connection
+            cur: psycopg2 cursor
+            schema: str - schema to add table to
+            table_name: str - name of table to create
+            rows: list[dict] - data used to infer the schema
+            partition_keys: list[str] - columns for the primary key
+
+        Returns:
+            list[str] - column names of the table in insert order
+        """
+        schema_row = None
+        for row in rows:
+            if any(val is not None for val in row.values()):
+                schema_row = dict(row)
+                break
+
+        if schema_row is None:
+            raise ValueError("No valid rows found to infer schema.")
+
+        for r in rows:
+            for k, v in schema_row.items():
+                if v is None and r.get(k) is not None:
+                    schema_row[k] = r[k]
+
+        column_names = list(schema_row.keys())
+
+        inferred_types = [
+            self.infer_postgres_type(schema_row[col])
+            for col in column_names
+        ]
+
+        self.logger.debug(f"inferred types for {schema}.{table_name}: {dict(zip(column_names, inferred_types))}")
+
+        column_defs = [
+            sql.SQL("{} {}").format(
+                sql.Identifier(name),
+                sql.SQL(col_type or "TEXT")
+            )
+            for name, col_type in zip(column_names, inferred_types)
+        ]
+
+        if partition_keys:
+            pk_constraint = sql.SQL("PRIMARY KEY ({})").format(
+                sql.SQL(', ').join(map(sql.Identifier, partition_keys))
+            )
+            column_defs.append(pk_constraint)
+
+        create_table_query = sql.SQL("CREATE TABLE IF NOT EXISTS {} ({})").format(
+            sql.Identifier(schema, table_name),
+            sql.SQL(", ").join(column_defs)
+        )
+
+        # IF NOT EXISTS still races on the catalog's unique indexes when concurrent
+        # pipelines create the same schema or table, so DDL per schema is serialised
+        lock_query = "SELECT pg_advisory_xact_lock(hashtext(%s))"
+
+        try:
+            cur.execute(lock_query, (f'masori.ddl.{schema}',))
+            cur.execute(create_table_query)
+
+        except InvalidSchemaName:
+            conn.rollback()
+            self.logger.info(f"Schema {schema} doesn't exist - creating now.")
+            create_schema_query = sql.SQL('CREATE SCHEMA IF NOT EXISTS {}').format(
+                sql.Identifier(schema)
+            )
+            cur.execute(lock_query, (f'masori.ddl.{schema}',))
+            cur.execute(create_schema_query)
+            cur.execute(create_table_query)
+
+        return column_names
+
+    def get_table_columns(self, cur, schema: str, table_name: str) -> Optional[Dict[str, str]]:
+        """
+        Reads a table's columns from information_schema
+
+        Args:
+            cur: psycopg2 cursor
+            schema: str - schema of table
+            table_name: str - table name
+
+        Returns:
+            Dict[str, str] - column name -> data type in ordinal order, or None if the table doesn't exist
+        """
+        cur.execute("""
+            SELECT column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s
+            ORDER BY ordinal_position
+            """, (schema, table_name))
+
+        result = cur.fetchall()
+
+        return {name: data_type for name, data_type in result} if result else None
+
+    def add_columns(self, cur, schema: str, table_name: str,
+                    rows: List[Dict], new_columns: List[str]) -> Dict[str, str]:
+        """
+        Adds columns that showed up in the rows but not in the table, inferring their types from the rows
+
+        Args:
+            cur: psycopg2 cursor
+            schema: str - schema of table
+            table_name: str - table name
+            rows: list[dict] - data used to infer column types
+            new_columns: list[str] - columns to add
+
+        Returns:
+            Dict[str, str] - added column name -> type
+        """
+        added = {}
+        for col in new_columns:
+            value = next((row[col] for row in rows if row.get(col) is not None), None)
+            col_type = self.infer_postgres_type(value) or "TEXT"
+
+            cur.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} {}").format(
+                sql.Identifier(schema, table_name),
+                sql.Identifier(col),
+                sql.SQL(col_type)
+            ))
+            added[col] = col_type.lower()
+
+        self.logger.info(f"Added columns {added} to {schema}.{table_name}")
+
+        return added
+
+    def invalidate_schema_cache(self, schema: str, table_name: str) -> None:
+        with Database._schema_lock:
+            Database._schema_cache.pop((schema, table_name), None)
+
+    @classmethod
+    def clear_schema_cache(cls) -> None:
+        """
+        Forgets every cached table layout, e.g. after schemas were dropped outside of upsert_table
+        """
+        with cls._schema_lock:
+            cls._schema_cache.clear()
+
+    def ensure_table(self, conn, cur, schema: str, table_name: str,
+                     rows: List[Dict], partition_keys: List[str]) -> List[str]:
+        """
+        Makes sure the table exists with a column for every key in the rows.
+
+        Table columns are cached per process from information_schema, so once a table exists
+        the steady-state path runs no type inference and no DDL. Keys that aren't in the table
+        yet are added with ALTER TABLE ... ADD COLUMN.
+
+        Args:
+            conn: psycopg2 connection
+            cur: psycopg2 cursor
+            schema: str - schema of table
+            table_name: str - table name
+            rows: list[dict] - data to be loaded
+            partition_keys: list[str] - columns for the primary key if the table is created
+
+        Returns:
+            list[str] - columns to load, in the order they first appear in the rows
+        """
+        row_columns = {}
+        for row in rows:
+            for col in row:
+                if col not in row_columns:
+                    row_columns[col] = None
+
+        with Database._schema_lock:
+            table_columns = Database._schema_cache.get((schema, table_name))
+
+        if table_columns is None:
+            table_columns = self.get_table_columns(cur, schema, table_name)
+
+            if table_columns is None:
+                self.create_table(conn, cur, schema, table_name, rows, partition_keys)
+                table_columns = self.get_table_columns(cur, schema, table_name) or {}
+
+        new_columns = [col for col in row_columns if col not in table_columns]
+        if new_columns:
+            table_columns = {**table_columns, **self.add_columns(cur, schema, table_name, rows, new_columns)}
+
+        with Database._schema_lock:
+            Database._schema_cache[(schema, table_name)] = table_columns
+
+        return list(row_columns)
+
+    def add_row_hashes(self, rows: List[Dict], partition_keys: List[str]) -> List[Dict]:
+        """
+        Adds a content hash of each row's non-key values, used to skip updates that change nothing
+
+        Args:
+            rows: list[dict] - rows to hash
+            partition_keys: list[str] - key columns, left out of the hash
+
+        Returns:
+            list[dict] - copies of the rows with ROW_HASH_COLUMN set
+        """
+        excluded = set(partition_keys) | {self.ROW_HASH_COLUMN}
+        ret = []
+        for row in rows:
+            content = {k: v for k, v in row.items() if k not in excluded}
+            digest = hashlib.md5(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+            ret.append({**row, self.ROW_HASH_COLUMN: digest})
+        return ret
+
+    def build_upsert_query(self, target: sql.Composable, source: sql.Composable,
+                           column_names: List[str], partition_keys: List[str]) -> sql.Composed:
+        """
+        Builds an INSERT ... ON CONFLICT statement that only rewrites rows whose content hash
+        changed, returning one row per insert or update with inserted = true/false
+
+        Args:
+            target: sql.Composable - table to insert into
+            source: sql.Composable - VALUES (...) or SELECT ... clause providing the rows
+            column_names: list[str] - columns to insert
+            partition_keys: list[str] - conflict target
+
+        Returns:
+            sql.Composed - upsert statement
+        """
+        update_cols = [
+            sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(col), sql.Identifier(col))
+            for col in column_names if col not in partition_keys
+        ]
+
+        if not update_cols:
+            conflict_action = sql.SQL("DO NOTHING")
+        elif self.ROW_HASH_COLUMN in column_names:
+            conflict_action = sql.SQL("DO UPDATE SET {} WHERE target.{} IS DISTINCT FROM EXCLUDED.{}").format(
+                sql.SQL(", ").join(update_cols),
+                sql.Identifier(self.ROW_HASH_COLUMN),
+                sql.Identifier(self.ROW_HASH_COLUMN)
+            )
+        else:
+            conflict_action = sql.SQL("DO UPDATE SET {}").format(sql.SQL(", ").join(update_cols))
+
+        return sql.SQL("""
+            INSERT INTO {} AS target ({})
+            {}
+            ON CONFLICT ({})
+            {}
+            RETURNING (xmax = 0) AS inserted
+            """).format(
+                target,
+                sql.SQL(', ').join(map(sql.Identifier, column_names)),
+                source,
+                sql.SQL(", ").join(map(sql.Identifier, partition_keys)),
+                conflict_action
+            )
+
+    def upsert_rows_bulk(self, cur, schema: str, table_name: str, rows: List[Dict],
+                         column_names: List[str], partition_keys: List[str]) -> Dict[str, int]:
+        """
+        Streams rows with COPY into a temporary staging table, then merges them into
+        the target with a single INSERT ... ON CONFLICT
+
+        Args:
+            cur: psycopg2 cursor
+            schema: str - schema of target table
+            table_name: str - target table
+            rows: list[dict] - deduplicated rows to load
+            column_names: list[str] - columns to load
+            partition_keys: list[str] - conflict target
+
+        Returns:
+            Dict[str, int] - inserted, updated, unchanged and failed row counts
+        """
+        staging = sql.Identifier(f'_masori_stage_{table_name}')
+        columns = sql.SQL(', ').join(map(sql.Identifier, column_names))
+
+        cur.execute(sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP").format(
+            staging,
+            sql.Identifier(schema, table_name)
+        ))
+
+        cur.copy_expert(
+            sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(staging, columns),
+            CopyRowStream(rows, column_names)
+        )
+
+        upsert_query = self.build_upsert_query(
+            target=sql.Identifier(schema, table_name),
+            source=sql.SQL("SELECT {} FROM {}").format(columns, staging),
+            column_names=column_names,
+            partition_keys=partition_keys
+        )
+        cur.execute(sql.SQL("""
+            WITH upserted AS ({})
+            SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted)
+            FROM upserted
+            """).format(upsert_query))
+        inserted, updated = cur.fetchone()
+
+        return {
+            'inserted': inserted,
+            'updated': updated,
+            'unchanged': len(rows) - inserted - updated,
+            'failed': 0
+        }
+
+    def upsert_rows_per_row(self, cur, schema: str, table_name: str, rows: List[Dict],
+                            column_names: List[str], partition_keys: List[str]) -> Dict[str, int]:
+        """
+        Upserts rows one statement at a time. Each row runs under a savepoint so a bad
+        row is skipped without aborting the rest of the transaction.
+
+        Args:
+            cur: psycopg2 cursor
+            schema: str - schema of target table
+            table_name: str - target table
+            rows: list[dict] - deduplicated rows to load
+            column_names: list[str] - columns to load
+            partition_keys: list[str] - conflict target
+
+        Returns:
+            Dict[str, int] - inserted, updated, unchanged and failed row counts
+        """
+        upsert_query = self.build_upsert_query(
+            target=sql.Identifier(schema, table_name),
+            source=sql.SQL("VALUES ({})").format(sql.SQL(', ').join(sql.Placeholder() * len(column_names))),
+            column_names=column_names,
+            partition_keys=partition_keys
+        )
+
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+
+        # the previous row's savepoint is released and the next one taken in the same round trip as the upsert
+        first_query = sql.SQL("SAVEPOINT upsert_row; {}").format(upsert_query)
+        next_query = sql.SQL("RELEASE SAVEPOINT upsert_row; SAVEPOINT upsert_row; {}").format(upsert_query)
+
+        query = first_query
+        for row in rows:
+            try:
+                values = [row.get(col) for col in column_names]
+                cur.execute(query, values)
+                query = next_query
+                result = cur.fetchone()
+
+                if result is None:
+                    counts['unchanged'] += 1
+                elif result[0]:
+                    counts['inserted'] += 1
+                else:
+                    counts['updated'] += 1
+
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT upsert_row")
+                query = next_query
+                self.logger.warning(f'Failed to upsert row: {row} - {e}')
+                counts['failed'] += 1
+                continue
+
+        if query is next_query:
+            cur.execute("RELEASE SAVEPOINT upsert_row")
+
+        return counts
+
+    def upsert_table(self, database: str, schema: str, table_name: str,
+                     rows: List[Dict], partition_keys: List[str], mode: Optional[str] = None) -> Dict[str, int]:
         """
-        Creates a table given a data input and upserts those rows based on on partition keys
+        Creates a table given a data input and upserts those rows based on on partition keys.
+
+        Rows carry a content hash (ROW_HASH_COLUMN) and existing rows are only rewritten
+        when it changes, so re-loading identical data creates no new tuple versions.
 
         Args:
             database: str - database to add table to
@@ -191,110 +695,236 @@ class Database:
             table_name: str - name of table to process data
             rows: list[dict] - data to add to postgres in dictionary form
             partition_keys: list[str] - key identifiers to update data on
+            mode: str - 'bulk' (COPY + set-based merge) or 'row' (one statement per row).
+                  Defaults to DB_LOAD_MODE. A failed bulk load falls back to 'row'.
 
         Returns:
-            None
+            Dict[str, int] - inserted, updated, unchanged and failed row counts
         """
+        mode = mode or settings.DB_LOAD_MODE
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
 
         if not rows:
             self.logger.warning('No rows to upsert')
-            return
-        
+            return counts
+
+        rows = self.prepare_rows(rows, partition_keys)
+
+        if not rows:
+            self.logger.warning('No valid rows to upsert')
+            return counts
+
+        rows = self.add_row_hashes(rows, partition_keys)
+
         with self.db_connection() as conn:
             with conn.cursor() as cur:
+                column_names = self.ensure_table(conn, cur, schema, table_name, rows, partition_keys)
+                conn.commit()
 
-                schema_row = None
-                for row in rows:
-                    if any(val is not None for val in row.values()):
-                        schema_row = row
-                        break
+                start = time.perf_counter()
+                if mode == 'bulk':
+                    try:
+                        counts = self.upsert_rows_bulk(cur, schema, table_name, rows, column_names, partition_keys)
+                    except psycopg2.Error as e:
+                        conn.rollback()
+                        self.invalidate_schema_cache(schema, table_name)
+                        self.logger.warning(f'Bulk upsert into {schema}.{table_name} failed, falling back to per-row - {e}')
+                        mode = 'row'
+                        start = time.perf_counter()
 
-                if schema_row is None:
-                    raise ValueError("No valid rows found to infer schema.")
+                if mode != 'bulk':
+                    counts = self.upsert_rows_per_row(cur, schema, table_name, rows, column_names, partition_keys)
 
-                for r in rows:
-                    for k, v in schema_row.items():
-                        if v is None and r.get(k) is not None:
-                            schema_row[k] = r[k]
-                            
-                column_names = list(schema_row.keys())
+            conn.commit()
+            elapsed = time.perf_counter() - start
+            rate = len(rows) / elapsed if elapsed > 0 else float(len(rows))
+            self.logger.info(
+                f"Upsert complete for table {database}.{schema}.{table_name}: {counts['inserted']} inserted, "
+                f"{counts['updated']} updated, {counts['unchanged']} unchanged, {counts['failed']} failed "
+                f"in {elapsed:.2f}s ({rate:,.0f} rows/s, {mode} mode)."
+            )
 
-                print(f"schema_row: {schema_row} \n\n")
+        return counts
 
-                inferred_types = [
-                    self.infer_postgres_type(schema_row[col])
-                    for col in column_names
-                ]
+    def build_shadow_indexes(self, cur, schema: str, table_name: str, shadow_name: str) -> List[tuple]:
+        """
+        Recreates the live table's indexes (primary key included) on the shadow table
 
-                print(f"inferred types: {inferred_types} \n\n")
+        Args:
+            cur: psycopg2 cursor
+            schema: str - schema of both tables
+            table_name: str - live table
+            shadow_name: str - shadow table, already loaded
 
-                column_defs = [
-                    sql.SQL("{} {}").format(
-                        sql.Identifier(name),
-                        sql.SQL(col_type)
-                    )
-                    for name, col_type in zip(column_names, inferred_types)
-                ]
+        Returns:
+            list[tuple] - (shadow index name, live index name) pairs, to rename once swapped
+        """
+        cur.execute("""
+            SELECT i.relname, pg_get_indexdef(i.oid), c.conname, c.contype
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            LEFT JOIN pg_constraint c ON c.conindid = i.oid AND c.conrelid = x.indrelid
+            WHERE x.indrelid = %s::regclass
+            """, (sql.Identifier(schema, table_name).as_string(cur),))
+
+        renames = []
+        for index_name, index_def, constraint_name, constraint_type in cur.fetchall():
+            shadow_index = f'_masori_shadow_{index_name}'[:63]
+            cur.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(schema, shadow_index)))
+
+            # CREATE [UNIQUE] INDEX <name> ON <schema>.<table> USING ... - same index, other table
+            head, _, rest = index_def.partition(' ON ')
+            _, _, using = rest.partition(' USING ')
+            cur.execute(sql.SQL("{} {} ON {} USING {}").format(
+                sql.SQL(head.rsplit(' ', 1)[0]),
+                sql.Identifier(shadow_index),
+                sql.Identifier(schema, shadow_name),
+                sql.SQL(using)
+            ))
+
+            if constraint_type in ('p', 'u'):
+                # the constraint takes over the index under the index's name
+                cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {} USING INDEX {}").format(
+                    sql.Identifier(schema, shadow_name),
+                    sql.Identifier(shadow_index),
+                    sql.SQL('PRIMARY KEY' if constraint_type == 'p' else 'UNIQUE'),
+                    sql.Identifier(shadow_index)
+                ))
+
+            renames.append((shadow_index, index_name))
+
+        return renames
+
+    def copy_grants(self, cur, schema: str, table_name: str, shadow_name: str) -> int:
+        """
+        Grants on the shadow table every privilege granted on the live table, so roles that
+        could read the table still can once it is swapped
 
+        Args:
+            cur: psycopg2 cursor
+            schema: str - schema of both tables
+            table_name: str - live table
+            shadow_name: str - shadow table
 
-                print(f"column defs: {column_defs} \n\n")
-                if partition_keys:
-                    pk_constraint = sql.SQL("PRIMARY KEY ({})").format(
-                        sql.SQL(', ').join(map(sql.Identifier, partition_keys))
-                    )
-                    print(f'PRIMARY KEY : {pk_constraint} ')
-                    column_defs.append(pk_constraint)
+        Returns:
+            int - grants copied
+        """
+        cur.execute("""
+            SELECT
+                CASE WHEN a.grantee = 0 THEN NULL ELSE pg_get_userbyid(a.grantee) END,
+                a.privilege_type,
+                a.is_grantable
+            FROM pg_class c, aclexplode(c.relacl) a
+            WHERE c.oid = %s::regclass
+            """, (sql.Identifier(schema, table_name).as_string(cur),))
+
+        grants = cur.fetchall()
+        for grantee, privilege, grantable in grants:
+            cur.execute(sql.SQL("GRANT {} ON {} TO {}{}").format(
+                sql.SQL(privilege),
+                sql.Identifier(schema, shadow_name),
+                sql.Identifier(grantee) if grantee is not None else sql.SQL('PUBLIC'),
+                sql.SQL(' WITH GRANT OPTION' if grantable else '')
+            ))
+
+        return len(grants)
+
+    def swap_table(self, database: str, schema: str, table_name: str,
+                   rows: List[Dict], partition_keys: List[str]) -> Dict[str, int]:
+        """
+        Replaces the table's contents with rows in one transaction: COPY into a fresh shadow
+        table, build its indexes, then drop the live table and rename the shadow into place.
 
-                create_table_query = sql.SQL("CREATE TABLE IF NOT EXISTS {} ({})").format(
-                    sql.Identifier(schema, table_name),
-                    sql.SQL(", ").join(column_defs)
-                )
+        Readers see the old table until the commit and the full new one after it, with
+        no per-row conflict handling and no dead tuples left behind. Rows missing from
+        the load are gone afterwards, so only pass a complete dataset: rows that are empty
+        or missing a partition key make it upsert instead. Grants on the table are copied
+        to the shadow table. A failed swap rolls back and falls back to upsert_table.
+
+        Args:
+            database: str - database of the table
+            schema: str - schema of the table
+            table_name: str - table to replace, created if it doesn't exist
+            rows: list[dict] - every row the table should hold
+            partition_keys: list[str] - primary key, rows are deduplicated on it
+
+        Returns:
+            Dict[str, int] - inserted, updated, unchanged and failed row counts
+        """
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+
+        invalid = sum(1 for row in rows if not self.is_loadable(row, partition_keys))
+        if invalid:
+            # prepare_rows would drop them and the swap would then delete their rows from the table
+            self.logger.warning(f'{invalid} rows for {schema}.{table_name} are empty or missing partition keys, upserting instead of swapping')
+            return self.upsert_table(database, schema, table_name, rows, partition_keys)
+
+        rows = self.prepare_rows(rows, partition_keys) if rows else []
+        if not rows:
+            # an empty load is far more likely a broken source than an empty table
+            self.logger.warning(f'No valid rows to swap into {schema}.{table_name}, keeping the current table')
+            return counts
+
+        rows = self.add_row_hashes(rows, partition_keys)
+        shadow_name = f'_masori_shadow_{table_name}'[:63]
+        live, shadow = sql.Identifier(schema, table_name), sql.Identifier(schema, shadow_name)
 
+        with self.db_connection() as conn:
+            with conn.cursor() as cur:
+                # the live table keeps defining the layout, new columns are added to it first
+                column_names = self.ensure_table(conn, cur, schema, table_name, rows, partition_keys)
+                conn.commit()
+
+                start = time.perf_counter()
+                error = None
                 try:
-                    cur.execute(create_table_query)
-                
-                except InvalidSchemaName:
-                    conn.rollback()
-                    self.logger.info(f"Schema {schema} doesn't exist - creating now.")
-                    create_schema_query = sql.SQL('CREATE SCHEMA IF NOT EXISTS {}').format(
-                        sql.Identifier(schema)
-                    )
-                    cur.execute(create_schema_query)
-                    cur.execute(create_table_query)
-
-                insert_cols = sql.SQL(', ').join(map(sql.Identifier, column_names))
-                insert_vals = sql.SQL(', ').join(sql.Placeholder() * len(column_names))
-
-                update_cols = [
-                    sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(col), sql.Identifier(col))
-                    for col in column_names if col not in partition_keys
-                ]
-
-                upsert_query = sql.SQL("""
-                    INSERT INTO {} ({})
-                    VALUES ({})
-                    ON CONFLICT ({})
-                    DO UPDATE SET {};
-                    """).format(
-                        sql.Identifier(schema, table_name),
-                        insert_cols,
-                        insert_vals,
-                        sql.SQL(", ").join(map(sql.Identifier, partition_keys)),
-                        sql.SQL(", ").join(update_cols)
+                    # one swap per table at a time, a second one waits and then replaces the first
+                    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f'masori.swap.{schema}.{table_name}',))
+                    cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(shadow))
+                    cur.execute(sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING GENERATED)").format(shadow, live))
+                    cur.copy_expert(
+                        sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+                            shadow, sql.SQL(', ').join(map(sql.Identifier, column_names))
+                        ),
+                        CopyRowStream(rows, column_names)
                     )
-                count = 0
-                for row in rows:
-                    try:
-                        values = [row[col] for col in column_names]
-                        cur.execute(upsert_query, values)
-                        count += 1
+                    # indexes are built once over the loaded table rather than maintained row by row
+                    renames = self.build_shadow_indexes(cur, schema, table_name, shadow_name)
+                    self.copy_grants(cur, schema, table_name, shadow_name)
+                    cur.execute(sql.SQL("ANALYZE {}").format(shadow))
+
+                    cur.execute(sql.SQL("SELECT count(*) FROM {}").format(live))
+                    replaced = cur.fetchone()[0]
+
+                    cur.execute(sql.SQL("DROP TABLE {}").format(live))
+                    cur.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(shadow, sql.Identifier(table_name)))
+                    for shadow_index, index_name in renames:
+                        cur.execute(sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                            sql.Identifier(schema, shadow_index), sql.Identifier(index_name)
+                        ))
+
+                    conn.commit()
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    error = e
 
-                    except Exception as e:
-                        self.logger.warning(f'Failed to upsert row: {row} - {e}')
-                        continue
-                                       
-            conn.commit()
-            self.logger.info(f"Upsert complete for table {database}.{schema}.{table_name} with {count} rows updated.")
+                # the swapped-in table has the same columns, but drop the cached layout with the old table
+                self.invalidate_schema_cache(schema, table_name)
+
+        if error is not None:
+            self.logger.warning(f'Swap of {schema}.{table_name} failed, falling back to upsert - {error}')
+            return self.upsert_table(database, schema, table_name, rows, partition_keys)
+
+        elapsed = time.perf_counter() - start
+        rate = len(rows) / elapsed if elapsed > 0 else float(len(rows))
+        self.logger.info(
+            f"Swap complete for table {database}.{schema}.{table_name}: {len(rows)} rows replaced {replaced} "
+            f"in {elapsed:.2f}s ({rate:,.0f} rows/s)."
+        )
+
+        counts['inserted'] = len(rows)
+
+        return counts
 
     def get_unique_ids(self, schema: str, table: str, id_column: str) -> list[int]:
         """
@@ -337,5 +967,36 @@ class Database:
                     except Exception as e:
                         continue
                 return ids
-            
-db = Database()
\ No newline at end of file
+
+    def get_watermarks(self, schema: str, table: str, pipeline_name: str) -> Dict[str, str]:
+        """
+        Fetch the per-key watermarks a pipeline saved on its last loads
+
+        Args:
+            schema: str - schema of the watermark table
+            table: str - watermark table name
+            pipeline_name: str - pipeline the watermarks belong to
+
+        Returns:
+            Dict[str, str]: key -> digest, empty if nothing was saved yet
+        """
+
+        with self.db_connection() as conn:
+            with conn.cursor() as cur:
+                if self.get_table_columns(cur, schema, table) is None:
+                    return {}
+
+                query = sql.SQL("""
+                    SELECT
+                        s_key, s_digest
+                    FROM
+                        {}
+                    WHERE
+                        s_pipeline = %s
+                """
+                ).format(
+                    sql.Identifier(schema, table)
+                )
+                cur.execute(query, (pipeline_name,))
+
+                return {key: digest for key, digest in cur.fetchall()}
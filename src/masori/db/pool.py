@@ -0,0 +1,127 @@
+"""
+Process-wide postgres connection pool
+"""
+
+import threading
+import time
+from typing import Dict
+
+import loguru
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+
+class ConnectionPool:
+    """
+    Wraps psycopg2's ThreadedConnectionPool so callers block for a free connection
+    instead of getting a PoolError, and records how long checkouts wait.
+
+    Connections that were closed, or that sat in the pool for ping_after seconds and
+    no longer answer a SELECT 1 (server restart, idle timeout), are discarded on
+    checkout and replaced with fresh ones.
+    """
+    def __init__(self, minconn: int, maxconn: int, ping_after: float = 30.0, **pg_creds):
+        self.logger = loguru.logger
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.ping_after = ping_after
+        self.pool = ThreadedConnectionPool(minconn, maxconn, **pg_creds)
+        self.slots = threading.BoundedSemaphore(maxconn)
+
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.discarded = 0
+        # id(conn) -> when it was last returned to the pool
+        self.returned_at: Dict[int, float] = {}
+
+    @staticmethod
+    def healthy(conn) -> bool:
+        """
+        Whether a pooled connection still reaches the server
+        """
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def checkout_live(self):
+        """
+        Takes connections out of the pool until one is usable, closing the dead ones
+        """
+        for _ in range(self.maxconn + 1):
+            conn = self.pool.getconn()
+            with self._lock:
+                returned = self.returned_at.pop(id(conn), None)
+
+            stale = returned is not None and time.monotonic() - returned >= self.ping_after
+            if not conn.closed and (not stale or self.healthy(conn)):
+                return conn
+
+            self.logger.info('Discarding a dead pooled database connection')
+            with self._lock:
+                self.discarded += 1
+            self.pool.putconn(conn, close=True)
+
+        raise psycopg2.OperationalError('No live database connection after discarding every pooled one')
+
+    def getconn(self):
+        """
+        Checks a connection out of the pool, waiting for one to be returned if all are in use
+
+        Returns:
+            psycopg2 connection
+        """
+        start = time.perf_counter()
+        self.slots.acquire()
+        try:
+            conn = self.checkout_live()
+        except Exception:
+            self.slots.release()
+            raise
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+        return conn
+
+    def putconn(self, conn) -> None:
+        """
+        Returns a connection to the pool, discarding it if it was closed
+        """
+        try:
+            if not conn.closed:
+                with self._lock:
+                    self.returned_at[id(conn)] = time.monotonic()
+            self.pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self.slots.release()
+
+    def closeall(self) -> None:
+        self.pool.closeall()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Checkout wait statistics for sizing the pool
+
+        Returns:
+            Dict - checkouts, total/avg/max wait in seconds and pool size
+        """
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'wait_total': round(self.wait_total, 4),
+                'wait_avg': round(self.wait_total / self.checkouts, 4) if self.checkouts else 0.0,
+                'wait_max': round(self.wait_max, 4),
+                'discarded': self.discarded,
+                'maxconn': self.maxconn
+            }
@@ -0,0 +1,392 @@
+"""
+On-disk HTTP response cache with conditional-GET validators
+"""
+
+import io
+import os
+import json
+import fcntl
+import atexit
+import time
+import hashlib
+import threading
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+
+class Unchanged:
+    """
+    Sentinel returned by extract helpers when a payload is byte-identical to the one
+    the last successful load was built from, so the pipeline can skip the ID entirely
+    """
+    def __repr__(self) -> str:
+        return 'UNCHANGED'
+
+
+UNCHANGED = Unchanged()
+
+
+class CacheTee(io.RawIOBase):
+    """
+    Readable stream that copies everything read from an HTTP response into a cache
+    temp file and commits it as a cache entry once the body has been read to the end
+    """
+    def __init__(self, raw, cache: 'ResponseCache', url: str, etag: Optional[str],
+                 last_modified: Optional[str], encoding: Optional[str]):
+        self.raw = raw
+        self.cache = cache
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.encoding = encoding
+
+        self.tmp = cache.temp_path(url)
+        self.sink = open(self.tmp, 'wb')
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.complete = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self.raw.read(len(buffer))
+        if not chunk:
+            self.finish()
+            return 0
+
+        n = len(chunk)
+        buffer[:n] = chunk
+        self.sink.write(chunk)
+        self.digest.update(chunk)
+        self.size += n
+        return n
+
+    def finish(self) -> None:
+        if self.complete or self.sink.closed:
+            return
+        self.sink.close()
+        self.complete = True
+        self.cache.commit(self.url, self.tmp, self.digest.hexdigest(), self.size,
+                          self.etag, self.last_modified, self.encoding)
+
+    def close(self) -> None:
+        if not self.sink.closed:
+            # abandoned part way through - don't cache a truncated body
+            self.sink.close()
+            self.tmp.unlink(missing_ok=True)
+        self.raw.close()
+        super().close()
+
+
+class FetchResult:
+    """
+    Response body plus where it came from
+    """
+    def __init__(self, url: str, status_code: int, content: bytes, encoding: Optional[str] = None,
+                 from_cache: bool = False, unchanged: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+        self.from_cache = from_cache
+        self.unchanged = unchanged
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class StreamResult:
+    """
+    Response body exposed as a binary stream, for callers that process it incrementally
+    """
+    def __init__(self, url: str, raw, encoding: Optional[str] = None,
+                 from_cache: bool = False, unchanged: bool = False):
+        self.url = url
+        self.raw = raw
+        self.encoding = encoding or 'utf-8'
+        self.from_cache = from_cache
+        self.unchanged = unchanged
+
+    def close(self) -> None:
+        self.raw.close()
+
+
+def parse_ttls(spec: str) -> List[Tuple[str, int]]:
+    """
+    Parses 'glob=seconds,glob=seconds' into an ordered list of (url glob, ttl)
+
+    Args:
+        spec: str - comma separated glob=seconds pairs, first match wins
+
+    Returns:
+        list[tuple[str, int]]
+    """
+    ret = []
+    for part in spec.split(','):
+        if '=' not in part:
+            continue
+        pattern, ttl = part.rsplit('=', 1)
+        ret.append((pattern.strip(), int(ttl)))
+    return ret
+
+
+class ResponseCache:
+    """
+    URL-keyed response cache stored on disk.
+
+    Each entry keeps the body plus ETag / Last-Modified validators, a content hash and
+    the hash of the body the last successful load used. Entries are evicted least
+    recently used first once the cache grows past max_bytes.
+
+    The index is kept in memory and written to index.json every FLUSH_EVERY changes, on
+    flush() and at exit. Writes hold an exclusive lock on index.lock and merge only the
+    entries this process changed into the file, so processes sharing the cache keep
+    each other's entries.
+    """
+    FLUSH_EVERY = 200
+
+    def __init__(self, directory: Path, max_bytes: int, ttls: List[Tuple[str, int]]):
+        self.logger = logger
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttls = ttls
+        self.index_path = self.directory / 'index.json'
+        self.lock_path = self.directory / 'index.lock'
+
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index: Dict[str, Dict] = self._read_index()
+        self.total_bytes = sum(entry['size'] for entry in self.index.values())
+        # keys added, changed or evicted since the index was last written
+        self.dirty: Set[str] = set()
+        atexit.register(self.flush)
+
+    def _read_index(self) -> Dict[str, Dict]:
+        try:
+            return json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self) -> None:
+        tmp = self.index_path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_text(json.dumps(self.index))
+        os.replace(tmp, self.index_path)
+
+    def _changed(self, key: str) -> None:
+        """
+        Marks an entry for the next index write, writing now once enough have built up.
+        Called with _lock held.
+        """
+        self.dirty.add(key)
+        if len(self.dirty) >= self.FLUSH_EVERY:
+            self._flush()
+
+    def flush(self) -> None:
+        """
+        Writes this process's changes to index.json
+        """
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self.dirty:
+            return
+
+        try:
+            with open(self.lock_path, 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    index = self._read_index()
+                    for key in self.dirty:
+                        if key in self.index:
+                            index[key] = self.index[key]
+                        else:
+                            index.pop(key, None)
+                    self.index = index
+                    self.total_bytes = sum(entry['size'] for entry in index.values())
+                    self._evict()
+                    self._write_index()
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        except OSError as e:
+            self.logger.warning(f'Failed to write response cache index {self.index_path} - {e}')
+            return
+
+        self.dirty.clear()
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def ttl(self, url: str) -> int:
+        """
+        Seconds a cached response for url may be served without revalidating
+        """
+        stripped = url.split('://', 1)[-1]
+        for pattern, ttl in self.ttls:
+            if fnmatch(stripped, pattern):
+                return ttl
+        return 0
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self.index.get(self.key(url))
+            return dict(entry) if entry else None
+
+    def is_fresh(self, url: str, entry: Dict) -> bool:
+        return time.time() - entry['stored_at'] < self.ttl(url)
+
+    def validators(self, entry: Optional[Dict]) -> Dict[str, str]:
+        """
+        Conditional-GET headers for a cached entry
+        """
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, url: str) -> Optional[bytes]:
+        """
+        Reads a cached body and marks the entry as recently used
+        """
+        key = self.key(url)
+        try:
+            content = self.body_path(url).read_bytes()
+        except OSError:
+            return None
+
+        with self._lock:
+            if key in self.index:
+                self.index[key]['last_access'] = time.time()
+        return content
+
+    def open(self, url: str):
+        """
+        Opens a cached body for streaming reads and marks the entry as recently used
+
+        Returns:
+            binary file object, or None if the body is missing
+        """
+        try:
+            body = open(self.body_path(url), 'rb')
+        except OSError:
+            return None
+
+        with self._lock:
+            entry = self.index.get(self.key(url))
+            if entry:
+                entry['last_access'] = time.time()
+        return body
+
+    def revalidated(self, url: str) -> None:
+        """
+        Restarts an entry's TTL after a 304 Not Modified
+        """
+        key = self.key(url)
+        with self._lock:
+            entry = self.index.get(key)
+            if entry:
+                entry['stored_at'] = entry['last_access'] = time.time()
+                self._changed(key)
+
+    def body_path(self, url: str) -> Path:
+        return self.directory / f'{self.key(url)}.body'
+
+    def temp_path(self, url: str) -> Path:
+        return self.body_path(url).with_suffix(f'.{threading.get_ident()}.tmp')
+
+    def store(self, url: str, content: bytes, etag: Optional[str],
+              last_modified: Optional[str], encoding: Optional[str]) -> str:
+        """
+        Writes a response body and its validators, evicting old entries if over budget
+
+        Returns:
+            str - sha256 of the body
+        """
+        tmp = self.temp_path(url)
+        tmp.write_bytes(content)
+        digest = hashlib.sha256(content).hexdigest()
+
+        self.commit(url, tmp, digest, len(content), etag, last_modified, encoding)
+
+        return digest
+
+    def commit(self, url: str, tmp: Path, digest: str, size: int, etag: Optional[str],
+               last_modified: Optional[str], encoding: Optional[str]) -> None:
+        """
+        Moves a fully written temp body into place and records it in the index
+        """
+        os.replace(tmp, self.body_path(url))
+
+        now = time.time()
+        key = self.key(url)
+        with self._lock:
+            previous = self.index.get(key, {})
+            self.total_bytes += size - previous.get('size', 0)
+            self.index[key] = {
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'encoding': encoding,
+                'sha256': digest,
+                'loaded_sha256': previous.get('loaded_sha256'),
+                'size': size,
+                'stored_at': now,
+                'last_access': now
+            }
+            self._changed(key)
+            self._evict()
+
+    def mark_loaded(self, urls: List[str]) -> None:
+        """
+        Records that the current bodies for urls made it into the database
+        """
+        with self._lock:
+            for url in urls:
+                key = self.key(url)
+                entry = self.index.get(key)
+                if entry:
+                    entry['loaded_sha256'] = entry['sha256']
+                    self._changed(key)
+
+    def forget_loaded(self, urls: List[str]) -> None:
+        """
+        Drops the loaded hash of urls, so their next bodies are loaded even if unchanged
+        """
+        with self._lock:
+            for url in urls:
+                key = self.key(url)
+                entry = self.index.get(key)
+                if entry:
+                    entry['loaded_sha256'] = None
+                    self._changed(key)
+
+    def _evict(self) -> None:
+        """
+        Drops least recently used entries until the cache fits max_bytes. Called with _lock held.
+        """
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        for key, entry in sorted(self.index.items(), key=lambda kv: kv[1]['last_access']):
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                (self.directory / f'{key}.body').unlink()
+            except OSError:
+                pass
+            self.total_bytes -= entry['size']
+            del self.index[key]
+            self.dirty.add(key)
+            self.logger.debug(f"Evicted {entry['url']} from response cache")
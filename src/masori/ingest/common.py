@@ -2,18 +2,37 @@
 Handles common functions for data ingestion
 """
 
-import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 from loguru import logger
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 from datetime import datetime
 import re
 import io
 import csv
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from masori.config import settings
+from masori.ingest.cache import UNCHANGED, StreamResult
+from masori.ingest.session import get_session
+from masori.ingest.resolver import get_resolver
+
+FANTASYPROS_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+FANTASYPROS_TABLE_XPATH = etree.XPath(
+    "//div[contains(concat(' ', normalize-space(@class), ' '), ' mobile-table ')]"
+)
+# text of a cell the way BeautifulSoup's get_text() sees it: no comments, no script / style / template bodies
+FANTASYPROS_TEXT_XPATH = etree.XPath(
+    './/text()[not(ancestor::script or ancestor::style or ancestor::template)]',
+    smart_strings=False
+)
 
 class Common:
     def __init__(self):
         self.logger = logger
+        self.session = get_session()
+        self.resolver = get_resolver()
 
     @staticmethod
     def determine_nfl_week():
@@ -93,89 +112,225 @@ class Common:
             url=url
         )
 
-    def generic_http_request(self, url: str) -> Dict:
+    def generic_http_request(self, url: str, skip_unchanged: bool = False) -> Dict:
         """
         Generic http request for use in many api sources
 
         Args:
             url: str - url to make the request to
+            skip_unchanged: bool - return UNCHANGED instead of parsing when the response
+                            matches the last loaded one
         
         Returns:
             Dict - dictionary of data from json response
+
+        Raises:
+            Exception - when the request or decoding fails, so the ID is recorded as failed
         """
         try:
-            resp = requests.get(url)
-            resp.raise_for_status()
+            resp = self.session.fetch(url)
+            if skip_unchanged and resp.unchanged and settings.SKIP_UNCHANGED:
+                return UNCHANGED
 
-            data = resp.json()
+            return resp.json()
 
         except Exception as e:
             logger.warning(f'Problem making http request to url {url} - {e}')
-
-        return data
+            raise
     
-    def generic_csv_request(self, url: str) -> Dict:
+    def generic_csv_stream(self, url: str, columns: Optional[List[str]] = None,
+                           skip_unchanged: bool = False) -> Iterator[Dict]:
         """
-        Generic csv request for use in many csv sources
+        Streaming csv request: the response is decoded incrementally and rows are
+        yielded lazily, so only one row is held in memory at a time
 
         Args:
             url: str - url to make the request to
-        
+            columns: list[str] - columns to keep, all columns if None
+            skip_unchanged: bool - return UNCHANGED instead of parsing when the response
+                            matches the last loaded one
+
         Returns:
-            Dict - dictionary of data from json response
+            Iterator[Dict] - one dict per csv row, or UNCHANGED
+
+        Raises:
+            Exception - when the request fails, or while iterating when the download
+                        is cut short, so the ID is recorded as failed instead of loaded
+                        with missing rows
         """
         try:
-            resp = requests.get(url)
-            resp.raise_for_status()
+            stream = self.session.open_stream(url)
+        except Exception as e:
+            logger.warning(f'Problem making http request to url {url} - {e}')
+            raise
 
-            text = resp.text
+        if skip_unchanged and stream.unchanged and settings.SKIP_UNCHANGED:
+            stream.close()
+            return UNCHANGED
 
-            reader = csv.DictReader(io.StringIO(text))
-            rows = list(reader)
+        return self.iter_csv_rows(stream, columns)
+
+    def iter_csv_rows(self, stream: StreamResult, columns: Optional[List[str]] = None) -> Iterator[Dict]:
+        """
+        Yields csv rows from a response stream as dicts, keeping only the requested columns
+        """
+        try:
+            text = io.TextIOWrapper(io.BufferedReader(stream.raw), encoding=stream.encoding, newline='')
+            reader = csv.reader(text)
+
+            header = next(reader, None)
+            if header is None:
+                return
+
+            wanted = [(i, name) for i, name in enumerate(header) if columns is None or name in columns]
+
+            for record in reader:
+                yield {name: record[i] if i < len(record) else None for i, name in wanted}
 
         except Exception as e:
-            logger.warning(f'Problem making http request to url {url} - {e}')
+            logger.warning(f'Problem streaming csv from url {stream.url} - {e}')
+            raise
 
-        return rows
-    
-    def generic_fantasypros_html_parser(self, url: str) -> Dict:
+        finally:
+            stream.close()
+
+    @classmethod
+    def add_player_team(cls, row_dict: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Generic HTML parser for FantasyPros tables that separates Player and Team.
+        If Player field exists, split into Player and Team
         """
-        data: Dict[str, Any] = {}
+        if "Player" in row_dict and row_dict["Player"]:
+            player_name, team = cls.split_player_and_team(row_dict["Player"])
+            row_dict["Player"] = player_name
+            if team:
+                row_dict["Team"] = team
+        return row_dict
+
+    @classmethod
+    def parse_fantasypros_table(cls, content: bytes) -> List[Dict[str, Any]]:
+        """
+        Extracts rows from the div.mobile-table projection tables of a FantasyPros page with lxml.
+
+        Only the region from the first mobile-table div to the last </table> is parsed, and
+        cells are read with XPath rather than building a BeautifulSoup tree. Output matches
+        parse_fantasypros_table_soup.
+
+        Args:
+            content: bytes - raw page
+
+        Returns:
+            list[dict] - one dict per table row keyed by header text
+        """
+        charset = FANTASYPROS_CHARSET_RE.search(content[:4096])
         try:
-            resp = requests.get(url)
-            resp.raise_for_status()
+            text = content.decode(charset.group(1).decode() if charset else 'utf-8', errors='replace')
+        except LookupError:
+            text = content.decode('utf-8', errors='replace')
+
+        region = text
+        start = text.find('mobile-table')
+        while start != -1:
+            tag_start = text.rfind('<', 0, start)
+            if text.startswith('<div', tag_start):
+                end = text.rfind('</table>')
+                if end > tag_start:
+                    region = text[tag_start:end + len('</table>')]
+                break
+            start = text.find('mobile-table', start + 1)
+
+        try:
+            root = lxml.html.fromstring(region)
+        except etree.ParserError:
+            return []
+
+        parsed_results: List[Dict[str, Any]] = []
+
+        for el in FANTASYPROS_TABLE_XPATH(root):
+            table = el.find('.//table')
+            if table is None:
+                continue
+
+            headers = [cls.fantasypros_cell_text(th) for th in table.iterfind('.//th')]
+
+            for row in table.iterfind('.//tr'):
+                cells = [cls.fantasypros_cell_text(td) for td in row.iterfind('.//td')]
+                if not cells or not headers:
+                    continue
+
+                parsed_results.append(cls.add_player_team(dict(zip(headers, cells))))
+
+        return parsed_results
+
+    @staticmethod
+    def fantasypros_cell_text(cell) -> str:
+        """
+        Stripped text of a th / td, matching BeautifulSoup's get_text(strip=True)
+        """
+        return ''.join(t.strip() for t in FANTASYPROS_TEXT_XPATH(cell))
+
+    @classmethod
+    def parse_fantasypros_table_soup(cls, content: bytes) -> List[Dict[str, Any]]:
+        """
+        Original BeautifulSoup implementation of parse_fantasypros_table, kept as the
+        reference for benchmarks and output comparisons
+        """
+        from bs4 import BeautifulSoup
 
-            soup = BeautifulSoup(resp.content, features="lxml")
-            elements = soup.find_all("div", {"class": "mobile-table"})
+        soup = BeautifulSoup(content, features="lxml")
+        elements = soup.find_all("div", {"class": "mobile-table"})
 
-            parsed_results: List[Dict[str, Any]] = []
+        parsed_results: List[Dict[str, Any]] = []
 
-            for el in elements:
-                table = el.find("table")
-                if not table:
+        for el in elements:
+            table = el.find("table")
+            if not table:
+                continue
+
+            headers = [th.get_text(strip=True) for th in table.find_all("th")]
+
+            for row in table.find_all("tr"):
+                cells = [td.get_text(strip=True) for td in row.find_all("td")]
+                if not cells or not headers:
                     continue
 
-                headers = [th.get_text(strip=True) for th in table.find_all("th")]
+                parsed_results.append(cls.add_player_team(dict(zip(headers, cells))))
 
-                for row in table.find_all("tr"):
-                    cells = [td.get_text(strip=True) for td in row.find_all("td")]
-                    if not cells or not headers:
-                        continue
+        return parsed_results
 
-                    row_dict = dict(zip(headers, cells))
+    @classmethod
+    def parse_fantasypros_payload(cls, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Parses the page fetched by generic_fantasypros_html_parser(parse=False), so it can
+        happen in a worker process. Other keys of raw are kept.
 
-                    # If Player field exists, split into Player and Team
-                    if "Player" in row_dict and row_dict["Player"]:
-                        player_name, team = self.split_player_and_team(row_dict["Player"])
-                        row_dict["Player"] = player_name
-                        if team:
-                            row_dict["Team"] = team
+        Args:
+            raw: dict - {'content': bytes, ...}
 
-                    parsed_results.append(row_dict)
+        Returns:
+            dict - raw with 'content' replaced by 'results'
+        """
+        data = {key: value for key, value in raw.items() if key != 'content'}
+        data['results'] = cls.parse_fantasypros_table(raw['content']) if raw.get('content') else []
+        return data
 
-            data["results"] = parsed_results
+    def generic_fantasypros_html_parser(self, url: str, skip_unchanged: bool = False, parse: bool = True) -> Dict:
+        """
+        Generic HTML parser for FantasyPros tables that separates Player and Team.
+
+        Returns UNCHANGED without parsing when skip_unchanged is set and the page is
+        byte-identical to the last loaded one. With parse=False the page comes back
+        as {'content': bytes} for parse_fantasypros_payload.
+        """
+        data: Dict[str, Any] = {}
+        try:
+            resp = self.session.fetch(url)
+            if skip_unchanged and resp.unchanged and settings.SKIP_UNCHANGED:
+                return UNCHANGED
+
+            if parse:
+                data["results"] = self.parse_fantasypros_table(resp.content)
+            else:
+                data["content"] = resp.content
 
         except Exception as e:
             logger.warning(f"Problem making HTML request to {url} - {e}")
@@ -187,7 +342,8 @@ class Common:
         """
         Scrapes espn api for NFL season years and returns them as a list
 
-        By default only returns last 5 years - mainly for testing purposes
+        Only returns the latest SEASONS_MAX_COUNT years (5 by default), `masori backfill`
+        asks for specific years instead
 
         i.e season types
 
@@ -197,15 +353,12 @@ class Common:
         Returns:
             List[Any] - list of objects for generic pipeline class to iterate over
         """
-        print(f'I should fix this : year {year}')
-
         url = "https://sports.core.api.espn.com/v2/sports/football/leagues/nfl/seasons?limit=100"
 
         resp = self.generic_http_request(url)
         ret = []
-        
-        
-        MAX_COUNT = 5 #adjust to add more seasons
+
+        MAX_COUNT = settings.SEASONS_MAX_COUNT
         COUNT = 0
 
         for season in resp.get("items", []):
@@ -214,12 +367,17 @@ class Common:
             COUNT += 1
 
             if COUNT == MAX_COUNT:
-                return ret
+                break
+
+        return ret
 
     
-    def parse_ref_string_for_id(self, ref_string: str) -> int:
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def parse_ref_string_for_id(ref_string: str) -> Optional[str]:
         """
-        Parses a $ref string and returns the ID
+        Parses a $ref string and returns the ID, memoized since the same team and
+        position refs repeat across thousands of records
         """
         try:
            return ref_string.split('/')[-1].split('?')[0]
@@ -245,51 +403,86 @@ class Common:
 
     #     return ret
 
+    @staticmethod
+    def espn_page_url(url: str, page: int, limit: Optional[int] = None) -> str:
+        """
+        Sets the page (and limit) query parameters of an ESPN API url, keeping any
+        query string it already has
+
+        Example: '.../positions?limit=100&ignore=2025', 2 -> '.../positions?limit=100&ignore=2025&page=2'
+        """
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        if limit is not None:
+            query['limit'] = str(limit)
+        query['page'] = str(page)
+
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    def fetch_espn_pages(self, url: str, limit: Optional[int] = None,
+                         max_workers: Optional[int] = None) -> List[Dict]:
+        """
+        Fetches every page of a paginated ESPN API collection. Page 1 reports the
+        pageCount, pages 2..N are then fetched concurrently, so a collection of any
+        size takes about two round trips. Pages go through the run's RefResolver, so
+        a collection several pipelines ask for is only fetched once.
+
+        Args:
+            url: str - collection url, may already carry a query string
+            limit: int - items per page, the API default when None
+            max_workers: int - concurrent page requests (defaults to EXTRACT_MAX_WORKERS)
+
+        Returns:
+            List[Dict] - page payloads in page order, pages that failed are logged and left
+                         out and the collection is reported to HttpSession.note_partial
+        """
+        try:
+            first = self.resolver.resolve(self.espn_page_url(url, 1, limit))
+        except Exception as e:
+            self.logger.warning(f"Problem fetching page 1 from {url}: {e}")
+            self.session.note_partial(url)
+            return []
+
+        page_count = first.get("pageCount", 1)
+        rest = self.resolver.resolve_many(
+            [self.espn_page_url(url, page, limit) for page in range(2, page_count + 1)],
+            max_workers
+        )
+
+        pages = [first] + [page for page in rest if page is not None]
+        if len(pages) < page_count:
+            self.logger.warning(f"Only {len(pages)} of {page_count} pages fetched from {url}")
+            self.session.note_partial(url)
+
+        return pages
+
     def generic_espn_api_metadata_request(
         self,
         url: str,
         item_key: str = "items",
-        dict_key: str = "$ref"
+        dict_key: str = "$ref",
+        limit: Optional[int] = None
     ) -> List[str]:
         """
         Fetches all items from a paginated ESPN API endpoint and returns a list of IDs.
 
         Args:
-            url: Base ESPN API endpoint
+            url: Base ESPN API endpoint, may already carry a query string
             item_key: Key in the JSON where items are stored (default: "items")
             dict_key: Key in each item dict containing the reference URL (default: "$ref")
+            limit: Items per page, larger pages mean fewer requests (default: the API's)
 
         Returns:
             List[str]: List of parsed IDs from all pages
         """
         all_ids = []
-        page = 1
-
-        while True:
-            paged_url = f"{url}?page={page}"
-            try:
-                resp = requests.get(paged_url)
-                resp.raise_for_status()
-                data = resp.json()
-            except Exception as e:
-                self.logger.warning(f"Problem fetching page {page} from {url}: {e}")
-                break
 
-            items = data.get(item_key, [])
-            for entry in items:
+        for data in self.fetch_espn_pages(url, limit):
+            for entry in data.get(item_key, []):
                 try:
                     id = self.parse_ref_string_for_id(entry[dict_key])
                     all_ids.append(id)
                 except KeyError:
                     self.logger.warning(f"Missing expected key '{dict_key}' in entry: {entry}")
 
-            if page >= data.get("pageCount", 1):
-                break
-            page += 1
-
         return all_ids
-    
-
-common = Common()
-
-print(common.determine_nfl_week())
\ No newline at end of file
@@ -6,11 +6,26 @@ from typing import Dict
 from loguru import logger
 
 from masori.ingest.common import Common
+from masori.ingest.transforms import Column, RowConverter, RunContext
+
+# https://www.draftkings.com/lineup/getavailableplayerscsv?contestTypeId=21&draftGroupId={group_id}
+# {"Position": "DST", "Name + ID": "Panthers  (39507011)", "Name": "Panthers ", "ID": "39507011",
+#  "Roster Position": "DST", "Salary": "2400", "Game Info": "CAR@JAX 09/07/2025 01:00PM ET",
+#  "TeamAbbrev": "CAR", "AvgPointsPerGame": "2.41"}
+DRAFTKINGS_SALARY_COLUMNS = [
+    Column('Name', 's_full_name', 'strip'),
+    Column('Position', 's_position', 'strip'),
+    Column('Salary', 'i_salary', 'int')
+]
+
+# salary csv columns the converter reads, everything else is dropped while streaming
+DRAFTKINGS_COLUMNS = [column.source for column in DRAFTKINGS_SALARY_COLUMNS]
 
 class Draftkings:
     def __init__(self):
         self.logger = logger
         self.common = Common()
+        self.converters: Dict[RunContext, RowConverter] = {}
 
     def get_draftkings_group_id(self, year) -> int:
         """
@@ -40,57 +55,29 @@ class Draftkings:
         Args:
             group_id (str): DK group ID to get salaries for.
         Returns:
-            data (dict): Salary data for the mfers
+            data (Iterator[dict]): Salary data for the mfers, streamed row by row
 
         """
         url = f"https://www.draftkings.com/lineup/getavailableplayerscsv?contestTypeId=21&draftGroupId={group_id}"
 
-        resp = self.common.generic_csv_request(url)
+        resp = self.common.generic_csv_stream(url, columns=DRAFTKINGS_COLUMNS, skip_unchanged=True)
 
         return resp
     
-    def transform_data_from_draftkings(self, data: Dict) -> Dict:
-        '''
-        transforms payload from https://www.draftkings.com/lineup/getavailableplayerscsv?contestTypeId=21&draftGroupId={group_id}
-
-        Schema is flexible - if addtl fields are needed, adjust in this function
+    def converter(self, context: RunContext) -> RowConverter:
+        """
+        Row converter for the salary csv, compiled once per run context
 
         Args:
-            player: str - raw string from api response
-
-                payload structure:
-        {
-            "Position": "DST",
-            "Name + ID": "Panthers  (39507011)",
-            "Name": "Panthers ",
-            "ID": "39507011",
-            "Roster Position": "DST",
-            "Salary": "2400",
-            "Game Info": "CAR@JAX 09/07/2025 01:00PM ET",
-            "TeamAbbrev": "CAR",
-            "AvgPointsPerGame": "2.41"
-        },
-
+            context: RunContext - week and year every row is tagged with
 
         Returns:
-            Dict{} - key value pair of data in normalized format
-            '''
-        
-        ret = {}
-        _week = self.common.determine_nfl_week()
-        week = 0 if _week == 'draft' else int(_week)
-        year = self.common.determine_year()
-        
-        try:
-            ret = {
-                's_full_name': str(data['Name']).strip(),
-                's_position': str(data['Position']).strip(),
-                'i_salary': int(data['Salary']),
-                'id_week': int(week),
-                'id_year': int(year)
-            }
-        except Exception as e:
-            logger.warning(f'incomplete data record: {data} - {e}')
-            return {}
-    
-        return ret
+            RowConverter - callable turning one csv row into a normalized dict, {} if incomplete
+        """
+        if context not in self.converters:
+            self.converters[context] = RowConverter(
+                name='draftkings salary',
+                columns=DRAFTKINGS_SALARY_COLUMNS,
+                constants=context.columns()
+            )
+        return self.converters[context]
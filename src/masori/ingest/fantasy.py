@@ -2,369 +2,151 @@
 Handles ingestion of fantasy projection data from fantasypros.com
 """
 
-from typing import Dict
+from typing import Any, Dict, List, Optional, Tuple
 from loguru import logger
 
 from masori.ingest.common import Common
+from masori.ingest.transforms import Column, ContextConverter, RowConverter, RunContext
+
+# column specs per projections page, https://www.fantasypros.com/nfl/projections/{position}.php?week={week}&scoring=PPR
+FANTASYPROS_COLUMNS = {
+    # {"Player": "Brock Purdy", "ATT": "3.5", "CMP": "21.4", "YDS": "14.8", "TDS": "0.2",
+    #  "INTS": "0.8", "FL": "0.2", "FPTS": "17.7", "Team": "SF"}
+    'qb': [
+        Column('Player', 's_full_name'),
+        Column('ATT', 'dec_att', 'float'),
+        Column('CMP', 'dec_cmp', 'float'),
+        Column('YDS', 'dec_yds', 'float'),
+        Column('TDS', 'dec_tds', 'float'),
+        Column('INTS', 'dec_ints', 'float'),
+        Column('FL', 'dec_fl', 'float'),
+        Column('FPTS', 'dec_fpts', 'float'),
+        Column('Team', 's_team')
+    ],
+    # {"Player": "Saquon Barkley", "ATT": "20.3", "YDS": "18.9", "TDS": "0.1", "REC": "2.4",
+    #  "FL": "0.1", "FPTS": "19.0", "Team": "PHI"}
+    'rb': [
+        Column('Player', 's_full_name'),
+        Column('ATT', 'dec_att', 'float'),
+        Column('YDS', 'dec_yds', 'float'),
+        Column('TDS', 'dec_tds', 'float'),
+        Column('REC', 'dec_rec', 'float'),
+        Column('FL', 'dec_fl', 'float'),
+        Column('FPTS', 'dec_fpts', 'float'),
+        Column('Team', 's_team')
+    ],
+    # {"Player": "Ja'Marr Chase", "REC": "6.7", "YDS": "1.2", "TDS": "0.0", "ATT": "0.2",
+    #  "FL": "0.1", "FPTS": "19.5", "Team": "CIN"}
+    'wr': [
+        Column('Player', 's_full_name'),
+        Column('REC', 'dec_rec', 'float'),
+        Column('YDS', 'dec_yds', 'float'),
+        Column('TDS', 'dec_tds', 'float'),
+        Column('ATT', 'dec_att', 'float'),
+        Column('FL', 'dec_fl', 'float'),
+        Column('FPTS', 'dec_fpts', 'float'),
+        Column('Team', 's_team')
+    ],
+    # {"Player": "Trey McBride", "REC": "6.2", "YDS": "62.0", "TDS": "0.4", "FL": "0.0",
+    #  "FPTS": "14.6", "Team": "ARI"}
+    'te': [
+        Column('Player', 's_full_name'),
+        Column('REC', 'dec_rec', 'float'),
+        Column('YDS', 'dec_yds', 'float'),
+        Column('TDS', 'dec_tds', 'float'),
+        Column('FL', 'dec_fl', 'float'),
+        Column('FPTS', 'dec_fpts', 'float'),
+        Column('Team', 's_team')
+    ],
+    # {"Player": "Pittsburgh Steelers", "SACK": "2.9", "INT": "0.8", "FR": "0.6", "FF": "1.0",
+    #  "TD": "0.2", "SAFETY": "0.0", "PA": "17.3", "YDS AGN": "300.6", "FPTS": "7.7"}
+    'dst': [
+        Column('Player', 's_full_name'),
+        Column('SACK', 'dec_sack', 'float'),
+        Column('INT', 'dec_int', 'float'),
+        Column('FR', 'dec_fr', 'float'),
+        Column('FF', 'dec_ff', 'float'),
+        Column('TD', 'dec_td', 'float'),
+        Column('SAFETY', 'dec_safety', 'float'),
+        Column('PA', 'dec_pa', 'float'),
+        # loaded as text, existing dst_proj tables have it as a TEXT column
+        Column('YDS AGN', 'dec_yds_agn', 'raw'),
+        Column('FPTS', 'dec_fpts', 'float')
+    ],
+    # {"Player": "Jake Elliott", "FG": "1.7", "FGA": "1.9", "XPT": "2.9", "FPTS": "8.1", "Team": "PHI"}
+    'k': [
+        Column('Player', 's_full_name'),
+        Column('FG', 'dec_fg', 'float'),
+        Column('FGA', 'dec_fga', 'float'),
+        Column('XPT', 'dec_xpt', 'float'),
+        Column('FPTS', 'dec_fpts', 'float'),
+        Column('Team', 's_team')
+    ]
+}
 
 class Fantasy:
     def __init__(self):
         self.logger = logger
         self.common = Common()
+        self.converters: Dict[tuple, RowConverter] = {}
 
-    def get_data_from_fantasypros(self, position: str) -> Dict:
+    def get_data_from_fantasypros(self, position: str, context: Optional[RunContext] = None, parse: bool = True) -> Dict:
         """
         Scrapes https://www.fantasypros.com for fantasy data.
         Args:
             position (str): Position to scrape data for.
+            context (RunContext): year, week and scoring to request, defaults to the current week
+            parse (bool): False to return the page undecoded, see Common.parse_fantasypros_payload
         Returns:
-            df (DataFrame): Pandas DataFrame with player and fantasy points projections.
+            data (Dict): {'results': [...]} with one dict per projections table row.
 
         """
-        week = self.common.determine_nfl_week()
-        url = f'https://www.fantasypros.com/nfl/projections/{position}.php?week={week}&scoring=PPR'
-        
+        context = context or RunContext.current()
+        url = f'https://www.fantasypros.com/nfl/projections/{position}.php?week={context.week}&scoring={context.scoring}'
+        if context.year != self.common.determine_year():
+            # past seasons are only served with an explicit year
+            url += f'&year={context.year}'
 
-        resp = self.common.generic_fantasypros_html_parser(url)
+        resp = self.common.generic_fantasypros_html_parser(url, skip_unchanged=True, parse=parse)
 
         return resp
-    
-    def transform_qb_data_from_fantasypros(self, results: Dict) -> Dict:
-        '''
-        transforms payload from https://www.fantasypros.com/nfl/projections/qb.php?week={week}&scoring=PPR
 
-                Schema is flexible - if addtl fields are needed, adjust in this function
-
-                Args:
-                    player: str - raw string from api response
-
-                payload structure:
-        {
-            "results": [
-                {
-                    "Player": "Brock Purdy",
-                    "ATT": "3.5",
-                    "CMP": "21.4",
-                    "YDS": "14.8",
-                    "TDS": "0.2",
-                    "INTS": "0.8",
-                    "FL": "0.2",
-                    "FPTS": "17.7",
-                    "Team": "SF"
-                },
-            ]
-        }   
-
-
-        Returns:
-            Dict{} - key value pair of data in normalized format
-            '''
-        
-        ret = {}
-        _week = self.common.determine_nfl_week()
-        week = 0 if _week == 'draft' else int(_week)
-        year = self.common.determine_year()
-        
-        try:
-            ret = {
-                's_full_name': results['Player'],
-                'dec_att': float(results['ATT']),
-                'dec_cmp': float(results['CMP']),
-                'dec_yds': float(results['YDS']),
-                'dec_tds': float(results['TDS']),
-                'dec_ints': float(results['INTS']),
-                'dec_fl': float(results['FL']),
-                'dec_fpts': float(results['FPTS']),
-                's_team': results['Team'],
-                'id_week': int(week),
-                'id_year': int(year)
-
-            }
-        except Exception as e:
-            logger.warning(f'incomplete data record: {results} - {e}')
-            return {}
-
-        
-        return ret
-
-
-    def transform_wr_data_from_fantasypros(self, results: Dict) -> Dict:
-        '''
-        transforms payload from https://www.fantasypros.com/nfl/projections/wr.php?week={week}&scoring=PPR
-
-                Schema is flexible - if addtl fields are needed, adjust in this function
-
-                Args:
-                    player: str - raw string from api response
-
-                payload structure:
-        {
-            "results": [
-                {
-                    "Player": "Ja'Marr Chase",
-                    "REC": "6.7",
-                    "YDS": "1.2",
-                    "TDS": "0.0",
-                    "ATT": "0.2",
-                    "FL": "0.1",
-                    "FPTS": "19.5",
-                    "Team": "CIN"
-                }
-            ]
-        }   
-
-
-        Returns:
-            Dict{} - key value pair of data in normalized format
-            '''
-        
-        ret = {}
-        _week = self.common.determine_nfl_week()
-        week = 0 if _week == 'draft' else int(_week)
-        year = self.common.determine_year()
-        
-        try:
-            ret = {
-                's_full_name': results['Player'],
-                'dec_rec': float(results['REC']),
-                'dec_yds': float(results['YDS']),
-                'dec_tds': float(results['TDS']),
-                'dec_att': float(results['ATT']),
-                'dec_fl': float(results['FL']),
-                'dec_fpts': float(results['FPTS']),
-                's_team': results['Team'],
-                'id_week': int(week),
-                'id_year': int(year)
-
-            }
-        except Exception as e:
-            logger.warning(f'incomplete data record: {results} - {e}')
-            return {}
-
-        
-        return ret
-    
-
-    def transform_te_data_from_fantasypros(self, results: Dict) -> Dict:
-        '''
-        transforms payload from https://www.fantasypros.com/nfl/projections/te.php?week={week}&scoring=PPR
-
-                Schema is flexible - if addtl fields are needed, adjust in this function
-
-                Args:
-                    player: str - raw string from api response
-
-                payload structure:
-        {
-            "results": [
-                {
-                    "Player": "Trey McBride",
-                    "REC": "6.2",
-                    "YDS": "62.0",
-                    "TDS": "0.4",
-                    "FL": "0.0",
-                    "FPTS": "14.6",
-                    "Team": "ARI"
-                }
-            ]
-        }   
-
-
-        Returns:
-            Dict{} - key value pair of data in normalized format
-            '''
-        
-        ret = {}
-        _week = self.common.determine_nfl_week()
-        week = 0 if _week == 'draft' else int(_week)
-        year = self.common.determine_year()
-        
-        try:
-            ret = {
-                's_full_name': results['Player'],
-                'dec_rec': float(results['REC']),
-                'dec_yds': float(results['YDS']),
-                'dec_tds': float(results['TDS']),
-                'dec_fl': float(results['FL']),
-                'dec_fpts': float(results['FPTS']),
-                's_team': results['Team'],
-                'id_week': int(week),
-                'id_year': int(year)
-
-            }
-        except Exception as e:
-            logger.warning(f'incomplete data record: {results} - {e}')
-            return {}
-
-        
-        return ret
-
-    def transform_rb_data_from_fantasypros(self, results: Dict) -> Dict:
-        '''
-        transforms payload from https://www.fantasypros.com/nfl/projections/te.php?week={week}&scoring=PPR
-
-                Schema is flexible - if addtl fields are needed, adjust in this function
-
-                Args:
-                    player: str - raw string from api response
-
-                payload structure:
-        {
-            "results": [
-                {
-                    "Player": "Saquon Barkley",
-                    "ATT": "20.3",
-                    "YDS": "18.9",
-                    "TDS": "0.1",
-                    "REC": "2.4",
-                    "FL": "0.1",
-                    "FPTS": "19.0",
-                    "Team": "PHI"
-                }
-            ]
-        }   
-
-
-        Returns:
-            Dict{} - key value pair of data in normalized format
-            '''
-        
-        ret = {}
-        _week = self.common.determine_nfl_week()
-        week = 0 if _week == 'draft' else int(_week)
-        year = self.common.determine_year()
-        
-        try:
-            ret = {
-                's_full_name': results['Player'],
-                'dec_att': float(results['ATT']),
-                'dec_yds': float(results['YDS']),
-                'dec_tds': float(results['TDS']),
-                'dec_rec': float(results['REC']),
-                'dec_fl': float(results['FL']),
-                'dec_fpts': float(results['FPTS']),
-                's_team': results['Team'],
-                'id_week': int(week),
-                'id_year': int(year)
-            }
-
-        except Exception as e:
-            logger.warning(f'incomplete data record: {results} - {e}')
-            return {}
-
-        
-        return ret
-    
-
-    def transform_dst_data_from_fantasypros(self, results: Dict) -> Dict:
-        '''
-        transforms payload from https://www.fantasypros.com/nfl/projections/te.php?week={week}&scoring=PPR
-
-                Schema is flexible - if addtl fields are needed, adjust in this function
-
-                Args:
-                    player: str - raw string from api response
-
-                payload structure:
-        {
-            "results": [
-                {
-                    "Player": "Pittsburgh Steelers",
-                    "SACK": "2.9",
-                    "INT": "0.8",
-                    "FR": "0.6",
-                    "FF": "1.0",
-                    "TD": "0.2",
-                    "SAFETY": "0.0",
-                    "PA": "17.3",
-                    "YDS AGN": "300.6",
-                    "FPTS": "7.7"
-                }
-            ]
-        }   
+    def converter(self, position: str, context: RunContext) -> RowConverter:
+        """
+        Row converter for a projections page, compiled once per position and run context
 
+        Args:
+            position: str - key of FANTASYPROS_COLUMNS
+            context: RunContext - week and year every row is tagged with
 
         Returns:
-            Dict{} - key value pair of data in normalized format
-            '''
-        
-        ret = {}
-        _week = self.common.determine_nfl_week()
-        week = 0 if _week == 'draft' else int(_week)
-        year = self.common.determine_year()
-        
-        try:
-            ret = {
-                's_full_name': results['Player'],
-                'dec_sack': float(results['SACK']),
-                'dec_int': float(results['INT']),
-                'dec_fr': float(results['FR']),
-                'dec_ff': float(results['FF']),
-                'dec_td': float(results['TD']),
-                'dec_safety': float(results['SAFETY']),
-                'dec_pa': float(results['PA']),
-                'dec_yds_agn': results['YDS AGN'],
-                'dec_fpts': float(results['FPTS']),
-                'id_week': int(week),
-                'id_year': int(year)
-            }
-            
-        except Exception as e:
-            logger.warning(f'incomplete data record: {results} - {e}')
-            return {}
-
-        
-        return ret
-    
-
-    def transform_k_data_from_fantasypros(self, results: Dict) -> Dict:
-        '''
-        transforms payload from https://www.fantasypros.com/nfl/projections/k.php?week={week}&scoring=PPR
-
-                Schema is flexible - if addtl fields are needed, adjust in this function
-
-                Args:
-                    player: str - raw string from api response
-
-                payload structure:
-        {
-    "results": [
-                {
-                    "Player": "Jake Elliott",
-                    "FG": "1.7",
-                    "FGA": "1.9",
-                    "XPT": "2.9",
-                    "FPTS": "8.1",
-                    "Team": "PHI"
-                }
-            ]
-        }   
-
+            RowConverter - callable turning one table row into a normalized dict, {} if incomplete
+        """
+        key = (position, context)
+        if key not in self.converters:
+            self.converters[key] = RowConverter(
+                name=f'fantasypros {position}',
+                columns=FANTASYPROS_COLUMNS[position],
+                constants=context.columns()
+            )
+        return self.converters[key]
+
+    def context_converter(self, position: str) -> ContextConverter:
+        """
+        Row converter for (RunContext, row) pairs of a position, for pipelines loading many weeks
+        """
+        return ContextConverter(name=f'fantasypros {position}', columns=FANTASYPROS_COLUMNS[position])
 
-        Returns:
-            Dict{} - key value pair of data in normalized format
-            '''
-        
-        ret = {}
-        _week = self.common.determine_nfl_week()
-        week = 0 if _week == 'draft' else int(_week)
-        year = self.common.determine_year()
-        
-        try:
-            ret = {
-                's_full_name': results['Player'],
-                'dec_fg': float(results['FG']),
-                'dec_fga': float(results['FGA']),
-                'dec_xpt': float(results['XPT']),
-                'dec_fpts': float(results['FPTS']),
-                's_team': results['Team'],
-                'id_week': int(week),
-                'id_year': int(year)
-            }
-            
-        except Exception as e:
-            logger.warning(f'incomplete data record: {results} - {e}')
-            return {}
+    @staticmethod
+    def results(raw: Dict) -> List[Dict]:
+        """
+        Table rows of a parsed projections page
+        """
+        return raw.get('results', [])
 
-        
-        return ret
\ No newline at end of file
+    @staticmethod
+    def results_with_context(raw: Dict) -> List[Tuple[RunContext, Dict[str, Any]]]:
+        """
+        Table rows of a parsed projections page paired with the RunContext it was fetched for
+        """
+        return [(raw['context'], item) for item in raw.get('results', [])]
@@ -0,0 +1,301 @@
+"""
+Compressed, content-addressed landing zone for raw response bodies, with per-run manifests for replays
+"""
+
+import io
+import os
+import re
+import json
+import zlib
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from loguru import logger
+
+from masori.config import settings
+
+
+class LandingWriter:
+    """
+    Hashes and gzips a body as it is written and files it under its sha256 on commit()
+    """
+    def __init__(self, zone: 'LandingZone'):
+        self.zone = zone
+        self.zone.objects.mkdir(parents=True, exist_ok=True)
+        self.tmp = self.zone.objects / f'.{os.getpid()}.{threading.get_ident()}.{id(self)}.tmp'
+        self.sink = open(self.tmp, 'wb')
+        # wbits 31 writes a gzip container, so objects open with gzip / zcat
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self.digest.update(chunk)
+        self.size += len(chunk)
+        self.sink.write(self.compressor.compress(chunk))
+
+    def commit(self) -> str:
+        """
+        Returns:
+            str - sha256 of the body, which is also its object name
+        """
+        self.sink.write(self.compressor.flush())
+        self.sink.close()
+
+        digest = self.digest.hexdigest()
+        path = self.zone.object_path(digest)
+        if path.exists():
+            self.tmp.unlink(missing_ok=True)
+            self.zone.touch(path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self.tmp, path)
+        return digest
+
+    def abort(self) -> None:
+        if not self.sink.closed:
+            self.sink.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+class LandingTee(io.RawIOBase):
+    """
+    Readable stream that lands everything read through it, so streamed bodies are
+    kept without holding them in memory. Bodies abandoned part way are dropped.
+    """
+    def __init__(self, raw, writer: LandingWriter, on_commit: Callable[[str, int], None]):
+        self.raw = raw
+        self.writer = writer
+        self.on_commit = on_commit
+        self.done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self.raw.read(len(buffer))
+        if not chunk:
+            self.finish()
+            return 0
+
+        n = len(chunk)
+        buffer[:n] = chunk
+        self.writer.write(chunk)
+        return n
+
+    def finish(self) -> None:
+        if self.done:
+            return
+        self.done = True
+        try:
+            self.on_commit(self.writer.commit(), self.writer.size)
+        except OSError as e:
+            logger.warning(f'Failed to land streamed payload - {e}')
+            self.writer.abort()
+
+    def close(self) -> None:
+        if not self.done:
+            self.done = True
+            self.writer.abort()
+        self.raw.close()
+        super().close()
+
+
+class LandingZone:
+    """
+    Every raw response body a pipeline fetches, gzipped under objects/<sha256[:2]>/<sha256>.gz
+    so a body fetched by many runs is stored once, and one JSON lines manifest per pipeline
+    run under runs/<pipeline>/<run_id>.jsonl recording, per ID, when it was fetched and
+    which url resolved to which body.
+
+    A manifest is enough to run the pipeline again without the network, see
+    GenericPipeline.get_ids and HttpSession.replay_from. prune() keeps the last
+    LANDING_KEEP_RUNS runs of each pipeline and drops the bodies no kept run uses.
+    """
+    def __init__(self, directory: Optional[Path] = None):
+        self.logger = logger
+        self.directory = Path(directory or settings.LANDING_DIR)
+        self.objects = self.directory / 'objects'
+        self.runs = self.directory / 'runs'
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str) -> str:
+        """
+        Identity of a url in a manifest, ignoring the scheme and query parameter order
+        """
+        parts = urlsplit(url)
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return f'{parts.netloc.lower()}{parts.path}' + (f'?{query}' if query else '')
+
+    @staticmethod
+    def slug(pipeline_name: str) -> str:
+        return re.sub(r'[^A-Za-z0-9_]+', '_', pipeline_name).strip('_')
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / f'{digest}.gz'
+
+    def writer(self) -> LandingWriter:
+        return LandingWriter(self)
+
+    def put(self, content: bytes) -> str:
+        """
+        Lands a body, once per distinct content
+
+        Returns:
+            str - sha256 of content
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.object_path(digest)
+        if path.exists():
+            self.touch(path)
+            return digest
+
+        writer = self.writer()
+        try:
+            writer.write(content)
+            writer.commit()
+        except BaseException:
+            writer.abort()
+            raise
+        return digest
+
+    @staticmethod
+    def touch(path: Path) -> None:
+        """
+        Bumps the mtime of a body landed again, so prune() running alongside doesn't drop it
+        before the run landing it has recorded it in its manifest
+        """
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get(self, digest: str) -> bytes:
+        """
+        Body landed under digest, raises FileNotFoundError if it isn't there
+        """
+        return zlib.decompress(self.object_path(digest).read_bytes(), 31)
+
+    def manifest_path(self, pipeline_name: str, run_id: str) -> Path:
+        return self.runs / self.slug(pipeline_name) / f'{run_id}.jsonl'
+
+    def record(self, pipeline_name: str, run_id: str, entry: Dict[str, Any]) -> None:
+        """
+        Appends one ID's entry to the run's manifest. Failures are logged, landing never fails a run.
+        """
+        path = self.manifest_path(pipeline_name, run_id)
+        try:
+            line = json.dumps({'pipeline': pipeline_name, 'run_id': run_id, **entry}, default=str)
+            with self._lock:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, 'a') as f:
+                    f.write(line + '\n')
+        except (OSError, TypeError, ValueError) as e:
+            self.logger.warning(f'Failed to record landed payloads in {path} - {e}')
+
+    def find_run(self, pipeline_name: str, run: str) -> Optional[Path]:
+        """
+        Manifest of a pipeline's run
+
+        Args:
+            pipeline_name: str - pipeline the run must belong to
+            run: str - run ID, or 'latest' for the pipeline's most recent run
+
+        Returns:
+            Path - the manifest, None if the pipeline has no such run
+        """
+        directory = self.runs / self.slug(pipeline_name)
+
+        if run == 'latest':
+            manifests = sorted(directory.glob('*.jsonl'), key=lambda path: path.stat().st_mtime)
+            return manifests[-1] if manifests else None
+
+        path = directory / f'{run}.jsonl'
+        return path if path.exists() else None
+
+    def run_context(self, pipeline_name: str, run: str) -> Optional[Dict[str, Any]]:
+        """
+        Context a landed run was fetched with, see GenericPipeline's context
+
+        Args:
+            pipeline_name: str - pipeline the run belongs to
+            run: str - run ID, or 'latest' for the pipeline's most recent run
+
+        Returns:
+            dict - the context recorded with the run's IDs, None if it has none
+        """
+        path = self.find_run(pipeline_name, run)
+        if path is None:
+            return None
+
+        for entry in self.read_manifest(path):
+            if entry.get('context') is not None:
+                return entry['context']
+        return None
+
+    def read_manifest(self, path: Path) -> List[Dict[str, Any]]:
+        """
+        Entries of a manifest in the order they were recorded, skipping a torn last line
+        """
+        entries = []
+        with open(path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    self.logger.warning(f'Skipping unreadable line in {path}')
+        return entries
+
+    def prune(self, pipeline_name: str, keep: int, since: float) -> None:
+        """
+        Deletes all but the newest keep manifests of a pipeline, then every body no remaining
+        manifest of any pipeline refers to. Bodies landed at or after since are kept, as runs
+        still going may land them before recording them. Failures are logged, pruning never
+        fails a run.
+
+        Args:
+            pipeline_name: str - pipeline whose old runs are dropped
+            keep: int - runs of the pipeline to keep, 0 keeps every run
+            since: float - unix time the pruning run started
+        """
+        if keep <= 0:
+            return
+
+        try:
+            directory = self.runs / self.slug(pipeline_name)
+            manifests = sorted(directory.glob('*.jsonl'), key=lambda path: path.stat().st_mtime)
+            stale = manifests[:-keep]
+            if not stale:
+                return
+            for path in stale:
+                path.unlink(missing_ok=True)
+
+            referenced = {
+                payload['sha256']
+                for path in self.runs.glob('*/*.jsonl')
+                for entry in self.read_manifest(path)
+                for payload in entry.get('payloads', [])
+            }
+
+            removed = freed = 0
+            for path in self.objects.glob('*/*.gz'):
+                if path.name[:-len('.gz')] in referenced:
+                    continue
+                stat = path.stat()
+                if stat.st_mtime >= since:
+                    continue
+                path.unlink(missing_ok=True)
+                removed += 1
+                freed += stat.st_size
+        except OSError as e:
+            self.logger.warning(f'Failed to prune landing zone {self.directory} - {e}')
+            return
+
+        self.logger.info(
+            f'Pruned {len(stale)} old landed runs of {pipeline_name} and {removed} unused bodies '
+            f'({freed / 1024 / 1024:.1f} MiB) from {self.directory}'
+        )
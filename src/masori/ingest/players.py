@@ -2,24 +2,71 @@
 Handles ingestion of NFL players from ESPN api
 """
 
-from typing import Dict
+from typing import Any, Dict, List, Optional
 from loguru import logger
 
+from masori.ingest.cache import UNCHANGED
 from masori.ingest.common import Common
+from masori.db.database import Database
+
+ATHLETES_URL = 'https://sports.core.api.espn.com/v2/sports/football/leagues/nfl/athletes'
+# largest page the core API serves, so the whole listing is a handful of requests
+ATHLETES_PAGE_LIMIT = 1000
 
 class Players:
     def __init__(self):
         self.logger = logger
         self.common = Common()
 
-    def get_espn_roster_by_team(self, team_id: str) -> Dict:
+    def get_team_ids(self, year: str) -> List[int]:
+        """
+        Team IDs to fetch rosters for, read from reference.teams so a roster sync
+        doesn't ask ESPN for the team list again. Falls back to the ESPN API when the
+        teams pipeline hasn't loaded anything yet.
+
+        Args:
+            year: str - season, only used for the ESPN fallback
+
+        Returns:
+            list[int]: team IDs
+        """
+        try:
+            ids = Database().get_unique_ids('reference', 'teams', 'id')
+        except Exception as e:
+            self.logger.warning(f'Could not read team IDs from reference.teams - {e}')
+            ids = []
+
+        if not ids:
+            self.logger.info('No teams in reference.teams, fetching team IDs from ESPN')
+            return self.common.get_nfl_team_ids(year)
+
+        return sorted(ids)
+
+    def get_espn_roster_by_team(self, team_id: str, watermarks: Optional[Any] = None) -> Dict:
         """
         Retrieves NFL Team information from ESPN API in raw format
+
+        Args:
+            team_id: str - ESPN team ID
+            watermarks: Watermarks - when given, returns UNCHANGED for rosters whose
+                        athletes match the last load, and stages the new digest otherwise
+
+        Returns:
+            Dict - roster payload, or UNCHANGED
         """
         url = f"https://site.api.espn.com/apis/site/v2/sports/football/nfl/teams/{team_id}/roster"
 
-        data = self.common.generic_http_request(url)
-        
+        data = self.common.generic_http_request(url, skip_unchanged=True)
+
+        if watermarks is None or data is UNCHANGED:
+            return data
+
+        # the payload's timestamp changes on every request, so only the athletes are compared
+        digest = watermarks.digest(data.get('athletes', []))
+        if watermarks.unchanged(team_id, digest):
+            return UNCHANGED
+        watermarks.stage(team_id, digest)
+
         return data
         
     def transform_espn_roster(self, player: Dict) -> Dict:
@@ -77,3 +124,72 @@ class Players:
         }
 
         return ret
+
+    def get_active_athlete_ids(self, year: str) -> List[str]:
+        """
+        IDs of every active athlete from the paginated core API listing, fetched in
+        ATHLETES_PAGE_LIMIT pages
+
+        Args:
+            year: str - unused, the listing is not per season
+
+        Returns:
+            list[str]: athlete IDs in listing order
+        """
+        ids = self.common.generic_espn_api_metadata_request(
+            url=f'{ATHLETES_URL}?active=true',
+            limit=ATHLETES_PAGE_LIMIT
+        )
+        self.logger.info(f'Found {len(ids)} active athletes')
+
+        return ids
+
+    def get_espn_athlete(self, athlete_id: str) -> Dict:
+        """
+        Retrieves one athlete from the ESPN core API in raw format. Position is embedded
+        in the payload and the team ID is parsed out of its $ref, so nothing else is fetched.
+        """
+        url = f'{ATHLETES_URL}/{athlete_id}'
+
+        return self.common.generic_http_request(url, skip_unchanged=True)
+
+    def transform_espn_athlete(self, athlete: Dict) -> Dict:
+        """
+        Transforms payload from https://sports.core.api.espn.com/v2/sports/football/leagues/nfl/athletes/{athlete_id}
+        into the same row as transform_espn_roster
+
+        payload structure:
+            {
+                "id": "4427834",
+                "firstName": "Erick",
+                "lastName": "All Jr.",
+                "fullName": "Erick All Jr.",
+                "position": {
+                    "$ref": "http://sports.core.api.espn.com/v2/sports/football/leagues/nfl/positions/7?lang=en",
+                    "id": "7",
+                    "name": "Tight End",
+                    "abbreviation": "TE"
+                },
+                "team": {
+                    "$ref": "http://sports.core.api.espn.com/v2/sports/football/leagues/nfl/seasons/2025/teams/4?lang=en"
+                }
+            }
+
+        Returns:
+            Dict{} - key value pair of data in normalized format
+        """
+        team_ref = athlete.get('team', {}).get('$ref')
+        team_id = self.common.parse_ref_string_for_id(team_ref) if team_ref else None
+
+        ret = {
+            'id': int(athlete['id']),
+            's_first_name': str(athlete['firstName']),
+            's_last_name': str(athlete['lastName']),
+            's_full_name': str(athlete['fullName']),
+            'id_team_key': int(team_id) if team_id else None,
+            's_position_name': str(athlete['position']['name']),
+            's_position_abbrev': str(athlete['position']['abbreviation']),
+            'id_position_key': int(athlete['position']['id'])
+        }
+
+        return ret
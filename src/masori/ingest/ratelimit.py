@@ -0,0 +1,191 @@
+"""
+Adaptive per-host rate limiting for the shared HTTP session
+"""
+
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+# responses that mean the host wants us to slow down
+PUSHBACK_STATUSES = (429, 503)
+
+
+class HostLimit(NamedTuple):
+    """
+    Ceilings for one host: requests per second, token bucket burst and concurrent requests
+    """
+    rate: float
+    burst: int
+    concurrency: int
+
+
+def parse_rate_limits(spec: str) -> List[Tuple[str, HostLimit]]:
+    """
+    Parses 'glob=rate[:burst[:concurrency]],...' into an ordered list of (host glob, HostLimit)
+
+    Args:
+        spec: str - comma separated entries, first matching host glob wins.
+              burst defaults to rate, concurrency to 8
+
+    Returns:
+        list[tuple[str, HostLimit]]
+    """
+    ret = []
+    for part in spec.split(','):
+        if '=' not in part:
+            continue
+        pattern, values = part.rsplit('=', 1)
+        fields = values.split(':')
+        rate = float(fields[0])
+        if rate <= 0:
+            raise ValueError(f'Rate for {pattern.strip()} must be positive, got {fields[0]}')
+        burst = int(fields[1]) if len(fields) > 1 and fields[1] else max(1, int(rate))
+        concurrency = int(fields[2]) if len(fields) > 2 and fields[2] else 8
+        ret.append((pattern.strip(), HostLimit(rate, burst, concurrency)))
+    return ret
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds to wait from a Retry-After header, given either as seconds or an HTTP date
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class HostLimiter:
+    """
+    Token bucket plus an AIMD concurrency window for one host.
+
+    Both start at the configured ceiling. A 429 / 503 or a Retry-After header halves the
+    request rate and the window and pauses the host for Retry-After (or an exponential
+    backoff). Every successful response then grows the window by 1/window, about one
+    slot per window of requests, and the rate by 2% of its ceiling, so the limiter
+    settles just under what the host tolerates.
+    """
+    MIN_BACKOFF = 1.0
+    MAX_BACKOFF = 60.0
+    # Retry-After values longer than this are capped, a run shouldn't stall for hours
+    MAX_RETRY_AFTER = 300.0
+
+    def __init__(self, host: str, limit: HostLimit):
+        self.logger = logger
+        self.host = host
+        self.limit = limit
+
+        self.rate = limit.rate
+        self.window = float(limit.concurrency)
+        self.tokens = float(limit.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.backoff = self.MIN_BACKOFF
+        self.active = 0
+
+        self._cond = threading.Condition()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(float(self.limit.burst), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """
+        Blocks until the host may take another request
+
+        Returns:
+            float - seconds spent waiting
+        """
+        start = time.monotonic()
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self.refill(now)
+
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.active >= max(1, int(self.window)):
+                    wait = None
+                elif self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.active += 1
+                    return time.monotonic() - start
+
+                self._cond.wait(wait)
+
+    def release(self, status: Optional[int], retry_after: Optional[float] = None) -> None:
+        """
+        Returns the request's slot and adapts to the response
+
+        Args:
+            status: int - response status, None if the request raised
+            retry_after: float - seconds from the response's Retry-After header
+        """
+        with self._cond:
+            self.active -= 1
+
+            if status in PUSHBACK_STATUSES or retry_after is not None:
+                self.slow_down(status, retry_after)
+            elif status is not None and status < 500:
+                self.window = min(float(self.limit.concurrency), self.window + 1 / self.window)
+                self.rate = min(self.limit.rate, self.rate + self.limit.rate * 0.02)
+                self.backoff = self.MIN_BACKOFF
+
+            self._cond.notify_all()
+
+    def slow_down(self, status: Optional[int], retry_after: Optional[float]) -> None:
+        now = time.monotonic()
+        pause = min(retry_after, self.MAX_RETRY_AFTER) if retry_after is not None else self.backoff
+
+        if now < self.blocked_until:
+            # requests sent before the last pause are still coming back - one decrease per pause
+            self.blocked_until = max(self.blocked_until, now + pause)
+            return
+
+        self.backoff = min(self.backoff * 2, self.MAX_BACKOFF)
+
+        self.window = max(1.0, self.window / 2)
+        self.rate = max(self.limit.rate * 0.05, self.rate / 2)
+        self.blocked_until = now + pause
+
+        self.logger.warning(
+            f'{self.host} pushed back ({status}), pausing {pause:.1f}s and dropping to '
+            f'{int(self.window)} concurrent requests at {self.rate:.1f}/s'
+        )
+
+
+class RateLimiter:
+    """
+    One HostLimiter per host, configured from the first matching glob
+    """
+    def __init__(self, limits: List[Tuple[str, HostLimit]]):
+        self.limits = limits
+        self.hosts: Dict[str, HostLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_host(self, host: str) -> Optional[HostLimiter]:
+        """
+        Limiter for host, or None when no glob matches it
+        """
+        limiter = self.hosts.get(host)
+        if limiter is not None:
+            return limiter
+
+        with self._lock:
+            if host not in self.hosts:
+                limit = next((limit for pattern, limit in self.limits if fnmatch(host, pattern)), None)
+                self.hosts[host] = HostLimiter(host, limit) if limit else None
+            return self.hosts[host]
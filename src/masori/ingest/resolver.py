@@ -0,0 +1,150 @@
+"""
+Run-scoped resolver for ESPN core API $ref links
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from loguru import logger
+
+from masori.config import settings
+from masori.ingest.session import get_session
+
+
+class RefResolver:
+    """
+    Fetches and parses JSON urls at most once per run.
+
+    Concurrent requests for the same url share one fetch (single-flight) and every
+    successful result is memoized until clear(), so pipelines running side by side in
+    `masori all` reuse each other's collection pages and $ref payloads. Failures are
+    not memoized, the next caller tries again.
+
+    Results are shared between callers and must not be mutated.
+    """
+    def __init__(self):
+        self.logger = logger
+        self.session = get_session()
+        self._lock = threading.Lock()
+        self.memo: Dict[str, Any] = {}
+        self.inflight: Dict[str, Future] = {}
+        self.hits = 0
+        self.fetches = 0
+
+    @staticmethod
+    def key(url: str) -> str:
+        """
+        Identity of a url, ignoring the scheme and query parameter order, since $refs
+        come back as http:// links to the same documents we request over https
+        """
+        parts = urlsplit(url)
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return urlunsplit(('', parts.netloc.lower(), parts.path, query, ''))
+
+    def resolve(self, url: str) -> Any:
+        """
+        Parsed JSON body of url, fetched through the shared session unless this run already
+        has it or another thread is fetching it right now
+
+        Args:
+            url: str - url or $ref to fetch
+
+        Returns:
+            Any - parsed JSON, raises if the fetch fails
+        """
+        key = self.key(url)
+
+        with self._lock:
+            if key in self.memo:
+                self.hits += 1
+                return self.memo[key]
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[key] = future
+            else:
+                self.hits += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            data = self.session.fetch(url).json()
+        except BaseException as e:
+            with self._lock:
+                del self.inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self.memo[key] = data
+            del self.inflight[key]
+            self.fetches += 1
+        future.set_result(data)
+
+        return data
+
+    def resolve_many(self, urls: List[str], max_workers: Optional[int] = None) -> List[Optional[Any]]:
+        """
+        Resolves urls concurrently, each distinct url once
+
+        Args:
+            urls: list[str] - urls or $refs to fetch
+            max_workers: int - concurrent requests (defaults to EXTRACT_MAX_WORKERS)
+
+        Returns:
+            list - parsed JSON in the same order as urls, None where the fetch failed
+        """
+        def resolve_or_none(url: str) -> Optional[Any]:
+            try:
+                return self.resolve(url)
+            except Exception as e:
+                self.logger.warning(f'Problem resolving {url} - {e}')
+                return None
+
+        distinct = list(dict.fromkeys(urls))
+        if len(distinct) <= 1:
+            results = [resolve_or_none(url) for url in distinct]
+        else:
+            workers = min(max_workers or settings.EXTRACT_MAX_WORKERS, len(distinct))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='masori-refs') as executor:
+                results = list(executor.map(resolve_or_none, distinct))
+
+        resolved = dict(zip(distinct, results))
+
+        return [resolved[url] for url in urls]
+
+    def clear(self) -> None:
+        """
+        Forgets every memoized result, e.g. between benchmark runs
+        """
+        with self._lock:
+            self.memo.clear()
+            self.hits = 0
+            self.fetches = 0
+
+    def log_stats(self) -> None:
+        with self._lock:
+            if self.hits:
+                self.logger.info(f'$ref resolver: {self.fetches} urls fetched, {self.hits} repeat lookups served from memory')
+
+
+_resolver: Optional[RefResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver() -> RefResolver:
+    """
+    Returns the process-wide RefResolver, creating it on first use
+    """
+    global _resolver
+
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = RefResolver()
+
+    return _resolver
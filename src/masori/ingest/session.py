@@ -0,0 +1,539 @@
+"""
+Shared, pooled HTTP session for data ingestion
+"""
+
+import io
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from loguru import logger
+
+from masori.config import settings
+from masori.ingest.cache import ResponseCache, FetchResult, StreamResult, CacheTee, parse_ttls
+from masori.ingest.ratelimit import RateLimiter, PUSHBACK_STATUSES, parse_rate_limits, parse_retry_after
+from masori.ingest.landing import LandingZone, LandingTee
+
+
+class HttpStats:
+    """
+    Thread-safe per-host counters for requests made and new connections opened
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.connections: Dict[str, int] = {}
+
+    def record_request(self, host: str) -> None:
+        with self._lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+
+    def record_connection(self, host: str) -> None:
+        with self._lock:
+            self.connections[host] = self.connections.get(host, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarises the counters per host
+
+        Returns:
+            Dict - host -> requests, connections, handshakes_avoided and reuse_rate
+        """
+        with self._lock:
+            ret = {}
+            for host, reqs in self.requests.items():
+                conns = self.connections.get(host, 0)
+                avoided = max(reqs - conns, 0)
+                ret[host] = {
+                    'requests': reqs,
+                    'connections': conns,
+                    'handshakes_avoided': avoided,
+                    'reuse_rate': round(avoided / reqs, 3) if reqs else 0.0
+                }
+            return ret
+
+
+class CountingReader(io.RawIOBase):
+    """
+    Passes reads through to a response stream and reports how many bytes each one returned
+    """
+    def __init__(self, raw, on_read: Callable[[int], None]):
+        self.raw = raw
+        self.on_read = on_read
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self.raw.readinto(buffer)
+        if n:
+            self.on_read(n)
+        return n
+
+    def close(self) -> None:
+        self.raw.close()
+        super().close()
+
+
+class PooledAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose connection pools report every new connection (i.e. every TCP/TLS handshake)
+    """
+    def __init__(self, stats: HttpStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+
+        stats = self.stats
+
+        # connect() runs once per TCP (+TLS) handshake, including reconnects of dropped keep-alive sockets
+        class CountingHTTPConnection(HTTPConnection):
+            def connect(self):
+                stats.record_connection(self.host)
+                return super().connect()
+
+        class CountingHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                stats.record_connection(self.host)
+                return super().connect()
+
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = CountingHTTPConnection
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = CountingHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool
+        }
+
+
+class HttpSession:
+    """
+    Keep-alive requests session shared by every ingest class.
+
+    urllib3 pools are thread-safe, so a single session is used from all extract workers.
+    """
+    def __init__(self, pool_connections: Optional[int] = None, pool_maxsize: Optional[int] = None):
+        self.logger = logger
+        self.stats = HttpStats()
+        self.timeout = settings.HTTP_TIMEOUT
+
+        # keep at least one connection per extract worker so concurrent requests to a host aren't discarded
+        self.pool_connections = pool_connections or settings.HTTP_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or max(settings.HTTP_POOL_MAXSIZE, settings.EXTRACT_MAX_WORKERS)
+
+        adapter = PooledAdapter(
+            stats=self.stats,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize
+        )
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(make_headers(keep_alive=True, accept_encoding=True))
+
+        self.cache = ResponseCache(
+            directory=settings.HTTP_CACHE_DIR,
+            max_bytes=settings.HTTP_CACHE_MAX_MB * 1024 * 1024,
+            ttls=parse_ttls(settings.HTTP_CACHE_TTLS)
+        ) if settings.HTTP_CACHE_ENABLED else None
+        # per-host token bucket + adaptive concurrency, None disables throttling
+        self.limiter = RateLimiter(parse_rate_limits(settings.HTTP_RATE_LIMITS)) if settings.HTTP_RATE_LIMITS else None
+        self.max_retries = settings.HTTP_MAX_RETRIES
+        self._local = threading.local()
+
+        # every body fetched is kept on disk for `masori --replay`, url -> its latest landed body
+        self.landing = LandingZone() if settings.LANDING_ENABLED or settings.PIPELINE_REPLAY else None
+        self.landed: Dict[str, Dict[str, Any]] = {}
+        self._landing_lock = threading.Lock()
+        # url key -> landed body served instead of the network, set for the whole process by --replay
+        self.replay: Optional[Dict[str, Dict[str, Any]]] = {} if settings.PIPELINE_REPLAY else None
+
+        # maps every outgoing url, e.g. onto the benchmark fixture server
+        self.url_rewriter: Optional[Callable[[str], str]] = None
+
+    def set_url_rewriter(self, rewriter: Optional[Callable[[str], str]]) -> None:
+        """
+        Sends every request to rewriter(url) instead of url. Cache entries stay keyed
+        by the original url. Pass None to go back to the real hosts.
+
+        Args:
+            rewriter: Callable[[str], str] - maps a url to the one actually requested
+        """
+        self.url_rewriter = rewriter
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET request through the shared connection pools and the host's rate limiter.
+        429 / 503 responses are retried up to HTTP_MAX_RETRIES times once the limiter
+        lets the host be requested again.
+
+        Args:
+            url: str - url to make the request to
+            kwargs - passed through to requests.Session.get
+
+        Returns:
+            requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        # limits follow the real host, also when the request is rewritten to a fixture server
+        host = urlsplit(url).hostname
+        limiter = self.limiter.for_host(host) if self.limiter is not None and host else None
+        if self.url_rewriter is not None:
+            url = self.url_rewriter(url)
+
+        for attempt in range(self.max_retries + 1):
+            if limiter is not None:
+                self._local.throttle_seconds = self.throttle_seconds() + limiter.acquire()
+
+            self.stats.record_request(urlsplit(url).hostname)
+            start = time.perf_counter()
+            try:
+                resp = self.session.get(url, **kwargs)
+            except BaseException:
+                if limiter is not None:
+                    limiter.release(None)
+                raise
+            finally:
+                self._local.http_seconds = self.http_seconds() + time.perf_counter() - start
+
+            if limiter is not None:
+                limiter.release(resp.status_code, parse_retry_after(resp.headers.get('Retry-After')))
+
+            if resp.status_code not in PUSHBACK_STATUSES:
+                break
+
+            self._local.throttled = self.throttled() + 1
+            if attempt < self.max_retries:
+                self.logger.info(f'{resp.status_code} from {host}, retrying ({attempt + 1}/{self.max_retries})')
+                resp.close()
+
+        if not kwargs.get('stream'):
+            self.record_bytes(len(resp.content))
+
+        return resp
+
+    def throttle_seconds(self) -> float:
+        """
+        Total time the current thread has spent waiting on the rate limiter
+        """
+        return getattr(self._local, 'throttle_seconds', 0.0)
+
+    def throttled(self) -> int:
+        """
+        429 / 503 responses the current thread has received
+        """
+        return getattr(self._local, 'throttled', 0)
+
+    def http_seconds(self) -> float:
+        """
+        Total time the current thread has spent waiting on requests. For streamed
+        responses this only covers the headers, the body is read by the caller.
+        """
+        return getattr(self._local, 'http_seconds', 0.0)
+
+    def record_bytes(self, n: int) -> None:
+        self._local.http_bytes = self.http_bytes() + n
+
+    def http_bytes(self) -> int:
+        """
+        Total response bytes the current thread has downloaded. Bodies served from
+        the response cache don't count, streamed bodies count as they are read.
+        """
+        return getattr(self._local, 'http_bytes', 0)
+
+    def download_stream(self, resp: requests.Response):
+        """
+        Decoded body of a streamed response that reports its size as it is read
+        """
+        resp.raw.decode_content = True
+        # urllib3 closes the response once the socket is drained, which would strand
+        # decoded bytes still sitting in its buffer - close it explicitly instead
+        resp.raw.auto_close = False
+        return CountingReader(resp.raw, self.record_bytes)
+
+    def fetch(self, url: str) -> FetchResult:
+        """
+        GET through the on-disk response cache.
+
+        Responses still inside their endpoint TTL are served from disk. Older entries are
+        revalidated with If-None-Match / If-Modified-Since, and a 304 reuses the cached body.
+        The result is flagged unchanged when its body matches the one the last successful
+        load was built from.
+
+        Every body is landed (see LandingZone), and while replaying a run it comes from
+        the landing zone instead of the network.
+
+        Args:
+            url: str - url to make the request to
+
+        Returns:
+            FetchResult
+        """
+        self.capture(url)
+
+        if self.replay is not None:
+            entry = self.replayed(url)
+            return FetchResult(url, 200, self.landing.get(entry['sha256']), entry['encoding'], from_cache=True)
+
+        result = self.fetch_remote(url)
+        if self.landing is not None:
+            try:
+                self.record_landed(url, self.landing.put(result.content), len(result.content), result.encoding)
+            except OSError as e:
+                self.logger.warning(f'Failed to land payload of {url} - {e}')
+
+        return result
+
+    def fetch_remote(self, url: str) -> FetchResult:
+        """
+        fetch without the capture, replay and landing
+        """
+        if self.cache is None:
+            resp = self.get(url)
+            resp.raise_for_status()
+            return FetchResult(url, resp.status_code, resp.content, resp.encoding)
+
+        entry = self.cache.lookup(url)
+        if entry:
+            unchanged = entry['sha256'] == entry.get('loaded_sha256')
+
+            if self.cache.is_fresh(url, entry):
+                content = self.cache.read(url)
+                if content is not None:
+                    return FetchResult(url, 200, content, entry['encoding'], from_cache=True, unchanged=unchanged)
+
+            resp = self.get(url, headers=self.cache.validators(entry))
+            if resp.status_code == 304:
+                content = self.cache.read(url)
+                if content is not None:
+                    self.cache.revalidated(url)
+                    return FetchResult(url, 200, content, entry['encoding'], from_cache=True, unchanged=unchanged)
+                # cached body went missing - fetch it again unconditionally
+                resp = self.get(url)
+        else:
+            resp = self.get(url)
+
+        resp.raise_for_status()
+        digest = self.cache.store(
+            url,
+            resp.content,
+            etag=resp.headers.get('ETag'),
+            last_modified=resp.headers.get('Last-Modified'),
+            encoding=resp.encoding
+        )
+
+        return FetchResult(
+            url, resp.status_code, resp.content, resp.encoding,
+            unchanged=entry is not None and digest == entry.get('loaded_sha256')
+        )
+
+    def open_stream(self, url: str) -> StreamResult:
+        """
+        Like fetch, but returns the body as a stream instead of reading it into memory.
+        A fresh download is written through to the response cache as it is read.
+
+        Args:
+            url: str - url to make the request to
+
+        Returns:
+            StreamResult - call close() when done reading
+        """
+        self.capture(url)
+
+        if self.replay is not None:
+            entry = self.replayed(url)
+            body = io.BytesIO(self.landing.get(entry['sha256']))
+            return StreamResult(url, body, entry['encoding'], from_cache=True)
+
+        result = self.open_remote_stream(url)
+        if self.landing is not None:
+            try:
+                result.raw = LandingTee(
+                    result.raw,
+                    self.landing.writer(),
+                    lambda digest, size: self.record_landed(url, digest, size, result.encoding)
+                )
+            except OSError as e:
+                self.logger.warning(f'Failed to land payload of {url} - {e}')
+
+        return result
+
+    def open_remote_stream(self, url: str) -> StreamResult:
+        """
+        open_stream without the capture, replay and landing
+        """
+        if self.cache is None:
+            resp = self.get(url, stream=True)
+            resp.raise_for_status()
+            return StreamResult(url, self.download_stream(resp), resp.encoding)
+
+        entry = self.cache.lookup(url)
+        if entry:
+            unchanged = entry['sha256'] == entry.get('loaded_sha256')
+
+            if self.cache.is_fresh(url, entry):
+                body = self.cache.open(url)
+                if body is not None:
+                    return StreamResult(url, body, entry['encoding'], from_cache=True, unchanged=unchanged)
+
+            resp = self.get(url, headers=self.cache.validators(entry), stream=True)
+            if resp.status_code == 304:
+                resp.close()
+                body = self.cache.open(url)
+                if body is not None:
+                    self.cache.revalidated(url)
+                    return StreamResult(url, body, entry['encoding'], from_cache=True, unchanged=unchanged)
+                resp = self.get(url, stream=True)
+        else:
+            resp = self.get(url, stream=True)
+
+        resp.raise_for_status()
+        tee = CacheTee(
+            self.download_stream(resp),
+            self.cache,
+            url,
+            etag=resp.headers.get('ETag'),
+            last_modified=resp.headers.get('Last-Modified'),
+            encoding=resp.encoding
+        )
+
+        return StreamResult(url, tee, resp.encoding)
+
+    def capture(self, url: str) -> None:
+        captured = getattr(self._local, 'urls', None)
+        if captured is not None:
+            captured.append(url)
+
+    def begin_capture(self) -> None:
+        """
+        Starts recording the urls fetched on the current thread
+        """
+        self._local.urls = []
+
+    def end_capture(self) -> List[str]:
+        """
+        Stops recording and returns the urls fetched on the current thread since begin_capture
+        """
+        urls = getattr(self._local, 'urls', None) or []
+        self._local.urls = None
+        return urls
+
+    def note_partial(self, url: str) -> None:
+        """
+        Records that a paginated collection came back with pages missing
+        """
+        partial = getattr(self._local, 'partial', None)
+        if partial is not None:
+            partial.append(url)
+
+    def begin_partial(self) -> None:
+        """
+        Starts recording the collections fetched on the current thread that were left incomplete
+        """
+        self._local.partial = []
+
+    def end_partial(self) -> List[str]:
+        """
+        Stops recording and returns the urls of the incomplete collections since begin_partial
+        """
+        partial = getattr(self._local, 'partial', None) or []
+        self._local.partial = None
+        return partial
+
+    def record_landed(self, url: str, digest: str, size: int, encoding: Optional[str]) -> None:
+        with self._landing_lock:
+            self.landed[url] = {'url': url, 'sha256': digest, 'bytes': size, 'encoding': encoding}
+
+    def landed_payload(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        The body last landed for url, as recorded in run manifests
+        """
+        with self._landing_lock:
+            return self.landed.get(url)
+
+    def replay_from(self, entries: List[Dict[str, Any]]) -> None:
+        """
+        Serves the bodies recorded in manifest entries instead of fetching them. Replaying
+        is for the whole process and nothing is fetched or landed while it is on.
+
+        Args:
+            entries: list[dict] - manifest entries, see GenericPipeline.record_landing
+        """
+        with self._landing_lock:
+            if self.replay is None:
+                self.replay = {}
+                self.landing = self.landing or LandingZone()
+            for entry in entries:
+                for payload in entry.get('payloads', []):
+                    self.replay[LandingZone.key(payload['url'])] = payload
+
+    def replayed(self, url: str) -> Dict[str, Any]:
+        entry = self.replay.get(LandingZone.key(url))
+        if entry is None:
+            raise LookupError(f'{url} is not in the replayed run, replays only serve urls the run fetched')
+        return entry
+
+    def mark_loaded(self, urls: List[str]) -> None:
+        """
+        Records that the cached bodies for urls were loaded, so identical bodies are skipped next run.
+        Does nothing while replaying, the rows came from landed bodies and not the cached ones.
+        """
+        if self.replay is not None or settings.PIPELINE_REPLAY:
+            return
+        if self.cache is not None and urls:
+            self.cache.mark_loaded(urls)
+
+    def flush_cache(self) -> None:
+        """
+        Writes the response cache's pending index changes to disk
+        """
+        if self.cache is not None:
+            self.cache.flush()
+
+    def forget_loaded(self, urls: List[str]) -> None:
+        """
+        Forgets which cached bodies for urls were loaded, called after a replay overwrote their
+        rows with older ones so the next live run loads them again instead of skipping them
+        """
+        if self.cache is not None and urls:
+            self.cache.forget_loaded(urls)
+
+    def log_stats(self) -> None:
+        """
+        Logs connection reuse per host
+        """
+        for host, stat in self.stats.snapshot().items():
+            self.logger.info(
+                f"HTTP {host}: {stat['requests']} requests over {stat['connections']} connections "
+                f"({stat['handshakes_avoided']} handshakes avoided, reuse rate {stat['reuse_rate']:.0%})"
+            )
+
+
+_session: Optional[HttpSession] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> HttpSession:
+    """
+    Returns the process-wide HttpSession, creating it on first use
+    """
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = HttpSession()
+
+    return _session
@@ -0,0 +1,167 @@
+"""
+Declarative column specs compiled into row converters
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from masori.ingest.common import Common
+
+
+def to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_str(value: Any) -> Optional[str]:
+    return value if isinstance(value, str) else str(value)
+
+
+def to_stripped_str(value: Any) -> Optional[str]:
+    return to_str(value).strip()
+
+
+def as_is(value: Any) -> Any:
+    return value
+
+
+# conversions return None instead of raising, so RowConverter handles a bad value in one place
+CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    'float': to_float,
+    'int': to_int,
+    'str': to_str,
+    'strip': to_stripped_str,
+    'raw': as_is
+}
+
+
+class Column(NamedTuple):
+    """
+    One output column: where it comes from, what it is called and how it is converted.
+
+    type is one of CONVERTERS - 'float', 'int', 'str', 'strip' (str with surrounding
+    whitespace removed) or 'raw' (passed through unchanged).
+    """
+    source: str
+    target: str
+    type: str = 'str'
+    nullable: bool = False
+
+
+@dataclass(frozen=True)
+class RunContext:
+    """
+    Values shared by every record of a run, computed once instead of per record
+    """
+    year: int
+    week: int
+    scoring: str = 'PPR'
+
+    @classmethod
+    def current(cls, scoring: str = 'PPR') -> 'RunContext':
+        """
+        Context for today's date
+        """
+        week = Common.determine_nfl_week()
+        return cls(
+            year=int(Common.determine_year()),
+            week=0 if week == 'draft' else int(week),
+            scoring=scoring
+        )
+
+    @property
+    def key(self) -> str:
+        """
+        Compact, JSON-friendly identity of the context, e.g. '2024w03'
+        """
+        return f'{self.year}w{self.week:02d}'
+
+    @classmethod
+    def from_key(cls, key: str, scoring: str = 'PPR') -> 'RunContext':
+        year, _, week = key.partition('w')
+        return cls(year=int(year), week=int(week), scoring=scoring)
+
+    def columns(self) -> Dict[str, int]:
+        """
+        Columns every row of the run is tagged with
+        """
+        return {'id_week': self.week, 'id_year': self.year}
+
+
+class RowConverter:
+    """
+    Column specs compiled once into a callable that turns a source record into a row.
+
+    A record missing a non-nullable column, or whose value doesn't convert, is logged
+    and comes back as {} so the pipeline counts it as a transform failure.
+    """
+    def __init__(self, name: str, columns: List[Column], constants: Optional[Dict[str, Any]] = None):
+        self.logger = logger
+        self.name = name
+        self.columns = list(columns)
+        self.constants = dict(constants or {})
+
+        unknown = {column.type for column in self.columns} - set(CONVERTERS)
+        if unknown:
+            raise ValueError(f'Unknown column types {sorted(unknown)} in {name}')
+
+        self.steps = tuple(
+            (column.source, column.target, CONVERTERS[column.type], column.nullable)
+            for column in self.columns
+        )
+        self.constant_items = tuple(self.constants.items())
+
+    def __reduce__(self):
+        # rebuilt from its specs in worker processes, the logger doesn't pickle
+        return (RowConverter, (self.name, self.columns, self.constants))
+
+    def __call__(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        ret = {}
+
+        for source, target, convert, nullable in self.steps:
+            value = record.get(source)
+            if value is not None:
+                value = convert(value)
+            if value is None and not nullable:
+                self.logger.warning(f'incomplete data record: {record} - {source!r} is missing or invalid')
+                return {}
+            ret[target] = value
+
+        for target, value in self.constant_items:
+            ret[target] = value
+
+        return ret
+
+
+class ContextConverter:
+    """
+    Converts (RunContext, record) pairs for pipelines spanning many runs, e.g. backfills,
+    with one RowConverter per context compiled on first use
+    """
+    def __init__(self, name: str, columns: List[Column]):
+        self.name = name
+        self.columns = list(columns)
+        self.converters: Dict[RunContext, RowConverter] = {}
+
+    def __call__(self, pair: Tuple[RunContext, Dict[str, Any]]) -> Dict[str, Any]:
+        context, record = pair
+        converter = self.converters.get(context)
+        if converter is None:
+            converter = self.converters.setdefault(
+                context, RowConverter(self.name, self.columns, context.columns())
+            )
+        return converter(record)
+
+    def __reduce__(self):
+        return (ContextConverter, (self.name, self.columns))
@@ -0,0 +1,85 @@
+"""
+Historical backfill of fantasy projections across seasons and weeks for `masori backfill`
+"""
+
+from typing import List, Optional
+
+from loguru import logger
+
+from masori.ingest.fantasy import FANTASYPROS_COLUMNS
+from masori.ingest.transforms import RunContext
+from masori.pipeline.scheduler import PipelineScheduler
+from masori.pipeline.seasons import SeasonsPipelineRunner
+from masori.pipeline.fantasy import FantasyPipelineRunner
+
+FANTASY_POSITIONS = list(FANTASYPROS_COLUMNS)
+
+
+def parse_range(spec: str) -> List[int]:
+    """
+    Parses '2015-2025', '1,3,5-7' or '9' into a sorted list of ints
+
+    Args:
+        spec: str - comma separated numbers and inclusive ranges
+
+    Returns:
+        list[int]
+
+    Raises:
+        ValueError - for anything else, including open ranges like '2015-'
+    """
+    ret = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, dash, end = part.partition('-')
+        if not start.isdigit() or (dash and not end.isdigit()):
+            raise ValueError(f'Expected a number or a range like 2015-2025, got {part!r}')
+        first, last = int(start), int(end or start)
+        if last < first:
+            raise ValueError(f'Range {part!r} ends before it starts')
+        ret.update(range(first, last + 1))
+
+    return sorted(ret)
+
+
+def build_backfill_scheduler(years: List[int], weeks: List[int], positions: Optional[List[str]] = None,
+                             scoring: str = 'PPR', concurrency: Optional[int] = None) -> PipelineScheduler:
+    """
+    One task loading the season types of every year, plus one backfill pipeline per
+    fantasy position over every (year, week). Positions run side by side and each one
+    fetches its weeks concurrently, the per-host rate limits keep FantasyPros happy.
+
+    DraftKings only publishes salaries for upcoming contests, so there is nothing to backfill.
+
+    Args:
+        years: list[int] - seasons to load
+        weeks: list[int] - weeks of each season to load
+        positions: list[str] - fantasy positions, defaults to all of them
+        scoring: str - FantasyPros scoring format
+        concurrency: int - pipelines running at once, defaults to all of them
+
+    Returns:
+        PipelineScheduler - ready to run
+    """
+    positions = positions or FANTASY_POSITIONS
+    unknown = set(positions) - set(FANTASY_POSITIONS)
+    if unknown:
+        raise ValueError(f'Unknown positions {sorted(unknown)}, expected some of {FANTASY_POSITIONS}')
+
+    contexts = [RunContext(year=year, week=week, scoring=scoring) for year in years for week in weeks]
+    scheduler = PipelineScheduler(concurrency or len(positions) + 1)
+
+    scheduler.add('seasons', SeasonsPipelineRunner(years).run)
+
+    fantasy = FantasyPipelineRunner()
+    for position in positions:
+        scheduler.add(f'fantasy-{position}', fantasy.backfill_pipeline(position, contexts).run)
+
+    logger.info(
+        f'Backfilling {len(years)} seasons x {len(weeks)} weeks x {len(positions)} positions '
+        f'({len(contexts) * len(positions)} pages). DraftKings has no salary history and is skipped.'
+    )
+
+    return scheduler
@@ -0,0 +1,121 @@
+"""
+Per-ID completion state so interrupted pipeline runs can be resumed
+"""
+
+import os
+import re
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from masori.config import settings
+
+
+class Checkpoint:
+    """
+    JSON file recording which IDs of a pipeline run have been loaded.
+
+    start() saves the run's ID list, complete() adds IDs as their batches commit and
+    clear() deletes the file once every ID made it. A file left behind therefore
+    belongs to a run that died or had failed IDs, and remaining() hands back what is
+    left of it without calling the id_fetcher again.
+
+    Writes are atomic and failures to write are logged, a checkpoint never fails a run.
+    """
+    def __init__(self, pipeline_name: str, directory: Optional[Path] = None):
+        self.logger = logger
+        self.pipeline_name = pipeline_name
+        self.directory = Path(directory or settings.CHECKPOINT_DIR)
+        self.path = self.directory / f"{re.sub(r'[^A-Za-z0-9_]+', '_', pipeline_name).strip('_')}.json"
+
+        self._lock = threading.Lock()
+        self.state: Optional[Dict[str, Any]] = None
+        self.done: set = set()
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.warning(f'Ignoring unreadable checkpoint {self.path} - {e}')
+            return None
+
+    def write(self) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f'.json.{os.getpid()}.tmp')
+            tmp.write_text(json.dumps({**self.state, 'done': sorted(self.done, key=str)}))
+            os.replace(tmp, self.path)
+        except (OSError, TypeError) as e:
+            self.logger.warning(f'Failed to write checkpoint {self.path} - {e}')
+
+    def remaining(self) -> Optional[List[Any]]:
+        """
+        IDs the last unfinished run didn't complete, in their original order
+
+        Returns:
+            list[Any] - IDs left to process, or None when there is nothing to resume
+        """
+        state = self.read()
+        if state is None:
+            return None
+
+        with self._lock:
+            self.state = {key: value for key, value in state.items() if key != 'done'}
+            self.done = set(state.get('done', []))
+            ids = [id for id in state['ids'] if id not in self.done]
+            self.state['resumed_at'] = datetime.now().isoformat()
+            self.write()
+
+        self.logger.info(
+            f"Resuming {self.pipeline_name} run {state.get('run_id')} from {state.get('started_at')}: "
+            f"{len(ids)} of {len(state['ids'])} IDs left"
+        )
+
+        return ids
+
+    def pending(self) -> bool:
+        """
+        Whether an earlier run left a checkpoint behind
+        """
+        return self.path.exists()
+
+    def start(self, run_id: str, ids: List[Any]) -> None:
+        """
+        Starts a fresh checkpoint for a run, replacing any earlier one
+        """
+        with self._lock:
+            self.state = {
+                'run_id': run_id,
+                'pipeline': self.pipeline_name,
+                'started_at': datetime.now().isoformat(),
+                'ids': list(ids)
+            }
+            self.done = set()
+            self.write()
+
+    def complete(self, ids: List[Any]) -> None:
+        """
+        Records ids as done, called once their rows are committed
+        """
+        if not ids:
+            return
+        with self._lock:
+            if self.state is None:
+                return
+            self.done.update(ids)
+            self.write()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.state = None
+            self.done = set()
+            try:
+                self.path.unlink(missing_ok=True)
+            except OSError as e:
+                self.logger.warning(f'Failed to remove checkpoint {self.path} - {e}')
@@ -0,0 +1,58 @@
+"""
+Dependency graph of every masori pipeline for `masori all`
+"""
+
+from typing import Dict, Optional
+
+from masori.pipeline.scheduler import PipelineScheduler
+from masori.pipeline.teams import TeamPipelineRunner
+from masori.pipeline.positions import PositionsPipelineRunner
+from masori.pipeline.players import PlayerPipelineRunner
+from masori.pipeline.seasons import SeasonsPipelineRunner
+from masori.pipeline.fantasy import FantasyPipelineRunner
+from masori.pipeline.draftkings import DraftkingsPipelineRunner
+
+# players sit behind teams and positions on the critical path, so start those first
+DEFAULT_PRIORITIES = {
+    'teams': 10,
+    'positions': 10,
+    'players': 5
+}
+
+
+def build_scheduler(max_concurrency: Optional[int] = None,
+                    priorities: Optional[Dict[str, int]] = None) -> PipelineScheduler:
+    """
+    Registers every pipeline with its dependencies
+
+    Args:
+        max_concurrency: int - pipelines allowed to run at once (defaults to SCHEDULER_CONCURRENCY)
+        priorities: dict[str, int] - per-pipeline priority overrides, higher starts first
+
+    Returns:
+        PipelineScheduler - ready to run
+    """
+    priority = {**DEFAULT_PRIORITIES, **(priorities or {})}
+    scheduler = PipelineScheduler(max_concurrency)
+
+    scheduler.add('teams', TeamPipelineRunner().run, priority=priority.get('teams', 0))
+    scheduler.add('positions', PositionsPipelineRunner().run, priority=priority.get('positions', 0))
+    scheduler.add('seasons', SeasonsPipelineRunner().run, priority=priority.get('seasons', 0))
+    scheduler.add(
+        'players',
+        PlayerPipelineRunner().run,
+        depends_on=['teams', 'positions'],
+        priority=priority.get('players', 0)
+    )
+
+    for pipeline in FantasyPipelineRunner().pipelines():
+        name = f"fantasy-{pipeline.table_name.split('_')[0]}"
+        scheduler.add(name, pipeline.run, priority=priority.get(name, 0))
+
+    scheduler.add('draftkings', DraftkingsPipelineRunner().run, priority=priority.get('draftkings', 0))
+
+    unknown = set(priorities or {}) - set(scheduler.tasks)
+    if unknown:
+        raise ValueError(f'Unknown pipelines in priorities: {sorted(unknown)}')
+
+    return scheduler
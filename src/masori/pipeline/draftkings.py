@@ -3,9 +3,11 @@ Handles the ingestion pipelines for draftkings related datasets
 """
 
 import datetime
+from typing import Dict, List
 
 from masori.ingest.common import Common
 from masori.ingest.draftkings import Draftkings
+from masori.ingest.transforms import RunContext
 from masori.pipeline.pipeline import GenericPipeline
 
 class DraftkingsPipelineRunner:
@@ -13,7 +15,9 @@ class DraftkingsPipelineRunner:
         self.draftkings = Draftkings()
         self.common = Common()
 
-    def run(self):
+    def run(self) -> List[Dict]:
+        context = RunContext.current()
+
         dk = GenericPipeline(
             pipeline_name='draftkings data [dk]',
             year = datetime.datetime.now().year,
@@ -24,13 +28,12 @@ class DraftkingsPipelineRunner:
             id_fetcher=self.draftkings.get_draftkings_group_id,
             extract_fn=self.draftkings.get_data_from_draftkings,
             data_slicer=lambda raw: raw,
-            transform_fn=self.draftkings.transform_data_from_draftkings
+            transform_fn=self.draftkings.converter(context)
         )
 
         pipelines = [
                 dk
             ]
 
-        for pipeline in pipelines:
-            pipeline.run()
+        return [pipeline.run() for pipeline in pipelines]
 
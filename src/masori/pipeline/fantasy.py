@@ -3,9 +3,16 @@ Handles the ingestion pipelines for fantasy related datasets
 """
 
 import datetime
+import dataclasses
+from functools import partial
+from typing import Dict, List
 
+from masori.config import settings
 from masori.ingest.common import Common
 from masori.ingest.fantasy import Fantasy
+from masori.ingest.cache import UNCHANGED
+from masori.ingest.landing import LandingZone
+from masori.ingest.transforms import RunContext
 from masori.pipeline.pipeline import GenericPipeline
 
 class FantasyPipelineRunner:
@@ -13,89 +20,94 @@ class FantasyPipelineRunner:
         self.fantasy = Fantasy()
         self.common = Common()
 
-    def run(self):
-        qbs = GenericPipeline(
-            pipeline_name='fantasy data [qb]',
-            year = datetime.datetime.now().year,
-            database_name='nfl',
-            schema='fantasy',
-            table_name='qb_proj',
-            partition_keys=['s_full_name', 'id_year', 'id_week'],
-            id_fetcher=lambda year: ['qb'],
-            extract_fn=self.fantasy.get_data_from_fantasypros,
-            data_slicer=lambda raw: raw.get('results', []),
-            transform_fn=self.fantasy.transform_qb_data_from_fantasypros
-        )
-        rbs = GenericPipeline(
-            pipeline_name='fantasy data [rb]',
-            year = datetime.datetime.now().year,
-            database_name='nfl',
-            schema='fantasy',
-            table_name='rb_proj',
-            partition_keys=['s_full_name', 'id_year', 'id_week'],
-            id_fetcher=lambda year: ['rb'],
-            extract_fn=self.fantasy.get_data_from_fantasypros,
-            data_slicer=lambda raw: raw.get('results', []),
-            transform_fn=self.fantasy.transform_rb_data_from_fantasypros
-        )
-        wrs = GenericPipeline(
-            pipeline_name='fantasy data [wr]',
-            year = datetime.datetime.now().year,
-            database_name='nfl',
-            schema='fantasy',
-            table_name='wr_proj',
-            partition_keys=['s_full_name', 'id_year', 'id_week'],
-            id_fetcher=lambda year: ['wr'],
-            extract_fn=self.fantasy.get_data_from_fantasypros,
-            data_slicer=lambda raw: raw.get('results', []),
-            transform_fn=self.fantasy.transform_wr_data_from_fantasypros
-        )
-        tes = GenericPipeline(
-            pipeline_name='fantasy data [te]',
-            year = datetime.datetime.now().year,
-            database_name='nfl',
-            schema='fantasy',
-            table_name='te_proj',
-            partition_keys=['s_full_name', 'id_year', 'id_week'],
-            id_fetcher=lambda year: ['te'],
-            extract_fn=self.fantasy.get_data_from_fantasypros,
-            data_slicer=lambda raw: raw.get('results', []),
-            transform_fn=self.fantasy.transform_te_data_from_fantasypros
-        )
-        defs = GenericPipeline(
-            pipeline_name='fantasy data [dst]',
+    def pipelines(self) -> List[GenericPipeline]:
+        """
+        Builds one pipeline per fantasy position so they can be run independently.
+        The week, year and scoring are fixed here, once for all of them. A replay
+        uses the ones the landed run was fetched with instead.
+        """
+        context = RunContext.current()
+
+        return [
+            self.projections_pipeline('fantasy data [qb]', 'qb', 'qb_proj', context),
+            self.projections_pipeline('fantasy data [rb]', 'rb', 'rb_proj', context),
+            self.projections_pipeline('fantasy data [wr]', 'wr', 'wr_proj', context),
+            self.projections_pipeline('fantasy data [te]', 'te', 'te_proj', context),
+            self.projections_pipeline('fantasy data [dst]', 'dst', 'dst_proj', context),
+            self.projections_pipeline('fantasy data [ks]', 'k', 'k_proj', context)
+        ]
+
+    def projections_pipeline(self, pipeline_name: str, position: str, table_name: str,
+                             context: RunContext) -> GenericPipeline:
+        """
+        Pipeline loading one position's projections for the week of context
+
+        Args:
+            pipeline_name: str - name runs are recorded and landed under
+            position: str - key of FANTASYPROS_COLUMNS
+            table_name: str - table in the fantasy schema
+            context: RunContext - week to load, replaced by the landed run's when replaying
+
+        Returns:
+            GenericPipeline
+        """
+        if settings.PIPELINE_REPLAY:
+            landed = LandingZone().run_context(pipeline_name, settings.PIPELINE_REPLAY)
+            if landed is not None:
+                context = RunContext(**landed)
+
+        return GenericPipeline(
+            pipeline_name=pipeline_name,
             year = datetime.datetime.now().year,
             database_name='nfl',
             schema='fantasy',
-            table_name='dst_proj',
+            table_name=table_name,
             partition_keys=['s_full_name', 'id_year', 'id_week'],
-            id_fetcher=lambda year: ['dst'],
-            extract_fn=self.fantasy.get_data_from_fantasypros,
-            data_slicer=lambda raw: raw.get('results', []),
-            transform_fn=self.fantasy.transform_dst_data_from_fantasypros
+            id_fetcher=lambda year: [position],
+            extract_fn=partial(self.fantasy.get_data_from_fantasypros, context=context, parse=False),
+            parse_fn=Common.parse_fantasypros_payload,
+            data_slicer=Fantasy.results,
+            transform_fn=self.fantasy.converter(position, context),
+            context=dataclasses.asdict(context)
         )
-        ks = GenericPipeline(
-            pipeline_name='fantasy data [ks]',
-            year = datetime.datetime.now().year,
+
+    def run(self) -> List[Dict]:
+        return [pipeline.run() for pipeline in self.pipelines()]
+
+    def backfill_pipeline(self, position: str, contexts: List[RunContext]) -> GenericPipeline:
+        """
+        Pipeline loading one position's projections for many weeks, one ID per week.
+
+        IDs are RunContext keys ('2024w03') so they checkpoint and resume like any other,
+        weeks are fetched concurrently and rows are loaded in batches while fetching
+        continues. Each record is converted with the year and week of the page it came from.
+
+        Args:
+            position: str - key of FANTASYPROS_COLUMNS
+            contexts: list[RunContext] - weeks to load
+
+        Returns:
+            GenericPipeline
+        """
+        def extract(key: str) -> Dict:
+            context = RunContext.from_key(key, contexts[0].scoring)
+            raw = self.fantasy.get_data_from_fantasypros(position, context, parse=False)
+            if raw is UNCHANGED or raw is None:
+                return raw
+            return {'context': context, **raw}
+
+        return GenericPipeline(
+            pipeline_name=f'fantasy backfill [{position}]',
+            year=contexts[0].year,
             database_name='nfl',
             schema='fantasy',
-            table_name='k_proj',
+            table_name=f'{position}_proj',
             partition_keys=['s_full_name', 'id_year', 'id_week'],
-            id_fetcher=lambda year: ['k'],
-            extract_fn=self.fantasy.get_data_from_fantasypros,
-            data_slicer=lambda raw: raw.get('results', []),
-            transform_fn=self.fantasy.transform_k_data_from_fantasypros
+            id_fetcher=lambda year: [context.key for context in contexts],
+            extract_fn=extract,
+            parse_fn=Common.parse_fantasypros_payload,
+            data_slicer=Fantasy.results_with_context,
+            transform_fn=self.fantasy.context_converter(position),
+            stream=True
         )
 
-        pipelines = [
-            qbs, 
-            rbs,
-            wrs,
-            tes,
-            defs,
-            ks
-        ]
-
-        for pipeline in pipelines:
-            pipeline.run()
-
@@ -2,14 +2,33 @@
 Generic classes for pipeline functionality
 """
 
-from typing import List, Dict, Callable, Any
+import time
+import queue
+import pickle
+import threading
+from typing import List, Dict, Callable, Any, Iterable, Iterator, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 from datetime import datetime
 
+from masori.config import settings
 from masori.db.database import Database
+from masori.ingest.cache import UNCHANGED
+from masori.ingest.session import get_session
+from masori.ingest.landing import LandingZone
+from masori.ingest.resolver import get_resolver
+from masori.pipeline.checkpoint import Checkpoint
+from masori.pipeline.stats import PipelineStats
+from masori.pipeline.workers import PayloadWorker, get_process_pool, process_count
 
 
 class GenericPipeline:
+    # every run's stage timings and counters are upserted here
+    METRICS_SCHEMA = 'masori_meta'
+    METRICS_TABLE = 'pipeline_runs'
+    LOAD_MODES = ('upsert', 'swap')
+
     def __init__(
         self,
         pipeline_name: str,
@@ -21,7 +40,14 @@ class GenericPipeline:
         id_fetcher: Callable[[], List[Any]],
         extract_fn: Callable[[Any], Any],
         data_slicer: Callable[[Any], List[Any]],
-        transform_fn: Callable[[Any], Dict]
+        transform_fn: Callable[[Any], Dict],
+        max_workers: Optional[int] = None,
+        stream: Optional[bool] = None,
+        batch_size: Optional[int] = None,
+        post_load: Optional[Callable[[List[Any]], None]] = None,
+        parse_fn: Optional[Callable[[Any], Any]] = None,
+        load_mode: str = 'upsert',
+        context: Optional[Dict[str, Any]] = None
     ):
         self.logger = logger
         self.pipeline_name = pipeline_name
@@ -35,34 +61,580 @@ class GenericPipeline:
         self.extract_fn = extract_fn
         self.data_slicer = data_slicer
         self.transform_fn = transform_fn
+        self.max_workers = max(1, max_workers or settings.EXTRACT_MAX_WORKERS)
+        if load_mode not in self.LOAD_MODES:
+            raise ValueError(f'Unknown load mode {load_mode!r}, expected one of {self.LOAD_MODES}')
+        # 'swap' replaces the whole table in one transaction, see Database.swap_table. It needs
+        # every row of the run at once, so it loads in one batch at the end and isn't checkpointed.
+        # Its extract_fn shouldn't skip unchanged payloads, any unchanged ID makes the run upsert.
+        self.load_mode = load_mode
+        self.stream = False if load_mode == 'swap' else (settings.PIPELINE_STREAMING if stream is None else stream)
+        self.batch_size = max(1, batch_size or settings.LOAD_BATCH_SIZE)
+        # called with the IDs of every load once its rows are committed, e.g. to advance watermarks
+        self.post_load = post_load
+        # with parse_fn, extract_fn returns the undecoded payload and parse_fn turns it into what
+        # data_slicer expects. When PARSE_PROCESSES is set, parse, slice and transform then run
+        # in worker processes, so parse_fn, data_slicer and transform_fn have to be picklable.
+        self.parse_fn = parse_fn
+        self.pool = None
+        # what extract_fn requests besides the ID (e.g. the week), JSON-serialisable. It is
+        # recorded in the landing manifest so a replay can rebuild the same requests, see
+        # LandingZone.run_context.
+        self.context = context
+        # IDs are recorded as their batches commit, so a failed run can be resumed
+        self.checkpoint = (
+            Checkpoint(pipeline_name)
+            if settings.CHECKPOINT_ENABLED and not settings.PIPELINE_REPLAY and load_mode == 'upsert' else None
+        )
 
         self.database = Database()
+        self.session = get_session()
+        self.fetched_urls: Dict[Any, List[str]] = {}
+        self.fetched_at: Dict[Any, str] = {}
+        self.stats = PipelineStats()
 
-    def run(self):
-        fq_table_name = f"{self.database_name}.{self.schema}.{self.table_name}"
-        self.logger.info(f'Starting pipeline for {fq_table_name}')
+    def extract(self, id: Any) -> Any:
+        """
+        Runs the extract function for a single ID, logging failures instead of raising
+        so one bad ID doesn't stop the rest of the run. The urls it fetched are recorded
+        so their cached responses can be marked as loaded afterwards.
 
-        ids = self.id_fetcher(self.year)
-        dataset = []
+        Args:
+            id: Any - ID to pass to extract_fn
 
-        for id in ids:
-            self.logger.info(f'Fetching data for ID {id}')
+        Returns:
+            Any - raw data from extract_fn, UNCHANGED, or None if the extract failed
+        """
+        self.logger.info(f'Fetching data for ID {id}')
+        self.session.begin_capture()
+        self.fetched_at[id] = datetime.now().isoformat()
+        start = time.perf_counter()
+        http_before = self.session.http_seconds()
+        throttle_before = self.session.throttle_seconds()
+        throttled_before = self.session.throttled()
+        bytes_before = self.session.http_bytes()
+        try:
             raw_data = self.extract_fn(id)
+            if self.parse_fn is not None and self.pool is None and raw_data is not None and raw_data is not UNCHANGED:
+                raw_data = self.parse_fn(raw_data)
+            return raw_data
+        except Exception as e:
+            self.logger.warning(f'Failed to extract data for ID {id} - {e}')
+            return None
+        finally:
+            self.fetched_urls[id] = self.session.end_capture()
+            # waiting on the rate limiter is throttle, time on the wire is fetch,
+            # the rest of extract_fn is decoding / parsing the payload
+            throttle = self.session.throttle_seconds() - throttle_before
+            fetch = self.session.http_seconds() - http_before
+            self.stats.add_time('throttle', throttle)
+            self.stats.add_time('fetch', fetch)
+            self.stats.add_time('parse', max(time.perf_counter() - start - fetch - throttle, 0.0))
+            self.stats.count('bytes_downloaded', self.session.http_bytes() - bytes_before)
+            self.stats.count('throttled_responses', self.session.throttled() - throttled_before)
+
+    def extract_all(self, ids: List[Any]) -> Iterator[Tuple[Any, Any]]:
+        """
+        Fans extract calls out over a thread pool and yields results in ID order.
+
+        At most 2 * max_workers extracts are in flight at once so raw payloads
+        don't pile up faster than they are transformed.
+
+        Args:
+            ids: list[Any] - IDs to extract
+
+        Returns:
+            Iterator of (id, raw_data) tuples in the same order as ids
+        """
+        window = self.max_workers * 2
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='masori-extract') as executor:
+            pending = deque()
+            for id in ids:
+                pending.append((id, executor.submit(self.extract, id)))
+                if len(pending) >= window:
+                    done_id, future = pending.popleft()
+                    yield done_id, future.result()
+
+            while pending:
+                done_id, future = pending.popleft()
+                yield done_id, future.result()
+
+    def iter_transformed(self, ids: List[Any]) -> Iterator[Tuple[Any, List[Dict]]]:
+        """
+        Extracts, slices and transforms each ID, skipping IDs that failed or are unchanged
+
+        Args:
+            ids: list[Any] - IDs to process
+
+        Returns:
+            Iterator of (id, transformed rows) in ID order
+        """
+        if self.pool is not None:
+            yield from self.iter_transformed_in_pool(ids)
+            return
+
+        for id, raw_data in self.extract_all(ids):
+            if raw_data is None:
+                self.failed_ids.append(id)
+                self.record_landing(id, 'failed')
+                continue
+
+            if raw_data is UNCHANGED:
+                self.unchanged_ids.append(id)
+                self.record_landing(id, 'unchanged')
+                if self.checkpoint is not None:
+                    self.checkpoint.complete([id])
+                continue
+
+            # streamed payloads are downloaded while they are sliced and transformed, on this thread
+            bytes_before = self.session.http_bytes()
 
             self.logger.info(f'Slicing raw data for ID {id}')
-            raw_items = self.data_slicer(raw_data)
+            try:
+                with self.stats.time('slice'):
+                    raw_items = self.data_slicer(raw_data)
+            except Exception as e:
+                self.logger.warning(f'Failed to slice raw data for ID {id} - {e}')
+                self.failed_ids.append(id)
+                self.record_landing(id, 'failed')
+                continue
+
+            try:
+                rows = self.transform(id, raw_items)
+            except Exception as e:
+                # a streamed payload that breaks off part way, its rows so far are dropped
+                self.logger.warning(f'Failed to read raw data for ID {id} - {e}')
+                self.failed_ids.append(id)
+                self.record_landing(id, 'failed')
+                continue
+            # after transform, streamed bodies are only landed once they have been read
+            self.record_landing(id, 'extracted')
+            self.stats.count('bytes_downloaded', self.session.http_bytes() - bytes_before)
+            self.logger.info(f"Transformed {len(rows)} records for ID {id}")
+            yield id, rows
+
+    def iter_transformed_in_pool(self, ids: List[Any]) -> Iterator[Tuple[Any, List[Dict]]]:
+        """
+        iter_transformed with parse, slice and transform in the worker processes. Payloads
+        are submitted as they are fetched and at most two per worker process wait in the
+        pool, results come back as compact RowBatches in ID order.
+
+        Args:
+            ids: list[Any] - IDs to process
+
+        Returns:
+            Iterator of (id, transformed rows) in ID order
+        """
+        worker = PayloadWorker(self.parse_fn, self.data_slicer, self.transform_fn)
+        window = max(process_count(), 1) * 2
+        pending = deque()
+
+        def collect(id, future):
+            try:
+                batch = future.result()
+            except Exception as e:
+                self.logger.warning(f'Failed to parse and transform data for ID {id} - {e}')
+                self.failed_ids.append(id)
+                self.record_landing(id, 'failed')
+                return
+
+            self.record_landing(id, 'extracted')
+
+            self.stats.add_time('parse', batch.parse_seconds)
+            self.stats.add_time('transform', batch.transform_seconds)
+            self.stats.count('records_in', batch.records_in)
+            self.stats.count('records_out', len(batch.values))
+            self.stats.count('transform_failures', batch.failures)
+
+            rows = batch.rows()
+            self.logger.info(f"Transformed {len(rows)} records for ID {id}")
+            yield id, rows
+
+        for id, raw_data in self.extract_all(ids):
+            if raw_data is None:
+                self.failed_ids.append(id)
+                self.record_landing(id, 'failed')
+                continue
+
+            if raw_data is UNCHANGED:
+                self.unchanged_ids.append(id)
+                self.record_landing(id, 'unchanged')
+                if self.checkpoint is not None:
+                    self.checkpoint.complete([id])
+                continue
+
+            pending.append((id, self.pool.submit(worker, raw_data)))
+            if len(pending) >= window:
+                yield from collect(*pending.popleft())
+
+        while pending:
+            yield from collect(*pending.popleft())
+
+    def record_landing(self, id: Any, status: str) -> None:
+        """
+        Adds the ID, when it was fetched and the bodies its urls returned to this run's
+        landing zone manifest, so the run can be replayed. Nothing is recorded while replaying.
+
+        Args:
+            id: Any - ID that was extracted
+            status: str - 'extracted', 'unchanged' or 'failed'
+        """
+        if self.session.landing is None or settings.PIPELINE_REPLAY:
+            return
+
+        payloads = [self.session.landed_payload(url) for url in self.fetched_urls.get(id, [])]
+        self.session.landing.record(self.pipeline_name, self.stats.run_id, {
+            'id': id,
+            'status': status,
+            'fetched_at': self.fetched_at.get(id),
+            'context': self.context,
+            'payloads': [payload for payload in payloads if payload is not None]
+        })
+        self.landed_ids += 1
+
+    def replay_ids(self, run: str) -> List[Any]:
+        """
+        IDs of a landed run, with the session switched to serving that run's bodies
+
+        Args:
+            run: str - run ID or 'latest'
+
+        Returns:
+            list[Any] - the run's IDs in the order they were recorded, [] if this
+                        pipeline has no such run
+        """
+        zone = self.session.landing or LandingZone()
+        path = zone.find_run(self.pipeline_name, run)
+        if path is None:
+            self.logger.warning(f'No landed run {run} of {self.pipeline_name} in {zone.runs}, nothing to replay')
+            return []
+
+        entries = zone.read_manifest(path)
+        self.session.replay_from(entries)
+
+        ids, seen = [], set()
+        for entry in entries:
+            key = repr(entry['id'])
+            if key not in seen:
+                seen.add(key)
+                ids.append(entry['id'])
+
+        self.logger.info(f'Replaying {len(ids)} IDs of {self.pipeline_name} run {path.stem} from the landing zone')
+
+        return ids
+
+    def get_pool(self):
+        """
+        The shared parse pool when this pipeline has a parse_fn and PARSE_PROCESSES is set,
+        None to parse on the extract threads as usual
+        """
+        if self.parse_fn is None:
+            return None
+
+        pool = get_process_pool()
+        if pool is None:
+            return None
+
+        try:
+            pickle.dumps(PayloadWorker(self.parse_fn, self.data_slicer, self.transform_fn))
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            self.logger.warning(f'{self.pipeline_name} parses on its extract threads, its parse / transform functions are not picklable - {e}')
+            return None
+
+        return pool
+
+    def transform(self, id: Any, raw_items: Iterable[Any]) -> List[Dict]:
+        """
+        Runs transform_fn over each sliced item. Items whose transform raises or
+        returns an empty row are counted as transform failures and dropped.
+
+        Args:
+            id: Any - ID the items came from, for logging
+            raw_items: Iterable - output of data_slicer
+
+        Returns:
+            list[dict] - transformed rows
+        """
+        rows = []
+        records_in = 0
+        failures = 0
 
-            self.logger.info(f"Transforming {len(raw_items)} records for ID {id}")
+        with self.stats.time('transform'):
             for item in raw_items:
-                dataset.append(self.transform_fn(item))
-            
-        self.logger.info(f"Inserting {len(dataset)} records into {fq_table_name}")
-        self.database.upsert_table(
-            database=self.database_name,
-            schema=self.schema,
-            table_name=self.table_name,
-            rows=dataset,
-            partition_keys=self.partition_keys
-        )
+                records_in += 1
+                try:
+                    row = self.transform_fn(item)
+                except Exception as e:
+                    self.logger.warning(f'Failed to transform record for ID {id} - {e}')
+                    row = None
+
+                if row:
+                    rows.append(row)
+                else:
+                    failures += 1
+
+        self.stats.count('records_in', records_in)
+        self.stats.count('records_out', len(rows))
+        self.stats.count('transform_failures', failures)
+
+        return rows
+
+    def load(self, rows: List[Dict], ids: List[Any], swap: bool = False) -> None:
+        """
+        Upserts rows, marks the responses they came from as loaded (or, when replaying,
+        forgets that they were), runs post_load and checkpoints the IDs
+
+        Args:
+            rows: list[dict] - transformed rows
+            ids: list[Any] - IDs the rows were built from
+            swap: bool - replace the table with rows instead of upserting them
+        """
+        self.logger.info(f"{'Swapping in' if swap else 'Inserting'} {len(rows)} records into {self.database_name}.{self.schema}.{self.table_name}")
+        with self.stats.time('load'):
+            load_table = self.database.swap_table if swap else self.database.upsert_table
+            counts = load_table(
+                database=self.database_name,
+                schema=self.schema,
+                table_name=self.table_name,
+                rows=rows,
+                partition_keys=self.partition_keys
+            )
+        for name, n in counts.items():
+            self.stats.count(f'rows_{name}', n)
+        urls = [url for id in ids for url in self.fetched_urls.get(id, [])]
+        if settings.PIPELINE_REPLAY:
+            # the table now holds the replayed rows, so the next live run must not skip these urls
+            self.session.forget_loaded(urls)
+        else:
+            self.session.mark_loaded(urls)
+        if self.post_load is not None:
+            self.post_load(ids)
+        if self.checkpoint is not None:
+            self.checkpoint.complete(ids)
+
+    def run_batch(self, ids: List[Any]) -> None:
+        """
+        Transforms every ID, then loads the whole dataset at once. With checkpointing on,
+        a batch is loaded whenever batch_size rows have built up, cut on ID boundaries,
+        so a run that dies part way keeps everything it committed.
+        """
+        dataset = []
+        loaded_ids = []
+
+        for id, rows in self.iter_transformed(ids):
+            dataset.extend(rows)
+            loaded_ids.append(id)
+
+            if self.checkpoint is not None and len(dataset) >= self.batch_size:
+                self.load(dataset, loaded_ids)
+                dataset, loaded_ids = [], []
+
+        if loaded_ids:
+            self.load(dataset, loaded_ids, swap=self.can_swap(ids))
+
+    def can_swap(self, ids: List[Any]) -> bool:
+        """
+        Whether the rows of this run are the table's complete contents. IDs that failed or
+        were skipped as unchanged have no rows in it, an ID listing with pages missing leaves
+        IDs out altogether and records that failed to transform are dropped, so in any of
+        those cases the run upserts what it has instead.
+        """
+        if self.load_mode != 'swap':
+            return False
+
+        missing = len(self.failed_ids) + len(self.unchanged_ids)
+        if missing:
+            self.logger.info(f'{missing} of {len(ids)} IDs failed or are unchanged, upserting instead of swapping {self.table_name}')
+            return False
+
+        if self.partial_listings:
+            self.logger.info(f'IDs came from incomplete listings {self.partial_listings}, upserting instead of swapping {self.table_name}')
+            return False
+
+        failures = self.stats.counts.get('transform_failures', 0)
+        if failures:
+            self.logger.info(f'{failures} records failed to transform, upserting instead of swapping {self.table_name}')
+            return False
+
+        return True
+
+    def run_streaming(self, ids: List[Any]) -> None:
+        """
+        Hands transformed rows to a writer thread through a bounded queue. The writer
+        upserts a micro-batch whenever batch_size rows have built up, so loading overlaps
+        with fetching and only about one batch is held in memory.
+
+        Batches are cut on ID boundaries, so an ID's rows always commit together.
+        """
+        batches = queue.Queue(maxsize=2)
+        errors = []
+
+        def writer():
+            batch, batch_ids = [], []
+            while True:
+                item = batches.get()
+                if item is None:
+                    break
+                if errors:
+                    # keep draining so the producer never blocks on a dead writer
+                    continue
+
+                id, rows = item
+                batch.extend(rows)
+                batch_ids.append(id)
+
+                if len(batch) >= self.batch_size:
+                    try:
+                        self.load(batch, batch_ids)
+                    except Exception as e:
+                        errors.append(e)
+                    batch, batch_ids = [], []
+
+            if batch_ids and not errors:
+                try:
+                    self.load(batch, batch_ids)
+                except Exception as e:
+                    errors.append(e)
+
+        thread = threading.Thread(target=writer, name='masori-writer', daemon=True)
+        thread.start()
+
+        try:
+            for item in self.iter_transformed(ids):
+                batches.put(item)
+        finally:
+            batches.put(None)
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+    def get_ids(self) -> List[Any]:
+        """
+        IDs for this run. With PIPELINE_REPLAY set (`masori --replay <run>`), the IDs of that
+        landed run. With PIPELINE_RESUME set (`masori --resume`) and a checkpoint left
+        by an unfinished run, that run's IDs minus the completed ones, without calling
+        id_fetcher. Otherwise id_fetcher's IDs, which start a fresh checkpoint.
+
+        Returns:
+            list[Any] - IDs to process
+        """
+        if settings.PIPELINE_REPLAY:
+            return self.replay_ids(settings.PIPELINE_REPLAY)
+
+        if self.checkpoint is not None and settings.PIPELINE_RESUME:
+            ids = self.checkpoint.remaining()
+            if ids is not None:
+                return ids
+            self.logger.info(f'No unfinished run of {self.pipeline_name} to resume, starting a new one')
+
+        self.session.begin_partial()
+        try:
+            ids = self.id_fetcher(self.year)
+        finally:
+            self.partial_listings = self.session.end_partial()
+
+        if self.checkpoint is not None:
+            if self.checkpoint.pending() and not settings.PIPELINE_RESUME:
+                self.logger.info(f'Discarding the checkpoint of an unfinished {self.pipeline_name} run, pass --resume to continue it instead')
+            self.checkpoint.start(self.stats.run_id, ids)
+
+        return ids
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Runs the pipeline end to end
+
+        Returns:
+            Dict - per-stage timings and counters for the run, see PipelineStats
+        """
+        fq_table_name = f"{self.database_name}.{self.schema}.{self.table_name}"
+        if self.stream:
+            mode = f'streaming load in batches of {self.batch_size}'
+        elif self.load_mode == 'swap':
+            mode = 'table swap load'
+        else:
+            mode = 'batch load'
+        self.pool = self.get_pool()
+        if self.pool is not None:
+            mode += f', parsing in {process_count()} processes'
+        self.logger.info(f'Starting pipeline for {fq_table_name} with {self.max_workers} extract workers ({mode})')
+
+        self.stats = PipelineStats()
+        self.failed_ids = []
+        self.unchanged_ids = []
+        # collections id_fetcher got with pages missing, so the IDs are incomplete
+        self.partial_listings = []
+        self.landed_ids = 0
+        status = 'failed'
+
+        try:
+            with self.stats.time('ids'):
+                ids = self.get_ids()
+            self.stats.count('ids', len(ids))
+
+            if self.stream:
+                self.run_streaming(ids)
+            else:
+                self.run_batch(ids)
+
+            status = 'succeeded'
+            # failed IDs keep the checkpoint around so --resume retries just those
+            if self.checkpoint is not None and not self.failed_ids:
+                self.checkpoint.clear()
+        finally:
+            self.stats.count('failed_ids', len(self.failed_ids))
+            self.stats.count('unchanged_ids', len(self.unchanged_ids))
+            self.stats.finish(status)
+            self.record_run(fq_table_name)
+            self.session.flush_cache()
+
+        if self.failed_ids:
+            self.logger.warning(f'{len(self.failed_ids)} IDs failed for {self.pipeline_name}: {self.failed_ids}')
+            if self.checkpoint is not None:
+                self.logger.info('Rerun with --resume to retry only the failed IDs')
+
+        if self.unchanged_ids:
+            self.logger.info(f'Skipped {len(self.unchanged_ids)} IDs unchanged since the last load: {self.unchanged_ids}')
+
+        if self.landed_ids:
+            self.logger.info(f'Landed the payloads of {self.landed_ids} IDs as run {self.stats.run_id}, `masori --replay {self.stats.run_id}` reprocesses them offline')
+            self.session.landing.prune(self.pipeline_name, settings.LANDING_KEEP_RUNS, self.stats.started_at.timestamp())
+
+        self.session.log_stats()
+        get_resolver().log_stats()
+        self.database.log_pool_stats()
+        self.logger.info(f'Pipeline for {self.pipeline_name} complete in {self.stats.summary()}.')
+
+        return {
+            'pipeline': self.pipeline_name,
+            'table': fq_table_name,
+            **self.stats.as_dict()
+        }
+
+    def record_run(self, fq_table_name: str) -> None:
+        """
+        Saves the run's stats to masori_meta.pipeline_runs and the Prometheus textfile
+        directory, when enabled. Failures are logged so they never fail the pipeline itself.
+        """
+        if settings.METRICS_DB_ENABLED:
+            try:
+                self.database.upsert_table(
+                    database=self.database_name,
+                    schema=self.METRICS_SCHEMA,
+                    table_name=self.METRICS_TABLE,
+                    rows=[self.stats.as_row(self.pipeline_name, fq_table_name)],
+                    partition_keys=['s_run_id']
+                )
+            except Exception as e:
+                self.logger.warning(f'Failed to record run metrics for {self.pipeline_name} - {e}')
 
-        self.logger.info(f'Pipeline for {self.pipeline_name} complete.')
+        if settings.PROMETHEUS_TEXTFILE_DIR:
+            try:
+                path = self.stats.write_prometheus_textfile(
+                    settings.PROMETHEUS_TEXTFILE_DIR, self.pipeline_name, fq_table_name
+                )
+                self.logger.debug(f'Wrote run metrics to {path}')
+            except OSError as e:
+                self.logger.warning(f'Failed to write Prometheus textfile for {self.pipeline_name} - {e}')
@@ -3,30 +3,70 @@ Handles the ingestion pipelines for players related datasets
 """
 
 import datetime
+from functools import partial
+from typing import Dict, List, Optional
 
+from masori.config import settings
 from masori.ingest.common import Common
 from masori.ingest.players import Players
 from masori.pipeline.pipeline import GenericPipeline
+from masori.pipeline.watermarks import Watermarks
 
 class PlayerPipelineRunner:
-    def __init__(self):
+    def __init__(self, source: Optional[str] = None):
         self.players = Players()
         self.common = Common()
+        # 'rosters' (one request per team) or 'athletes' (paginated core API listing)
+        self.source = source or settings.PLAYERS_SOURCE
+
+    def run(self) -> List[Dict]:
+        if self.source == 'athletes':
+            return [self.athletes_pipeline().run()]
+        if self.source != 'rosters':
+            raise ValueError(f"Unknown players source {self.source!r}, expected 'rosters' or 'athletes'")
+
+        return [self.rosters_pipeline().run()]
+
+    def rosters_pipeline(self) -> GenericPipeline:
+        """
+        Loads every roster, or with PLAYERS_INCREMENTAL only the rosters whose athletes
+        changed since the last load, with team IDs read from reference.teams
+        """
+        pipeline_name = 'reference data [players]'
+        incremental = settings.PLAYERS_INCREMENTAL
+        watermarks = Watermarks(pipeline_name) if incremental else None
 
-    def run(self):
         pipeline = GenericPipeline(
-            pipeline_name='reference data [players]',
+            pipeline_name=pipeline_name,
             year = datetime.datetime.now().year,
             database_name='nfl',
             schema='reference',
             table_name='players',
             partition_keys=['id'],
-            id_fetcher=self.common.get_nfl_team_ids,
-            extract_fn=self.players.get_espn_roster_by_team,
+            id_fetcher=self.players.get_team_ids if incremental else self.common.get_nfl_team_ids,
+            extract_fn=partial(self.players.get_espn_roster_by_team, watermarks=watermarks),
             data_slicer=lambda raw: [
                 item for group in raw.get('athletes', []) for item in group.get('items', [])
             ],
-            transform_fn=self.players.transform_espn_roster
+            transform_fn=self.players.transform_espn_roster,
+            post_load=watermarks.commit if watermarks else None
         )
 
-        pipeline.run()
+        return pipeline
+
+    def athletes_pipeline(self) -> GenericPipeline:
+        """
+        Loads every active athlete from the core API listing, one athlete payload per ID
+        """
+        return GenericPipeline(
+            pipeline_name='reference data [players from athletes]',
+            year = datetime.datetime.now().year,
+            database_name='nfl',
+            schema='reference',
+            table_name='players',
+            partition_keys=['id'],
+            id_fetcher=self.players.get_active_athlete_ids,
+            extract_fn=self.players.get_espn_athlete,
+            data_slicer=lambda raw: [raw],
+            transform_fn=self.players.transform_espn_athlete
+        )
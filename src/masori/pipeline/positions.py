@@ -3,6 +3,7 @@ Handles the ingestion pipelines for position related datasets
 """
 
 import datetime
+from typing import Dict, List
 
 from masori.ingest.common import Common
 from masori.ingest.positions import Positions
@@ -15,7 +16,7 @@ class PositionsPipelineRunner:
         self.common = Common()
         self.database = Database()
 
-    def run(self):
+    def run(self) -> List[Dict]:
         positions = GenericPipeline(
             pipeline_name='reference data [positions]',
             year = datetime.datetime.now().year,
@@ -26,12 +27,12 @@ class PositionsPipelineRunner:
             id_fetcher=self.common.get_nfl_position_ids,
             extract_fn=self.teams.get_espn_positions,
             data_slicer=lambda raw: [raw],
-            transform_fn=self.teams.transform_espn_positions
+            transform_fn=self.teams.transform_espn_positions,
+            load_mode='swap'
         )
 
         pipelines = [
             positions, 
         ]
 
-        for pipeline in pipelines:
-            pipeline.run()
+        return [pipeline.run() for pipeline in pipelines]
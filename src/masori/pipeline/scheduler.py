@@ -0,0 +1,204 @@
+"""
+Dependency-aware scheduler for running pipelines concurrently
+"""
+
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from masori.config import settings
+
+
+class Task:
+    """
+    A named unit of work with upstream dependencies
+    """
+    def __init__(self, name: str, fn: Callable[[], None], depends_on: Optional[List[str]] = None, priority: int = 0):
+        self.name = name
+        self.fn = fn
+        self.depends_on = list(depends_on or [])
+        self.priority = priority
+
+        self.status = 'pending'
+        self.start: Optional[float] = None
+        self.end: Optional[float] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def duration(self) -> float:
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+
+class PipelineScheduler:
+    """
+    Runs tasks as soon as their dependencies finish, highest priority first,
+    with at most max_concurrency tasks in flight. A failed task skips everything downstream of it.
+    """
+    def __init__(self, max_concurrency: Optional[int] = None):
+        self.logger = logger
+        self.max_concurrency = max(1, max_concurrency or settings.SCHEDULER_CONCURRENCY)
+        self.tasks: Dict[str, Task] = {}
+
+    def add(self, name: str, fn: Callable[[], None], depends_on: Optional[List[str]] = None, priority: int = 0) -> None:
+        """
+        Registers a task
+
+        Args:
+            name: str - unique task name
+            fn: Callable - work to run
+            depends_on: list[str] - tasks that must succeed first
+            priority: int - higher runs first when several tasks are ready
+        """
+        if name in self.tasks:
+            raise ValueError(f'Task {name} is already registered')
+        self.tasks[name] = Task(name, fn, depends_on, priority)
+
+    def validate(self) -> None:
+        """
+        Raises ValueError for unknown dependencies or cycles
+        """
+        for task in self.tasks.values():
+            for dep in task.depends_on:
+                if dep not in self.tasks:
+                    raise ValueError(f'Task {task.name} depends on unknown task {dep}')
+
+        remaining = {name: len(task.depends_on) for name, task in self.tasks.items()}
+        ready = [name for name, count in remaining.items() if count == 0]
+        visited = 0
+        while ready:
+            name = ready.pop()
+            visited += 1
+            for dependent in self.dependents(name):
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        if visited != len(self.tasks):
+            raise ValueError('Task dependencies contain a cycle')
+
+    def dependents(self, name: str) -> List[str]:
+        return [task.name for task in self.tasks.values() if name in task.depends_on]
+
+    def skip_downstream(self, name: str) -> None:
+        for dependent in self.dependents(name):
+            task = self.tasks[dependent]
+            if task.status == 'pending':
+                task.status = 'skipped'
+                self.logger.warning(f'Skipping {dependent} because {name} did not succeed')
+                self.skip_downstream(dependent)
+
+    def run_task(self, task: Task) -> None:
+        task.start = time.perf_counter()
+        try:
+            task.fn()
+        finally:
+            task.end = time.perf_counter()
+
+    def run(self) -> Dict[str, Task]:
+        """
+        Runs every task, respecting dependencies, priorities and the concurrency limit
+
+        Returns:
+            Dict[str, Task] - tasks with their status and timings
+        """
+        self.validate()
+
+        remaining = {name: len(task.depends_on) for name, task in self.tasks.items()}
+        order = {name: i for i, name in enumerate(self.tasks)}
+        ready = [(-task.priority, order[name], name) for name, task in self.tasks.items() if not task.depends_on]
+        heapq.heapify(ready)
+
+        self.started = time.perf_counter()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='masori-pipeline') as executor:
+            while ready or running:
+                while ready and len(running) < self.max_concurrency:
+                    _, _, name = heapq.heappop(ready)
+                    task = self.tasks[name]
+                    if task.status != 'pending':
+                        continue
+                    task.status = 'running'
+                    self.logger.info(f'Starting {name}')
+                    running[executor.submit(self.run_task, task)] = task
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    task.error = future.exception()
+
+                    if task.error is not None:
+                        task.status = 'failed'
+                        self.logger.error(f'{task.name} failed after {task.duration:.1f}s - {task.error}')
+                        self.skip_downstream(task.name)
+                        continue
+
+                    task.status = 'succeeded'
+                    self.logger.info(f'{task.name} finished in {task.duration:.1f}s')
+                    for dependent in self.dependents(task.name):
+                        remaining[dependent] -= 1
+                        if remaining[dependent] == 0 and self.tasks[dependent].status == 'pending':
+                            heapq.heappush(ready, (-self.tasks[dependent].priority, order[dependent], dependent))
+
+        self.finished = time.perf_counter()
+
+        return self.tasks
+
+    def critical_path(self) -> List[Task]:
+        """
+        The chain of dependent tasks with the longest total duration, i.e. the
+        lower bound on wall-clock time no matter how much concurrency is allowed
+
+        Returns:
+            list[Task] - tasks on the critical path, upstream first
+        """
+        longest: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+
+        def visit(name: str) -> float:
+            if name not in longest:
+                task = self.tasks[name]
+                best, best_dep = 0.0, None
+                for dep in task.depends_on:
+                    if visit(dep) > best:
+                        best, best_dep = longest[dep], dep
+                longest[name] = best + task.duration
+                previous[name] = best_dep
+            return longest[name]
+
+        if not self.tasks:
+            return []
+
+        end = max(self.tasks, key=visit)
+        path = []
+        while end is not None:
+            path.append(self.tasks[end])
+            end = previous[end]
+
+        return list(reversed(path))
+
+    def log_summary(self) -> None:
+        """
+        Logs per-task status and timings plus the critical path
+        """
+        wall_clock = self.finished - self.started
+
+        self.logger.info(f'Ran {len(self.tasks)} pipelines in {wall_clock:.1f}s with concurrency {self.max_concurrency}')
+        for task in sorted(self.tasks.values(), key=lambda t: t.start or float('inf')):
+            offset = f'+{task.start - self.started:.1f}s' if task.start is not None else '-'
+            self.logger.info(f'  {task.name:<24} {task.status:<10} start {offset:>8}  took {task.duration:.1f}s')
+
+        path = self.critical_path()
+        path_total = sum(task.duration for task in path)
+        self.logger.info(
+            f"Critical path ({path_total:.1f}s of {wall_clock:.1f}s wall clock): "
+            + ' -> '.join(f'{task.name} ({task.duration:.1f}s)' for task in path)
+        )
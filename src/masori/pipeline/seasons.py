@@ -3,6 +3,7 @@ Handles the ingestion pipelines for season related datasets
 """
 
 import datetime
+from typing import Dict, List, Optional
 
 from masori.ingest.common import Common
 from masori.ingest.seasons import Seasons
@@ -10,12 +11,14 @@ from masori.pipeline.pipeline import GenericPipeline
 from masori.db.database import Database
 
 class SeasonsPipelineRunner:
-    def __init__(self):
+    def __init__(self, years: Optional[List[int]] = None):
         self.seasons = Seasons()
         self.common = Common()
         self.database = Database()
+        # specific seasons to load, e.g. for a backfill, instead of the latest SEASONS_MAX_COUNT
+        self.years = years
 
-    def run(self):
+    def run(self) -> List[Dict]:
         season_types = GenericPipeline(
             pipeline_name='reference data [season types]',
             year = datetime.datetime.now().year,
@@ -23,15 +26,15 @@ class SeasonsPipelineRunner:
             schema='reference',
             table_name='season_types',
             partition_keys=['id'],
-            id_fetcher=self.common.get_nfl_season_years,
+            id_fetcher=(lambda year: [str(y) for y in self.years]) if self.years else self.common.get_nfl_season_years,
             extract_fn=self.seasons.get_espn_season_types,
             data_slicer=lambda raw: raw.get('types', {}).get('items', []),
-            transform_fn=self.seasons.transform_espn_season_types
+            transform_fn=self.seasons.transform_espn_season_types,
+            load_mode='swap'
         )
 
         pipelines = [
             season_types, 
         ]
 
-        for pipeline in pipelines:
-            pipeline.run()
+        return [pipeline.run() for pipeline in pipelines]
@@ -0,0 +1,174 @@
+"""
+Per-stage timings and counters for a pipeline run
+"""
+
+import os
+import re
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+
+class PipelineStats:
+    """
+    Thread-safe accumulator for one pipeline run.
+
+    Extract is split into throttle (time the rate limiter held requests back), fetch
+    (time waiting on requests) and parse (the rest of extract_fn). Stage seconds are summed over every call, so stages that run on
+    several threads can add up to more than the wall-clock time of the run.
+    """
+    STAGES = ('ids', 'throttle', 'fetch', 'parse', 'slice', 'transform', 'load')
+    COUNTERS = (
+        'ids', 'failed_ids', 'unchanged_ids', 'bytes_downloaded', 'throttled_responses', 'records_in',
+        'records_out', 'transform_failures', 'rows_inserted', 'rows_updated', 'rows_unchanged', 'rows_failed'
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.run_id = str(uuid.uuid4())
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.finished = None
+        self.status = 'running'
+        self.seconds: Dict[str, float] = {stage: 0.0 for stage in self.STAGES}
+        self.counts: Dict[str, int] = {name: 0 for name in self.COUNTERS}
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """
+        Adds the time spent inside the block to stage
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def finish(self, status: str) -> None:
+        self.finished = time.perf_counter()
+        self.status = status
+
+    @property
+    def wall_seconds(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Snapshot of the run
+
+        Returns:
+            Dict - run_id, status, wall_seconds, per-stage seconds and counters
+        """
+        with self._lock:
+            return {
+                'run_id': self.run_id,
+                'status': self.status,
+                'wall_seconds': round(self.wall_seconds, 4),
+                'stages': {stage: round(seconds, 4) for stage, seconds in self.seconds.items()},
+                'counts': dict(self.counts)
+            }
+
+    def as_row(self, pipeline_name: str, table: str) -> Dict[str, Any]:
+        """
+        The run as a row for masori_meta.pipeline_runs
+
+        Args:
+            pipeline_name: str - e.g. 'reference data [teams]'
+            table: str - fully qualified table the pipeline loads
+
+        Returns:
+            Dict - one row keyed on s_run_id
+        """
+        snapshot = self.as_dict()
+
+        return {
+            's_run_id': self.run_id,
+            's_pipeline': pipeline_name,
+            's_table': table,
+            's_status': self.status,
+            'dt_started': self.started_at.isoformat(),
+            'dec_wall_seconds': snapshot['wall_seconds'],
+            **{f'dec_{stage}_seconds': seconds for stage, seconds in snapshot['stages'].items()},
+            **{f'i_{name}': n for name, n in snapshot['counts'].items()}
+        }
+
+    def to_prometheus(self, pipeline_name: str, table: str) -> str:
+        """
+        The run in Prometheus text exposition format, as gauges describing the last run
+
+        Args:
+            pipeline_name: str - e.g. 'reference data [teams]'
+            table: str - fully qualified table the pipeline loads
+
+        Returns:
+            str
+        """
+        snapshot = self.as_dict()
+        escaped = pipeline_name.replace('\\', '\\\\').replace('"', '\\"')
+        labels = f'pipeline="{escaped}",table="{table}"'
+
+        lines = [
+            '# HELP masori_pipeline_last_run_timestamp_seconds Unix time the last run started.',
+            '# TYPE masori_pipeline_last_run_timestamp_seconds gauge',
+            f'masori_pipeline_last_run_timestamp_seconds{{{labels}}} {self.started_at.timestamp():.3f}',
+            '# HELP masori_pipeline_last_run_success Whether the last run finished without raising.',
+            '# TYPE masori_pipeline_last_run_success gauge',
+            f"masori_pipeline_last_run_success{{{labels}}} {1 if self.status == 'succeeded' else 0}",
+            '# HELP masori_pipeline_duration_seconds Wall-clock duration of the last run.',
+            '# TYPE masori_pipeline_duration_seconds gauge',
+            f"masori_pipeline_duration_seconds{{{labels}}} {snapshot['wall_seconds']}",
+            '# HELP masori_pipeline_stage_seconds Seconds spent in each stage during the last run.',
+            '# TYPE masori_pipeline_stage_seconds gauge'
+        ]
+        lines += [
+            f'masori_pipeline_stage_seconds{{{labels},stage="{stage}"}} {seconds}'
+            for stage, seconds in snapshot['stages'].items()
+        ]
+        for name, n in snapshot['counts'].items():
+            lines += [
+                f'# TYPE masori_pipeline_{name} gauge',
+                f'masori_pipeline_{name}{{{labels}}} {n}'
+            ]
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus_textfile(self, directory: Path, pipeline_name: str, table: str) -> Path:
+        """
+        Atomically writes the run to <directory>/masori_<table>.prom for the node_exporter
+        textfile collector, one file per table so concurrent pipelines don't overwrite each other
+
+        Returns:
+            Path - file written
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        path = directory / f"masori_{re.sub(r'[^A-Za-z0-9_]', '_', table)}.prom"
+        tmp = path.with_suffix(f'.prom.{os.getpid()}.tmp')
+        tmp.write_text(self.to_prometheus(pipeline_name, table))
+        os.replace(tmp, path)
+
+        return path
+
+    def summary(self) -> str:
+        """
+        One-line description of where the time went
+        """
+        stages = ', '.join(f'{stage} {seconds:.2f}s' for stage, seconds in self.seconds.items())
+        return (
+            f"{self.wall_seconds:.2f}s wall ({stages}), {self.counts.get('bytes_downloaded', 0):,} bytes downloaded, "
+            f"{self.counts.get('records_in', 0)} records in, {self.counts.get('records_out', 0)} out, "
+            f"{self.counts.get('transform_failures', 0)} transform failures"
+        )
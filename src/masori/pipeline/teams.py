@@ -3,6 +3,7 @@ Handles the ingestion pipelines for teams related datasets
 """
 
 import datetime
+from typing import Dict, List
 
 from masori.ingest.common import Common
 from masori.ingest.teams import Teams
@@ -13,7 +14,7 @@ class TeamPipelineRunner:
         self.teams = Teams()
         self.common = Common()
 
-    def run(self):
+    def run(self) -> List[Dict]:
         pipeline = GenericPipeline(
             pipeline_name='reference data [teams]',
             year = datetime.datetime.now().year,
@@ -24,7 +25,8 @@ class TeamPipelineRunner:
             id_fetcher=self.common.get_nfl_team_ids,
             extract_fn=self.teams.get_espn_teams,
             data_slicer=lambda raw: [raw.get('team')],
-            transform_fn=self.teams.transform_espn_teams
+            transform_fn=self.teams.transform_espn_teams,
+            load_mode='swap'
         )
 
-        pipeline.run()
+        return [pipeline.run()]
@@ -0,0 +1,152 @@
+"""
+Process pool for the CPU-bound parse, slice and transform stages of a pipeline
+"""
+
+import os
+import time
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from masori.config import settings
+
+
+def process_count(setting: Optional[str] = None) -> int:
+    """
+    Worker processes for PARSE_PROCESSES: '0' (off), 'auto' or a number.
+
+    'auto' uses every core this process may run on but one, which is left to the
+    extract threads and the writer, and is 0 on a single core where a pool only adds
+    pickling overhead.
+
+    Returns:
+        int - worker processes, 0 to parse on the pipeline's own threads
+    """
+    setting = str(settings.PARSE_PROCESSES if setting is None else setting).strip().lower()
+
+    if setting == 'auto':
+        try:
+            cores = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cores = os.cpu_count() or 1
+        return max(cores - 1, 0) if cores > 1 else 0
+
+    try:
+        return max(int(setting), 0)
+    except ValueError:
+        logger.warning(f"Ignoring PARSE_PROCESSES={setting!r}, expected 'auto' or a number")
+        return 0
+
+
+class RowBatch(NamedTuple):
+    """
+    Transformed rows of one payload as sent back from a worker process.
+
+    Rows sharing the same keys travel as one column tuple plus a tuple of values per
+    row instead of a dict per row, which roughly halves what has to be pickled.
+    """
+    columns: Optional[Tuple[str, ...]]
+    values: List[Any]
+    records_in: int
+    failures: int
+    parse_seconds: float
+    transform_seconds: float
+
+    @classmethod
+    def pack(cls, rows: List[Dict], records_in: int, failures: int,
+             parse_seconds: float, transform_seconds: float) -> 'RowBatch':
+        columns = tuple(rows[0]) if rows else ()
+        keys = rows[0].keys() if rows else None
+        if all(row.keys() == keys for row in rows):
+            values = [tuple(row[column] for column in columns) for row in rows]
+        else:
+            columns, values = None, rows
+        return cls(columns, values, records_in, failures, parse_seconds, transform_seconds)
+
+    def rows(self) -> List[Dict]:
+        if self.columns is None:
+            return self.values
+        columns = self.columns
+        return [dict(zip(columns, values)) for values in self.values]
+
+
+class PayloadWorker:
+    """
+    Picklable parse -> slice -> transform of one raw payload, run in a worker process.
+
+    Each of the three functions must be picklable: module level functions, classmethods,
+    functools.partial of those, or objects like RowConverter - not lambdas or methods
+    of objects holding sessions and connections.
+    """
+    def __init__(self, parse_fn: Callable[[Any], Any], data_slicer: Callable[[Any], Iterable[Any]],
+                 transform_fn: Callable[[Any], Dict]):
+        self.parse_fn = parse_fn
+        self.data_slicer = data_slicer
+        self.transform_fn = transform_fn
+
+    def __call__(self, payload: Any) -> RowBatch:
+        start = time.perf_counter()
+        raw_items = self.data_slicer(self.parse_fn(payload))
+        parsed = time.perf_counter()
+
+        rows = []
+        records_in = 0
+        failures = 0
+        for item in raw_items:
+            records_in += 1
+            try:
+                row = self.transform_fn(item)
+            except Exception as e:
+                logger.warning(f'Failed to transform record - {e}')
+                row = None
+
+            if row:
+                rows.append(row)
+            else:
+                failures += 1
+
+        return RowBatch.pack(rows, records_in, failures, parsed - start, time.perf_counter() - parsed)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Returns the process-wide parse pool sized by PARSE_PROCESSES, creating it on first
+    use, or None when process parsing is off. Pipelines running side by side share it.
+    """
+    global _pool, _pool_workers
+
+    workers = process_count()
+    if not workers:
+        return None
+
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # extract threads are already running, forking them isn't safe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver'))
+            _pool_workers = workers
+            logger.info(f'Started {workers} parse worker processes')
+
+    return _pool
+
+
+def shutdown_process_pool() -> None:
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_process_pool)
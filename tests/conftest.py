@@ -0,0 +1,37 @@
+"""
+Shared fixtures. Settings are read from the environment when masori.config is imported,
+so everything that would touch the database or .cache is turned off before that.
+"""
+
+import os
+
+for name in ('CHECKPOINT_ENABLED', 'HTTP_CACHE_ENABLED', 'LANDING_ENABLED', 'METRICS_DB_ENABLED'):
+    os.environ[name] = 'false'
+
+import pytest
+
+from masori.pipeline.pipeline import GenericPipeline
+
+
+@pytest.fixture
+def make_pipeline():
+    """
+    Builds a GenericPipeline whose IDs map to one {'id': id} row each, overridable per test
+    """
+    def make(**kwargs) -> GenericPipeline:
+        options = dict(
+            pipeline_name='test',
+            database_name='test',
+            year=2025,
+            schema='test',
+            table_name='rows',
+            partition_keys=['id'],
+            id_fetcher=lambda year: [],
+            extract_fn=lambda id: {'id': id},
+            data_slicer=lambda raw: [raw],
+            transform_fn=lambda item: item
+        )
+        options.update(kwargs)
+        return GenericPipeline(**options)
+
+    return make
@@ -0,0 +1,26 @@
+import pytest
+
+from masori.pipeline.backfill import parse_range
+
+
+@pytest.mark.parametrize('spec, expected', [
+    ('9', [9]),
+    ('2015-2018', [2015, 2016, 2017, 2018]),
+    ('1,3,5-7', [1, 3, 5, 6, 7]),
+    (' 5-6 , 1 ,', [1, 5, 6]),
+    ('3-5,4-6', [3, 4, 5, 6]),
+    ('7-7', [7])
+])
+def test_parse_range(spec, expected):
+    assert parse_range(spec) == expected
+
+
+@pytest.mark.parametrize('spec', ['2015-', '-2015', 'a', '1-b', '1.5', '1-2-3', '2015 - 2016'])
+def test_parse_range_rejects_malformed_parts(spec):
+    with pytest.raises(ValueError, match='Expected a number or a range'):
+        parse_range(spec)
+
+
+def test_parse_range_rejects_reversed_ranges():
+    with pytest.raises(ValueError, match='ends before it starts'):
+        parse_range('2025-2015')
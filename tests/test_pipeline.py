@@ -0,0 +1,137 @@
+import threading
+import time
+
+from masori.db.database import Database
+from masori.ingest.cache import UNCHANGED
+
+
+def test_extract_all_yields_in_id_order(make_pipeline):
+    # later IDs finish first
+    pipeline = make_pipeline(extract_fn=lambda id: time.sleep(0.01 * (5 - id)) or id, max_workers=4)
+
+    assert list(pipeline.extract_all([0, 1, 2, 3, 4])) == [(0, 0), (1, 1), (2, 2), (3, 3), (4, 4)]
+
+
+def test_extract_all_yields_none_for_failed_ids(make_pipeline):
+    def extract_fn(id):
+        if id == 2:
+            raise RuntimeError('boom')
+        return id
+
+    pipeline = make_pipeline(extract_fn=extract_fn, max_workers=2)
+
+    assert list(pipeline.extract_all([1, 2, 3])) == [(1, 1), (2, None), (3, 3)]
+
+
+def test_extract_all_bounds_extracts_in_flight(make_pipeline):
+    lock = threading.Lock()
+    started = []
+    running = [0, 0]  # current, peak
+
+    def extract_fn(id):
+        with lock:
+            started.append(id)
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.005)
+        with lock:
+            running[0] -= 1
+        return id
+
+    pipeline = make_pipeline(extract_fn=extract_fn, max_workers=2)
+    results = pipeline.extract_all(list(range(20)))
+
+    assert next(results) == (0, 0)
+    # nothing beyond the 2 * max_workers window is submitted before the caller catches up
+    assert len(started) <= 4
+
+    assert [id for id, _ in results] == list(range(1, 20))
+    assert running[1] <= 2
+
+
+def run_loads(pipeline):
+    """
+    Runs the pipeline with load stubbed out, returning the (rows, ids, swap) of each load
+    """
+    loads = []
+    pipeline.load = lambda rows, ids, swap=False: loads.append((rows, ids, swap))
+    pipeline.run()
+    return loads
+
+
+def test_clean_swap_run_swaps(make_pipeline):
+    pipeline = make_pipeline(id_fetcher=lambda year: [1, 2, 3], load_mode='swap')
+
+    assert run_loads(pipeline) == [([{'id': 1}, {'id': 2}, {'id': 3}], [1, 2, 3], True)]
+
+
+def test_upsert_run_never_swaps(make_pipeline):
+    pipeline = make_pipeline(id_fetcher=lambda year: [1, 2])
+
+    assert [swap for _, _, swap in run_loads(pipeline)] == [False]
+    assert not pipeline.can_swap([1, 2])
+
+
+def test_swap_run_with_failed_ids_upserts(make_pipeline):
+    def extract_fn(id):
+        if id == 2:
+            raise RuntimeError('boom')
+        return {'id': id}
+
+    pipeline = make_pipeline(id_fetcher=lambda year: [1, 2, 3], extract_fn=extract_fn, load_mode='swap')
+
+    assert run_loads(pipeline) == [([{'id': 1}, {'id': 3}], [1, 3], False)]
+    assert pipeline.failed_ids == [2]
+
+
+def test_swap_run_with_unchanged_ids_upserts(make_pipeline):
+    pipeline = make_pipeline(
+        id_fetcher=lambda year: [1, 2],
+        extract_fn=lambda id: UNCHANGED if id == 1 else {'id': id},
+        load_mode='swap'
+    )
+
+    assert run_loads(pipeline) == [([{'id': 2}], [2], False)]
+    assert pipeline.unchanged_ids == [1]
+
+
+def test_swap_run_with_transform_failures_upserts(make_pipeline):
+    pipeline = make_pipeline(
+        id_fetcher=lambda year: [1, 2],
+        data_slicer=lambda raw: [raw, {}],
+        load_mode='swap'
+    )
+
+    assert [swap for _, _, swap in run_loads(pipeline)] == [False]
+    assert pipeline.stats.counts['transform_failures'] == 2
+
+
+def test_swap_run_from_an_incomplete_listing_upserts(make_pipeline):
+    url = 'https://example.com/teams?page=2'
+
+    def id_fetcher(year):
+        pipeline.session.note_partial(url)
+        return [1, 2]
+
+    pipeline = make_pipeline(id_fetcher=id_fetcher, load_mode='swap')
+
+    assert [swap for _, _, swap in run_loads(pipeline)] == [False]
+    assert pipeline.partial_listings == [url]
+
+
+def test_incomplete_listings_are_only_recorded_while_fetching_ids(make_pipeline):
+    pipeline = make_pipeline(
+        id_fetcher=lambda year: [1],
+        extract_fn=lambda id: pipeline.session.note_partial('https://example.com/page') or {'id': id},
+        load_mode='swap'
+    )
+
+    assert [swap for _, _, swap in run_loads(pipeline)] == [True]
+    assert pipeline.partial_listings == []
+
+
+def test_is_loadable():
+    assert Database.is_loadable({'id': 1, 'name': None}, ['id'])
+    assert not Database.is_loadable({}, ['id'])
+    assert not Database.is_loadable({'id': None, 'name': 'x'}, ['id'])
+    assert not Database.is_loadable({'id': 1}, ['id', 'year'])
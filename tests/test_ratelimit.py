@@ -0,0 +1,139 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from masori.ingest.ratelimit import HostLimit, HostLimiter, RateLimiter, parse_rate_limits, parse_retry_after
+
+
+def test_parse_rate_limits():
+    limits = parse_rate_limits('*.espn.com=10:20:4, www.fantasypros.com=2.5,*=5::2')
+
+    assert limits == [
+        ('*.espn.com', HostLimit(10.0, 20, 4)),
+        ('www.fantasypros.com', HostLimit(2.5, 2, 8)),
+        ('*', HostLimit(5.0, 5, 2))
+    ]
+
+
+def test_parse_rate_limits_skips_empty_entries():
+    assert parse_rate_limits('') == []
+    assert parse_rate_limits('a.com=1,,') == [('a.com', HostLimit(1.0, 1, 8))]
+
+
+@pytest.mark.parametrize('spec', ['a.com=0', 'a.com=-1:2'])
+def test_parse_rate_limits_rejects_non_positive_rates(spec):
+    with pytest.raises(ValueError, match='must be positive'):
+        parse_rate_limits(spec)
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after(' 0 ') == 0.0
+
+
+def test_parse_retry_after_http_date():
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=90), usegmt=True)
+    earlier = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=90), usegmt=True)
+
+    assert 85 <= parse_retry_after(later) <= 90
+    assert parse_retry_after(earlier) == 0.0
+
+
+@pytest.mark.parametrize('value', [None, '', 'soon', '-5', '1.5'])
+def test_parse_retry_after_ignores_invalid_values(value):
+    assert parse_retry_after(value) is None
+
+
+def limiter(rate=10.0, burst=10, concurrency=8) -> HostLimiter:
+    return HostLimiter('example.com', HostLimit(rate, burst, concurrency))
+
+
+def test_push_back_halves_rate_and_window_and_pauses():
+    host = limiter()
+    host.acquire()
+
+    before = time.monotonic()
+    host.release(429)
+
+    assert host.window == 4.0
+    assert host.rate == 5.0
+    assert host.blocked_until >= before + HostLimiter.MIN_BACKOFF
+    assert host.backoff == HostLimiter.MIN_BACKOFF * 2
+
+
+def test_push_backs_during_a_pause_only_slow_down_once():
+    host = limiter()
+    for _ in range(3):
+        host.acquire()
+    for _ in range(3):
+        host.release(503)
+
+    assert host.window == 4.0
+    assert host.rate == 5.0
+
+
+def test_retry_after_sets_the_pause_and_is_capped():
+    host = limiter()
+    host.acquire()
+
+    before = time.monotonic()
+    host.release(200, retry_after=10_000.0)
+
+    assert before + HostLimiter.MAX_RETRY_AFTER <= host.blocked_until <= time.monotonic() + HostLimiter.MAX_RETRY_AFTER
+
+
+def test_successes_recover_up_to_the_ceiling():
+    host = limiter()
+    host.window, host.rate = 2.0, 1.0
+
+    host.active = 1
+    host.release(200)
+
+    assert host.window == 2.5
+    assert host.rate == pytest.approx(1.2)
+
+    for _ in range(200):
+        host.active = 1
+        host.release(200)
+
+    assert host.window == 8.0
+    assert host.rate == 10.0
+
+
+def test_server_errors_neither_slow_down_nor_recover():
+    host = limiter()
+    host.window, host.rate = 2.0, 1.0
+
+    host.active = 1
+    host.release(500)
+    host.active = 1
+    host.release(None)
+
+    assert (host.window, host.rate, host.blocked_until) == (2.0, 1.0, 0.0)
+
+
+def test_acquire_waits_for_tokens():
+    host = limiter(rate=20.0, burst=1)
+
+    assert host.acquire() < 0.01
+    host.release(200)
+    waited = host.acquire()
+
+    assert 0.03 <= waited < 0.5
+
+
+def test_rate_limiter_uses_the_first_matching_glob():
+    limits = RateLimiter(parse_rate_limits('site.api.espn.com=1,*.espn.com=10'))
+
+    assert limits.for_host('site.api.espn.com').limit.rate == 1.0
+    assert limits.for_host('sports.core.api.espn.com').limit.rate == 10.0
+    assert limits.for_host('www.fantasypros.com') is None
+
+
+def test_rate_limiter_shares_one_limiter_per_host():
+    limits = RateLimiter(parse_rate_limits('*=10'))
+
+    assert limits.for_host('a.com') is limits.for_host('a.com')
+    assert limits.for_host('a.com') is not limits.for_host('b.com')
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from masori.pipeline.scheduler import PipelineScheduler
+
+
+def recorder(order, lock=None):
+    lock = lock or threading.Lock()
+
+    def task(name, seconds=0.0):
+        def fn():
+            time.sleep(seconds)
+            with lock:
+                order.append(name)
+        return fn
+
+    return task
+
+
+def test_runs_tasks_after_their_dependencies():
+    order = []
+    task = recorder(order)
+    scheduler = PipelineScheduler(max_concurrency=4)
+    scheduler.add('players', task('players'), depends_on=['teams', 'positions'])
+    scheduler.add('teams', task('teams', 0.02))
+    scheduler.add('positions', task('positions', 0.01))
+
+    tasks = scheduler.run()
+
+    assert order[-1] == 'players'
+    assert {task.status for task in tasks.values()} == {'succeeded'}
+
+
+def test_starts_ready_tasks_by_priority_then_registration_order():
+    order = []
+    task = recorder(order)
+    scheduler = PipelineScheduler(max_concurrency=1)
+    scheduler.add('a', task('a'))
+    scheduler.add('b', task('b'), priority=5)
+    scheduler.add('c', task('c'))
+    scheduler.add('d', task('d'), priority=5)
+
+    scheduler.run()
+
+    assert order == ['b', 'd', 'a', 'c']
+
+
+def test_failed_task_skips_everything_downstream():
+    order = []
+    task = recorder(order)
+
+    def fail():
+        raise RuntimeError('boom')
+
+    scheduler = PipelineScheduler(max_concurrency=2)
+    scheduler.add('teams', fail)
+    scheduler.add('players', task('players'), depends_on=['teams'])
+    scheduler.add('stats', task('stats'), depends_on=['players'])
+    scheduler.add('seasons', task('seasons'))
+
+    tasks = scheduler.run()
+
+    assert order == ['seasons']
+    assert tasks['teams'].status == 'failed'
+    assert isinstance(tasks['teams'].error, RuntimeError)
+    assert tasks['players'].status == 'skipped'
+    assert tasks['stats'].status == 'skipped'
+    assert tasks['seasons'].status == 'succeeded'
+
+
+def test_never_runs_more_than_max_concurrency_tasks():
+    lock = threading.Lock()
+    running = [0, 0]  # current, peak
+
+    def fn():
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+
+    scheduler = PipelineScheduler(max_concurrency=2)
+    for i in range(6):
+        scheduler.add(f'task-{i}', fn)
+
+    scheduler.run()
+
+    assert running[1] == 2
+
+
+def test_rejects_duplicate_tasks():
+    scheduler = PipelineScheduler(max_concurrency=1)
+    scheduler.add('teams', lambda: None)
+
+    with pytest.raises(ValueError, match='already registered'):
+        scheduler.add('teams', lambda: None)
+
+
+def test_rejects_unknown_dependencies():
+    scheduler = PipelineScheduler(max_concurrency=1)
+    scheduler.add('players', lambda: None, depends_on=['teams'])
+
+    with pytest.raises(ValueError, match='unknown task teams'):
+        scheduler.run()
+
+
+def test_rejects_cycles():
+    scheduler = PipelineScheduler(max_concurrency=1)
+    scheduler.add('a', lambda: None, depends_on=['c'])
+    scheduler.add('b', lambda: None, depends_on=['a'])
+    scheduler.add('c', lambda: None, depends_on=['b'])
+    scheduler.add('d', lambda: None)
+
+    with pytest.raises(ValueError, match='cycle'):
+        scheduler.run()
+
+
+def test_critical_path_follows_the_longest_chain():
+    scheduler = PipelineScheduler(max_concurrency=1)
+    scheduler.add('teams', lambda: None)
+    scheduler.add('positions', lambda: None)
+    scheduler.add('players', lambda: None, depends_on=['teams', 'positions'])
+    scheduler.add('seasons', lambda: None)
+
+    durations = {'teams': 1.0, 'positions': 3.0, 'players': 2.0, 'seasons': 4.0}
+    for name, seconds in durations.items():
+        scheduler.tasks[name].start, scheduler.tasks[name].end = 0.0, seconds
+
+    assert [task.name for task in scheduler.critical_path()] == ['positions', 'players']
+
+
+def test_critical_path_of_no_tasks_is_empty():
+    assert PipelineScheduler(max_concurrency=1).critical_path() == []
@@ -0,0 +1,71 @@
+import pickle
+
+import pytest
+
+from masori.ingest.transforms import Column, RowConverter, RunContext
+
+
+COLUMNS = [
+    Column('id', 'player_id', 'int'),
+    Column('name', 'player_name', 'strip'),
+    Column('fpts', 'fantasy_points', 'float'),
+    Column('team', 'team', 'str', nullable=True)
+]
+
+
+def test_converts_and_renames_columns():
+    convert = RowConverter('test', COLUMNS)
+
+    row = convert({'id': '42', 'name': ' Josh Allen ', 'fpts': '22.1', 'team': 'BUF', 'extra': 1})
+
+    assert row == {'player_id': 42, 'player_name': 'Josh Allen', 'fantasy_points': 22.1, 'team': 'BUF'}
+
+
+def test_nullable_columns_may_be_missing():
+    convert = RowConverter('test', COLUMNS)
+
+    assert convert({'id': 1, 'name': 'x', 'fpts': 0})['team'] is None
+
+
+@pytest.mark.parametrize('record', [
+    {'name': 'x', 'fpts': '1.0'},
+    {'id': None, 'name': 'x', 'fpts': '1.0'},
+    {'id': 'abc', 'name': 'x', 'fpts': '1.0'},
+    {'id': 1, 'name': 'x', 'fpts': 'n/a'}
+])
+def test_missing_or_invalid_required_values_give_an_empty_row(record):
+    assert RowConverter('test', COLUMNS)(record) == {}
+
+
+def test_constants_are_added_to_every_row():
+    convert = RowConverter('test', [Column('id', 'id', 'int')], {'id_year': 2025, 'id_week': 3})
+
+    assert convert({'id': '7'}) == {'id': 7, 'id_year': 2025, 'id_week': 3}
+
+
+def test_raw_columns_pass_through_unchanged():
+    value = {'nested': [1, 2]}
+
+    assert RowConverter('test', [Column('data', 'data', 'raw')])({'data': value})['data'] is value
+
+
+def test_unknown_column_types_are_rejected():
+    with pytest.raises(ValueError, match='decimal'):
+        RowConverter('test', [Column('id', 'id', 'decimal')])
+
+
+def test_converter_pickles_by_its_specs():
+    convert = pickle.loads(pickle.dumps(RowConverter('test', COLUMNS, {'id_year': 2025})))
+
+    assert convert({'id': '1', 'name': 'a', 'fpts': '2'}) == {
+        'player_id': 1, 'player_name': 'a', 'fantasy_points': 2.0, 'team': None, 'id_year': 2025
+    }
+
+
+
+def test_run_context_key_round_trips():
+    context = RunContext(2024, 3)
+
+    assert context.key == '2024w03'
+    assert context.columns() == {'id_week': 3, 'id_year': 2024}
+    assert RunContext.from_key(context.key) == context